@@ -1,6 +1,13 @@
+import sys
+from pathlib import Path
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
 import streamlit as st
 import traceback
-from pathlib import Path
 import json
 from datetime import date, timedelta
 from io import BytesIO
@@ -9,10 +16,23 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from scripts.utils.db_utils import init_db, list_accounts
+from scripts.utils.report_queries import (
+    ReportFilters, accounts_balance, by_category, list_categories, summary, timeseries,
+    transactions_all, transactions_page,
+)
+
 ROOT = Path(__file__).resolve().parent
 TEMPLATES_DIR = ROOT.parent / "reports" / "templates"
 TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
 
+# Linhas por página da tabela de dados
+PAGE_SIZE = 100
+
+TYPE_LABELS = {"Receita": "income", "Despesa": "expense"}
+
+init_db()
+
 st.set_page_config(page_title="Relatórios", page_icon="📈")
 st.markdown("<link rel='stylesheet' href='assets/styles.css'>", unsafe_allow_html=True)
 
@@ -25,47 +45,59 @@ if not st.session_state["logged_in"]:
         st.rerun()
     st.stop()
 
-st.title("Relatórios Dinâmicos")
-st.markdown("Gere relatórios personalizados com filtros avançados e visualizações.")
+
+def _brl(v):
+    return f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def render():
+    st.title("Relatórios Dinâmicos")
+    st.markdown("Gere relatórios personalizados com filtros avançados e visualizações.")
+
+    user_id = st.session_state["user_id"]
+
+    # Template carregado no rerun anterior: só pode ir para as chaves antes de os widgets existirem
+    pending = st.session_state.pop("reports_pending_template", None)
+    if pending:
+        apply_template(pending)
+
+    # Valores iniciais dos filtros (templates carregados escrevem nestas chaves)
+    today = date.today()
+    st.session_state.setdefault("reports_date_range", (today - timedelta(days=30), today))
+    st.session_state.setdefault("reports_categories", ["Todas"])
+    st.session_state.setdefault("reports_transaction_types", ["Todos"])
+    st.session_state.setdefault("reports_accounts", ["Todas"])
 
     # Filtros na sidebar
     st.sidebar.header("Filtros do Relatório")
 
     # Filtro de período
     st.sidebar.subheader("Período")
-    today = date.today()
-    default_start = today - timedelta(days=30)
-
-    date_range = st.sidebar.date_input(
-        "Selecione o período:", value=(default_start, today), key="reports_date_range"
-    )
+    date_range = st.sidebar.date_input("Selecione o período:", key="reports_date_range")
 
     # Filtro de categorias
     st.sidebar.subheader("Categorias")
+    category_options = ["Todas"] + list_categories(user_id)
+    st.session_state["reports_categories"] = [
+        c for c in st.session_state["reports_categories"] if c in category_options
+    ]
     categories = st.sidebar.multiselect(
         "Selecione as categorias:",
-        options=[
-            "Todas",
-            "Alimentação",
-            "Transporte",
-            "Lazer",
-            "Saúde",
-            "Salário",
-            "Renda Extra",
-            "Utilidades",
-            "Moradia",
-            "Compras",
-        ],
-        default=["Todas"],
+        options=category_options,
         key="reports_categories",
     )
 
     # Filtro de contas
     st.sidebar.subheader("Contas")
+    contas = list_accounts(user_id)
+    account_ids = dict(zip(contas["name"], contas["id"]))
+    account_options = ["Todas"] + list(account_ids)
+    st.session_state["reports_accounts"] = [
+        a for a in st.session_state["reports_accounts"] if a in account_options
+    ]
     accounts = st.sidebar.multiselect(
         "Selecione as contas:",
-        options=["Todas", "Conta Corrente", "Poupança", "Cartão de Crédito"],
-        default=["Todas"],
+        options=account_options,
         key="reports_accounts",
     )
 
@@ -74,81 +106,47 @@ st.markdown("Gere relatórios personalizados com filtros avançados e visualiza
     transaction_types = st.sidebar.multiselect(
         "Selecione os tipos:",
         options=["Todos", "Receita", "Despesa"],
-        default=["Todos"],
         key="reports_transaction_types",
     )
 
-    # Filtro de usuário
-    st.sidebar.subheader("👤 Usuário")
-    user_filter = st.sidebar.selectbox(
-        "Filtrar por usuário:",
-        options=["Todos", "Usuário 1", "Usuário 2"],
-        key="reports_user_filter",
-    )
-
-    # Criar dados baseados nos filtros
-    df_filtered = create_sample_data(
-        date_range, categories, accounts, transaction_types, user_filter
-    )
-
-    # Calcular métricas
-    if not df_filtered.empty:
-        receitas = df_filtered[df_filtered["Tipo"] == "Receita"]["Valor"].sum()
-        despesas = df_filtered[df_filtered["Tipo"] == "Despesa"]["Valor"].sum()
-        saldo = receitas - despesas
-        total_transacoes = len(df_filtered)
-    else:
-        receitas = despesas = saldo = total_transacoes = 0
+    filters = build_filters(user_id, date_range, categories, transaction_types, accounts, account_ids)
+    resumo = summary(filters)
 
     # Conteúdo principal
     st.subheader("Resumo")
 
     # Métricas
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        st.metric(
-            "Receitas",
-            f"R$ {receitas:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-        )
-
-    with col2:
-        st.metric(
-            "Despesas",
-            f"R$ {despesas:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-        )
-
-    with col3:
-        st.metric(
-            "Saldo",
-            f"R$ {saldo:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-        )
-
-    with col4:
-        st.metric("Transações", f"{total_transacoes}")
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Receitas", _brl(resumo["income"]))
+    col2.metric("Despesas", _brl(resumo["expense"]))
+    col3.metric("Saldo do Período", _brl(resumo["balance"]))
+    col4.metric("Saldo Atual das Contas", _brl(accounts_balance(filters)))
+    col5.metric("Transações", f"{resumo['count']}")
 
     st.divider()
 
     # Gráficos dinâmicos
     st.subheader("Visualizações")
-    create_charts(df_filtered)
+    if resumo["count"]:
+        create_charts(filters, resumo)
+    else:
+        st.info("Nenhum dado disponível para gerar gráficos.")
 
     st.divider()
 
-    # Tabela de dados
+    # Tabela de dados (paginada no SQL)
     st.subheader("Dados Filtrados")
 
-    if not df_filtered.empty:
-        # Formatar dados para exibição
-        df_display = df_filtered.copy()
+    if resumo["count"]:
+        pages = max(1, -(-resumo["count"] // PAGE_SIZE))
+        if st.session_state.get("reports_page", 1) > pages:
+            st.session_state["reports_page"] = pages
+        page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, step=1,
+                               key="reports_page") if pages > 1 else 1
+        df_display = to_display(transactions_page(filters, PAGE_SIZE, (page - 1) * PAGE_SIZE))
         df_display["Data"] = df_display["Data"].dt.strftime("%d/%m/%Y")
-        df_display["Valor"] = df_display["Valor"].apply(
-            lambda x: f"R$ {x:,.2f}".replace(",", "X")
-            .replace(".", ",")
-            .replace("X", ".")
-        )
-
-        st.dataframe(df_display, use_container_width=True)
+        df_display["Valor"] = df_display["Valor"].apply(_brl)
+        st.dataframe(df_display, use_container_width=True, hide_index=True)
     else:
         st.info("Nenhuma transação encontrada com os filtros aplicados.")
 
@@ -157,12 +155,12 @@ st.markdown("Gere relatórios personalizados com filtros avançados e visualiza
     # Botões de export
     st.subheader("📤 Exportar Dados")
 
-    if not df_filtered.empty:
+    if resumo["count"]:
         col1, col2 = st.columns(2)
 
         with col1:
             if st.button("Exportar CSV", key="export_csv"):
-                csv_data = export_to_csv(df_filtered)
+                csv_data = export_to_csv(to_display(transactions_all(filters)))
                 if csv_data:
                     st.download_button(
                         label="⬇️ Baixar CSV",
@@ -174,7 +172,7 @@ st.markdown("Gere relatórios personalizados com filtros avançados e visualiza
 
         with col2:
             if st.button("Exportar Excel", key="export_excel"):
-                excel_data = export_to_excel(df_filtered)
+                excel_data = export_to_excel(to_display(transactions_all(filters)))
                 if excel_data:
                     st.download_button(
                         label="⬇️ Baixar Excel",
@@ -207,7 +205,6 @@ st.markdown("Gere relatórios personalizados com filtros avançados e visualiza
                     "categories": categories,
                     "accounts": accounts,
                     "transaction_types": transaction_types,
-                    "user_filter": user_filter,
                 }
 
                 if save_template(template_name, current_filters):
@@ -231,10 +228,9 @@ st.markdown("Gere relatórios personalizados com filtros avançados e visualiza
             if st.button("📂 Carregar Template", key="load_template"):
                 loaded_filters = load_template(selected_template)
                 if loaded_filters:
-                    st.success(f"Arquivo Template \'{selected_template}\' carregado!")
-                    st.info(
-                        "🔄 Recarregue a página para aplicar os filtros do template."
-                    )
+                    # os widgets dos filtros já existem neste run: aplica no início do próximo
+                    st.session_state["reports_pending_template"] = loaded_filters
+                    st.rerun()
                 else:
                     st.error("❌ Erro ao carregar template.")
         else:
@@ -247,110 +243,54 @@ st.markdown("Gere relatórios personalizados com filtros avançados e visualiza
     st.sidebar.write(f"**Categorias:** {', '.join(categories)}")
     st.sidebar.write(f"**Contas:** {', '.join(accounts)}")
     st.sidebar.write(f"**Tipos:** {', '.join(transaction_types)}")
-    st.sidebar.write(f"**Usuário:** {user_filter}")
-
-
-def create_sample_data(
-    date_range, categories, accounts, transaction_types, user_filter
-):
-    """Função para criar dados de exemplo baseados nos filtros"""
-    # Dados base
-    base_data = {
-        "Data": [
-            "15/08/2025",
-            "14/08/2025",
-            "13/08/2025",
-            "12/08/2025",
-            "11/08/2025",
-            "10/08/2025",
-            "09/08/2025",
-            "08/08/2025",
-            "07/08/2025",
-            "06/08/2025",
-        ],
-        "Descrição": [
-            "Supermercado",
-            "Salário",
-            "Combustível",
-            "Restaurante",
-            "Freelance",
-            "Farmácia",
-            "Internet",
-            "Aluguel",
-            "Transporte",
-            "Compras",
-        ],
-        "Categoria": [
-            "Alimentação",
-            "Salário",
-            "Transporte",
-            "Alimentação",
-            "Renda Extra",
-            "Saúde",
-            "Utilidades",
-            "Moradia",
-            "Transporte",
-            "Compras",
-        ],
-        "Tipo": [
-            "Despesa",
-            "Receita",
-            "Despesa",
-            "Despesa",
-            "Receita",
-            "Despesa",
-            "Despesa",
-            "Despesa",
-            "Despesa",
-            "Despesa",
-        ],
-        "Valor": [
-            150.00,
-            5000.00,
-            80.00,
-            45.00,
-            800.00,
-            35.00,
-            89.90,
-            1200.00,
-            25.00,
-            120.00,
-        ],
-        "Conta": [
-            "Conta Corrente",
-            "Conta Corrente",
-            "Cartão de Crédito",
-            "Cartão de Crédito",
-            "Poupança",
-            "Conta Corrente",
-            "Conta Corrente",
-            "Conta Corrente",
-            "Conta Corrente",
-            "Cartão de Crédito",
-        ],
-    }
-
-    df = pd.DataFrame(base_data)
-    df["Data"] = pd.to_datetime(df["Data"], format="%d/%m/%Y")
-
-    # Aplicar filtros
-    if categories and "Todas" not in categories:
-        df = df[df["Categoria"].isin(categories)]
 
-    if accounts and "Todas" not in accounts:
-        df = df[df["Conta"].isin(accounts)]
 
-    if transaction_types and "Todos" not in transaction_types:
-        type_mapping = {"Receita": "Receita", "Despesa": "Despesa"}
-        filtered_types = [
-            type_mapping.get(t, t) for t in transaction_types if t in type_mapping
-        ]
-        if filtered_types:
-            df = df[df["Tipo"].isin(filtered_types)]
+def build_filters(user_id, date_range, categories, transaction_types, accounts=(), account_ids=None):
+    """Converte a seleção da sidebar em ReportFilters (\"Todas\"/\"Todos\" = sem filtro)."""
+    date_start = date_end = None
+    if isinstance(date_range, (tuple, list)):
+        if len(date_range) > 0:
+            date_start = date_range[0].isoformat()
+        if len(date_range) > 1:
+            date_end = date_range[1].isoformat()
+    elif isinstance(date_range, date):
+        date_start = date_end = date_range.isoformat()
 
+    cats = () if not categories or "Todas" in categories else tuple(sorted(categories))
+    types = ()
+    if transaction_types and "Todos" not in transaction_types:
+        types = tuple(sorted(TYPE_LABELS[t] for t in transaction_types if t in TYPE_LABELS))
+    accs = ()
+    if accounts and "Todas" not in accounts:
+        accs = tuple(sorted(int(account_ids[a]) for a in accounts if a in (account_ids or {})))
+    return ReportFilters(user_id, date_start, date_end, cats, types, accs)
+
+
+def to_display(df):
+    """Colunas do banco -> colunas exibidas/exportadas."""
+    df = df.rename(columns={
+        "date": "Data", "description": "Descrição", "category": "Categoria",
+        "type": "Tipo", "amount": "Valor",
+    })
+    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
+    df["Tipo"] = df["Tipo"].map({v: k for k, v in TYPE_LABELS.items()}).fillna(df["Tipo"])
+    df["Valor"] = df["Valor"].abs()
     return df
 
 
+def apply_template(filters):
+    """Escreve os filtros do template nas chaves dos widgets (chamar antes de criá-los)."""
+    dr = filters.get("date_range") or []
+    if len(dr) == 2:
+        st.session_state["reports_date_range"] = tuple(date.fromisoformat(d) for d in dr)
+    if filters.get("categories"):
+        st.session_state["reports_categories"] = filters["categories"]
+    if filters.get("accounts"):
+        st.session_state["reports_accounts"] = filters["accounts"]
+    if filters.get("transaction_types"):
+        st.session_state["reports_transaction_types"] = filters["transaction_types"]
+
+
 def export_to_csv(df):
     """Exporta DataFrame para CSV"""
     if df.empty:
@@ -389,7 +329,6 @@ def export_to_excel(df):
 def save_template(template_name, filters):
     """Salva template de filtros"""
     try:
-        TEMPLATES_DIR = ROOT.parent / "reports" / "templates"
         template_data = {
             "name": template_name,
             "filters": filters,
@@ -409,7 +348,6 @@ def save_template(template_name, filters):
 def load_template(template_name):
     """Carrega template de filtros"""
     try:
-        TEMPLATES_DIR = ROOT.parent / "reports" / "templates"
         template_file = TEMPLATES_DIR / f"{template_name}.json"
         if template_file.exists():
             with open(template_file, "r", encoding="utf-8") as f:
@@ -424,7 +362,6 @@ def load_template(template_name):
 def list_templates():
     """Lista templates disponíveis"""
     try:
-        TEMPLATES_DIR = ROOT.parent / "reports" / "templates"
         templates = []
         if TEMPLATES_DIR.exists():
             for file in TEMPLATES_DIR.iterdir():
@@ -435,24 +372,20 @@ def list_templates():
         return []
 
 
-def create_charts(df):
-    """Função para criar gráficos dinâmicos"""
-    if df.empty:
-        st.info("Nenhum dado disponível para gerar gráficos.")
-        return
-
+def create_charts(filters, resumo):
+    """Gráficos a partir de séries já agregadas no banco"""
     col1, col2 = st.columns(2)
 
     with col1:
         # Gráfico de pizza - Distribuição por categoria
         st.subheader("Distribuição por Categoria")
-        category_data = df.groupby("Categoria")["Valor"].sum().reset_index()
+        category_data = by_category(filters)
 
         if not category_data.empty:
             fig_pie = px.pie(
                 category_data,
-                values="Valor",
-                names="Categoria",
+                values="total",
+                names="category",
                 title="Gastos por Categoria",
                 color_discrete_sequence=px.colors.qualitative.Set3,
             )
@@ -464,44 +397,38 @@ def create_charts(df):
     with col2:
         # Gráfico de barras - Receitas vs Despesas
         st.subheader("Receitas vs Despesas")
-        type_data = df.groupby("Tipo")["Valor"].sum().reset_index()
-
-        if not type_data.empty:
-            colors = {"Receita": "#2E8B57", "Despesa": "#DC143C"}
-            fig_bar = px.bar(
-                type_data,
-                x="Tipo",
-                y="Valor",
-                title="Comparação Receitas vs Despesas",
-                color="Tipo",
-                color_discrete_map=colors,
-            )
-            fig_bar.update_layout(showlegend=False)
-            st.plotly_chart(fig_bar, use_container_width=True)
-        else:
-            st.info("Sem dados para o gráfico de receitas vs despesas.")
+        type_data = pd.DataFrame({
+            "Tipo": ["Receita", "Despesa"],
+            "Valor": [resumo["income"], resumo["expense"]],
+        })
+        colors = {"Receita": "#2E8B57", "Despesa": "#DC143C"}
+        fig_bar = px.bar(
+            type_data,
+            x="Tipo",
+            y="Valor",
+            title="Comparação Receitas vs Despesas",
+            color="Tipo",
+            color_discrete_map=colors,
+        )
+        fig_bar.update_layout(showlegend=False)
+        st.plotly_chart(fig_bar, use_container_width=True)
 
-    # Gráfico de linha temporal
+    # Gráfico de linha temporal (diário em períodos curtos, mensal nos longos)
     st.subheader("Evolução Temporal")
-    df_temporal = df.copy()
-    df_temporal = df_temporal.sort_values("Data")
-
-    if not df_temporal.empty:
-        # Criar dados diários
-        daily_data = df_temporal.groupby(["Data", "Tipo"])["Valor"].sum().reset_index()
+    serie = timeseries(filters)
 
+    if not serie.empty:
         fig_line = go.Figure()
 
-        for tipo in daily_data["Tipo"].unique():
-            data_tipo = daily_data[daily_data["Tipo"] == tipo]
-            color = "#2E8B57" if tipo == "Receita" else "#DC143C"
-
+        for col, nome, color in (("income", "Receita", "#2E8B57"), ("expense", "Despesa", "#DC143C")):
+            if filters.types and TYPE_LABELS[nome] not in filters.types:
+                continue
             fig_line.add_trace(
                 go.Scatter(
-                    x=data_tipo["Data"],
-                    y=data_tipo["Valor"],
+                    x=serie["period"],
+                    y=serie[col],
                     mode="lines+markers",
-                    name=tipo,
+                    name=nome,
                     line=dict(color=color, width=3),
                     marker=dict(size=8),
                 )
@@ -509,7 +436,7 @@ def create_charts(df):
 
         fig_line.update_layout(
             title="Evolução das Transações ao Longo do Tempo",
-            xaxis_title="Data",
+            xaxis_title="Data" if filters.granularity() == "day" else "Mês",
             yaxis_title="Valor (R$)",
             hovermode="x unified",
         )
@@ -540,5 +467,3 @@ st.markdown(
     """,
     unsafe_allow_html=True,
 )
-
-
@@ -9,10 +9,13 @@ sys.path.append(str(project_root))
 
 import streamlit as st
 from datetime import datetime, timedelta
-from scripts.utils.db_utils import get_transactions_filtered, init_db
-from scripts.utils.export import export_df_csv, export_df_excel
+from scripts.utils.db_utils import init_db
+from scripts.utils.analytics_snapshot import load_transactions
+from scripts.utils.analytics_duckdb import category_breakdown, monthly_comparison, rolling_average
+from scripts.utils.export import export_df_csv
+from scripts.utils.jobs import get_job, load_result, submit_job
 from scripts.utils.ui_components import (
-    show_skeleton_table, show_banner, action_toast, with_progress
+    show_skeleton_table, show_banner, action_toast, with_progress, show_job_status
 )
 
 # Inicializa o banco de dados para garantir que a tabela 'transactions' exista
@@ -65,8 +68,8 @@ def reports_simple_page():
         type_filter = type_options[selected_type_display]
 
     # Categorias abaixo
-    all_transactions_df = get_transactions_filtered(user_id=user_id)
-    all_categories = sorted(all_transactions_df['category'].unique().tolist()) if not all_transactions_df.empty else []
+    all_transactions_df = load_transactions(user_id, columns=["category"])
+    all_categories = sorted(all_transactions_df['category'].dropna().unique().tolist()) if not all_transactions_df.empty else []
 
     selected_categories = st.multiselect(
         "Categorias",
@@ -83,16 +86,17 @@ def reports_simple_page():
     with table_placeholder:
         show_skeleton_table(rows=8, cols=6)
     
-    def load_transactions():
-        return get_transactions_filtered(
-            user_id=user_id,
+    def load_filtered():
+        return load_transactions(
+            user_id,
             date_start=date_start,
             date_end=date_end,
             categories=selected_categories,
-            type_filter=type_filter
+            type_filter=type_filter,
+            columns=["date", "description", "category", "type", "amount"],
         )
     
-    df_transactions = with_progress("Carregando transações...", load_transactions)
+    df_transactions = with_progress("Carregando transações...", load_filtered)
     table_placeholder.empty()
 
     if df_transactions.empty:
@@ -117,8 +121,40 @@ def reports_simple_page():
         col3.metric("Saldo", f"R$ {balance:,.2f}")
         col4.metric("Quantidade de Transações", num_transactions)
 
+        # Agregações em SQL (DuckDB quando disponível, pandas como fallback)
+        st.markdown('<h2 class="title-secondary">Análises</h2>', unsafe_allow_html=True)
+        filtros = dict(date_start=date_start, date_end=date_end, categories=selected_categories)
+        col_a, col_b = st.columns(2)
+        with col_a:
+            st.write("**Despesas por Categoria**")
+            por_categoria = category_breakdown(user_id, **filtros)
+            if not por_categoria.empty:
+                st.bar_chart(por_categoria.set_index("category")["total"])
+        with col_b:
+            st.write("**Despesa Mensal e Média Móvel (3 meses)**")
+            media_movel = rolling_average(user_id, window=3, **filtros)
+            if not media_movel.empty:
+                st.line_chart(media_movel.set_index("month")[["expense", "expense_rolling"]])
+
+        st.write("**Comparativo Mês a Mês**")
+        mensal = monthly_comparison(user_id, type_filter=type_filter, **filtros)
+        mensal["expense_change_pct"] = mensal["expense_change_pct"] * 100
+        st.dataframe(
+            mensal,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "month": st.column_config.DateColumn("Mês", format="MM/YYYY"),
+                "expense_change_pct": st.column_config.NumberColumn("Var. despesa", format="%.1f%%"),
+            },
+        )
+
         st.markdown('<h2 class="title-secondary">Transações Detalhadas</h2>', unsafe_allow_html=True)
-        st.dataframe(df_transactions, use_container_width=True)
+        st.dataframe(
+            df_transactions,
+            use_container_width=True,
+            column_config={"date": st.column_config.DateColumn("date", format="DD/MM/YYYY")},
+        )
 
         # Botões de Exportação
         st.markdown('<h2 class="title-secondary">Exportar Dados</h2>', unsafe_allow_html=True)
@@ -127,9 +163,6 @@ def reports_simple_page():
         # Exportar para CSV
         def export_csv():
             return export_df_csv(df_transactions)
-        
-        def export_excel():
-            return export_df_excel(df_transactions)
 
         with col_exp1:
             if st.button("Preparar CSV", type="primary"):
@@ -145,17 +178,23 @@ def reports_simple_page():
                 action_toast("success", "Arquivo CSV pronto para download!")
 
         with col_exp2:
+            # Excel é gerado em segundo plano; o download aparece quando o job termina
             if st.button("Preparar Excel", type="primary"):
-                show_banner("info", "Gerando arquivo Excel...")
-                excel_filename, excel_bytes, excel_mime = with_progress("Gerando Excel...", export_excel)
-                st.download_button(
-                    label="Baixar Excel",
-                    data=excel_bytes,
-                    file_name=excel_filename,
-                    mime=excel_mime,
-                    key="download_excel"
-                )
-                action_toast("success", "Arquivo Excel pronto para download!")
+                st.session_state["excel_job_id"] = submit_job(user_id, "export_excel", df=df_transactions.copy())
+            excel_job_id = st.session_state.get("excel_job_id")
+            if excel_job_id:
+                job = get_job(excel_job_id, user_id)
+                if show_job_status(job, key="refresh_excel_job"):
+                    exported = load_result(job)
+                    if exported:
+                        excel_filename, excel_bytes, excel_mime = exported
+                        st.download_button(
+                            label="Baixar Excel",
+                            data=excel_bytes,
+                            file_name=excel_filename,
+                            mime=excel_mime,
+                            key="download_excel"
+                        )
 
 # Se este script for executado diretamente (para testes ou como página principal)
 reports_simple_page()
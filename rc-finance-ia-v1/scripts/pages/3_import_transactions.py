@@ -1,5 +1,7 @@
 
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 # PATH BOOTSTRAP
@@ -8,9 +10,90 @@ project_root = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(project_root))
 
 import streamlit as st
-from scripts.utils.db_utils import bulk_insert_transactions
+from scripts.utils.db_utils import bulk_insert_transactions, list_accounts
 from scripts.utils.importers import parse_csv, parse_ofx
-from scripts.utils.ui_components import action_toast
+from scripts.utils.jobs import get_job, latest_job, load_result, submit_job
+from scripts.utils.pdf_bank_parser import iter_pdf_statement
+from scripts.utils.ui_components import action_toast, show_job_status
+
+# Tamanho do lote inserido enquanto o PDF ainda está sendo lido
+PDF_BATCH_SIZE = 200
+
+def import_pdf_streaming(uploaded_file, user_id, account_id=None):
+    """Importa um extrato PDF em lotes, inserindo enquanto as páginas são lidas."""
+    if not st.button("Importar PDF", type="primary"):
+        return
+
+    progress = st.progress(0.0, text="Lendo PDF...")
+    totals = {"inserted": 0, "duplicates": 0, "failed": 0}
+    lote = []
+    lidas = 0
+
+    def flush():
+        result = bulk_insert_transactions(user_id, lote, account_id=account_id)
+        for k in totals:
+            totals[k] += result[k]
+        lote.clear()
+
+    def on_page(page, total):
+        progress.progress(page / total, text=f"Página {page}/{total} — {lidas} transações lidas")
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+
+        for item in iter_pdf_statement(tmp_path, on_page=on_page):
+            item["user_id"] = user_id
+            lote.append(item)
+            lidas += 1
+            if len(lote) >= PDF_BATCH_SIZE:
+                flush()
+        if lote:
+            flush()
+    except Exception as e:
+        st.error(f"Erro ao importar PDF: {e}")
+        return
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    progress.progress(1.0, text=f"PDF lido — {lidas} transações")
+    if lidas:
+        st.success(
+            f"Importação concluída! Inseridas: {totals['inserted']}, Duplicadas: {totals['duplicates']}, Falhas: {totals['failed']}"
+        )
+        st.toast("Importação realizada com sucesso!", icon="✅")
+    else:
+        st.warning("Não reconheci transações no PDF.")
+
+def import_multiple_files(uploaded_files, user_id, account_id=None):
+    """Envia vários arquivos para um job de importação (parse paralelo + um único lote)."""
+    st.write(f"{len(uploaded_files)} arquivos selecionados.")
+    if st.button(f"Importar {len(uploaded_files)} arquivos", type="primary"):
+        files = [(f.name, f.getvalue()) for f in uploaded_files]
+        st.session_state["import_job_id"] = submit_job(user_id, "import", files=files, account_id=account_id)
+
+def show_import_job(user_id):
+    """Acompanha o job de importação da sessão (ou o último ainda em andamento)."""
+    job_id = st.session_state.get("import_job_id")
+    job = get_job(job_id, user_id) if job_id else latest_job(user_id, "import", active_only=True)
+    if job is None:
+        return
+    st.session_state["import_job_id"] = job["id"]
+
+    st.subheader("Importação em segundo plano")
+    if not show_job_status(job, key="refresh_import_job"):
+        return
+    result = load_result(job)
+    if not result:
+        return
+    st.dataframe(result["status"], use_container_width=True, hide_index=True)
+    st.success(
+        f"Importação concluída! Inseridas: {result['inserted']}, Duplicadas: {result['duplicates']}, Falhas: {result['failed']}"
+    )
 
 def import_transactions_page():
     st.set_page_config(page_title="Importar Transações", page_icon="⬆️", layout="wide")
@@ -32,15 +115,29 @@ def import_transactions_page():
 
     user_id = st.session_state['user_id']
 
-    st.write("Selecione um arquivo CSV ou OFX para importar suas transações.")
+    st.write("Selecione um ou mais arquivos CSV, OFX ou PDF para importar suas transações.")
+
+    contas = list_accounts(user_id)
+    nomes = dict(zip(contas["id"], contas["name"]))
+    account_id = st.selectbox("Conta de destino", options=list(nomes), format_func=nomes.get, key="import_account")
 
-    uploaded_file = st.file_uploader("Escolha um arquivo", type=["csv", "ofx"])
+    uploaded_files = st.file_uploader("Escolha os arquivos", type=["csv", "ofx", "pdf"], accept_multiple_files=True)
 
+    if len(uploaded_files) > 1:
+        import_multiple_files(uploaded_files, user_id, account_id)
+    show_import_job(user_id)
+
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
     if uploaded_file is not None:
         file_details = {"filename": uploaded_file.name, "filetype": uploaded_file.type, "filesize": uploaded_file.size}
         st.write(file_details)
 
-        file_content = uploaded_file.getvalue().decode("utf-8")
+        if uploaded_file.name.lower().endswith(".pdf"):
+            import_pdf_streaming(uploaded_file, user_id, account_id)
+            return
+
+        # bytes crus: parse_csv/parse_ofx decodificam uma vez (BOM, cabeçalho ou amostra)
+        file_content = uploaded_file.getvalue()
 
         transactions_to_insert = []
         if uploaded_file.type == "text/csv":
@@ -72,7 +169,7 @@ def import_transactions_page():
             if st.button("Confirmar Importação"):
                 try:
                     with st.spinner("Importando transações..."):
-                        result = bulk_insert_transactions(user_id, transactions_to_insert)
+                        result = bulk_insert_transactions(user_id, transactions_to_insert, account_id=account_id)
                     st.success(
                         f"Importação concluída! Inseridas: {result['inserted']}, Duplicadas: {result['duplicates']}, Falhas: {result['failed']}"
                     )
@@ -16,11 +16,11 @@ except Exception:
     logger = logging.getLogger("rc-finance-ia")
 import traceback
 
-from scripts.utils.speech_to_text import transcrever_audio
+from scripts.utils.jobs import get_job, load_result, submit_job
 from scripts.utils.voice_command_parser import parse_command
 from scripts.utils.voice_intents_exec import execute_intent
 from scripts.utils.ui_components import (
-    show_banner, action_toast, with_progress, show_empty_state, load_custom_css
+    show_banner, action_toast, with_progress, show_empty_state, load_custom_css, show_job_status
 )
 
 ROOT = Path(__file__).resolve().parents[1] # scripts/
@@ -52,15 +52,20 @@ audio_file = st.file_uploader("Faça upload de um arquivo de áudio (.wav, .mp3,
 if audio_file:
     st.audio(audio_file, format=audio_file.type)
 
-    # 3. Transcrever
+    # 3. Transcrever (job em segundo plano)
     if st.button("Transcrever", type="primary"):
-        try:
-            with st.spinner("Transcrevendo áudio..."):
-                transcribed_text = transcrever_audio(audio_file.read())
-                st.session_state.transcribed_text = transcribed_text
-                st.toast("Áudio transcrito com sucesso!", icon="✅")
-        except Exception as e:
-            st.error(f"Erro na transcrição: {e}")
+        st.session_state.transcribe_job_id = submit_job(
+            st.session_state["user_id"], "transcribe", audio=audio_file.getvalue()
+        )
+
+job_id = st.session_state.get("transcribe_job_id")
+if job_id:
+    job = get_job(job_id, st.session_state["user_id"])
+    if show_job_status(job, key="refresh_transcribe_job"):
+        if job and job["status"] == "done":
+            st.session_state.transcribed_text = load_result(job)
+            st.toast("Áudio transcrito com sucesso!", icon="✅")
+        st.session_state.transcribe_job_id = None
 
 st.markdown('</div>', unsafe_allow_html=True)
 
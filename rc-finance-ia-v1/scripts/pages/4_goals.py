@@ -10,9 +10,11 @@ sys.path.append(str(project_root))
 from scripts.utils import db_utils
 from scripts.utils import auth
 from scripts.utils import export
+from scripts.utils import simulation
 from scripts.utils.ui_components import (
     show_banner, action_toast, with_progress
 )
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
@@ -30,6 +32,19 @@ if not st.session_state["logged_in"]:
 
 user_id = st.session_state['user_id']
 
+# Metas carregadas uma vez por render: progresso, status e ordem vêm prontos do SQL
+# (cacheado até a próxima escrita do usuário)
+goals_df = db_utils.list_goals_overview(user_id)
+
+# Cards por página: só os da página atual criam widgets
+GOALS_PAGE_SIZE = 10
+STATUS_LABELS = {"done": "Concluída", "in_progress": "Em progresso", "started": "Iniciada"}
+STATUS_BADGES = {
+    "done": "<span class='badge badge-success'>Concluída</span>",
+    "in_progress": "<span class='badge badge-warning'>Em progresso</span>",
+    "started": "<span class='badge'>Iniciada</span>",
+}
+
 st.markdown('<h1 class="title-primary">Metas Financeiras</h1>', unsafe_allow_html=True)
 
 # Layout com colunas
@@ -81,7 +96,6 @@ with col1:
 
 with col2:
     st.header("Aportar em Meta")
-    goals_df = db_utils.list_goals(user_id)
     if not goals_df.empty:
         goal_names = goals_df["name"].tolist()
         selected_goal_name = st.selectbox("Selecione a Meta para Aportar", goal_names)
@@ -92,9 +106,8 @@ with col2:
             st.write(f"**Valor Alvo:** R$ {selected_goal['target_amount']:.2f}")
             st.write(f"**Aportado:** R$ {selected_goal['funded_amount']:.2f}")
             
-            progress_val = db_utils.progress(selected_goal)
-            st.progress(progress_val)
-            st.write(f"Progresso: R$ {selected_goal['funded_amount']:.2f} / R$ {selected_goal['target_amount']:.2f} ({progress_val*100:.1f}%) ")
+            st.progress(min(max(selected_goal['progress_pct'] / 100, 0.0), 1.0))
+            st.write(f"Progresso: R$ {selected_goal['funded_amount']:.2f} / R$ {selected_goal['target_amount']:.2f} ({selected_goal['progress_pct']:.1f}%) ")
 
             amount_to_fund = st.number_input("Valor do Aporte/Estorno", value=0.0, format="%.2f")
             if st.button("Aportar/Estornar"):
@@ -111,37 +124,40 @@ st.markdown("---")
 st.markdown('<h2 class="h2">Minhas Metas</h2>', unsafe_allow_html=True)
 
 if not goals_df.empty:
-    # Calcular progresso e ordenar
-    goals_df["progress_pct"] = goals_df.apply(lambda row: round(db_utils.progress(row) * 100, 1), axis=1)
-    goals_df["due_date"] = goals_df["due_date"].fillna("2099-12-31")  # Para ordenação
-    
-    # Ordenar por due_date asc e progress_pct desc
-    goals_df = goals_df.sort_values(["due_date", "progress_pct"], ascending=[True, False])
-    
+    # Chance de cumprir cada meta no prazo (Monte Carlo sobre o histórico de receitas e despesas)
+    chances = simulation.goal_probabilities(user_id).set_index("id")["probability"]
+
+    # Paginação dos cards
+    n_pages = (len(goals_df) - 1) // GOALS_PAGE_SIZE + 1
+    # página guardada pode passar do fim depois de excluir metas
+    st.session_state["goals_page"] = min(max(int(st.session_state.get("goals_page", 1)), 1), n_pages)
+    page = 1
+    if n_pages > 1:
+        page = st.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, step=1, key="goals_page")
+    inicio = (int(page) - 1) * GOALS_PAGE_SIZE
+    pagina = goals_df.iloc[inicio:inicio + GOALS_PAGE_SIZE]
+
     # Exibir como cards com progress bars
-    for _, goal in goals_df.iterrows():
+    for goal in pagina.itertuples(index=False):
         with st.container():
             col1, col2, col3 = st.columns([3, 1, 1])
             
             with col1:
-                st.markdown(f"**{goal['name']}**")
-                progress_val = goal['progress_pct'] / 100
-                st.progress(progress_val)
-                st.caption(f"R$ {goal['funded_amount']:.2f} / R$ {goal['target_amount']:.2f} ({goal['progress_pct']:.1f}%)")
+                st.markdown(f"**{goal.name}**")
+                st.progress(min(max(goal.progress_pct / 100, 0.0), 1.0))
+                st.caption(f"R$ {goal.funded_amount:.2f} / R$ {goal.target_amount:.2f} ({goal.progress_pct:.1f}%)")
             
             with col2:
-                if goal['due_date'] != "2099-12-31":
-                    st.markdown(f"<span class='badge badge-info'>Até {goal['due_date']}</span>", unsafe_allow_html=True)
+                if pd.notna(goal.due_date):
+                    st.markdown(f"<span class='badge badge-info'>Até {goal.due_date}</span>", unsafe_allow_html=True)
                 else:
                     st.markdown("<span class='badge'>Sem prazo</span>", unsafe_allow_html=True)
+                chance = chances.get(goal.id)
+                if chance is not None and pd.notna(chance) and goal.status != "done":
+                    st.caption(f"Chance no prazo: {chance * 100:.0f}%")
             
             with col3:
-                if goal['progress_pct'] >= 100:
-                    st.markdown("<span class='badge badge-success'>Concluída</span>", unsafe_allow_html=True)
-                elif goal['progress_pct'] >= 50:
-                    st.markdown("<span class='badge badge-warning'>Em progresso</span>", unsafe_allow_html=True)
-                else:
-                    st.markdown("<span class='badge'>Iniciada</span>", unsafe_allow_html=True)
+                st.markdown(STATUS_BADGES[goal.status], unsafe_allow_html=True)
             
             st.divider()
 
@@ -171,6 +187,11 @@ if not goals_df.empty:
     # Exportar CSV
     st.markdown("--- ")
     st.subheader("Exportar Metas")
+    display_df = goals_df.rename(columns={
+        "id": "ID", "name": "Meta", "target_amount": "Valor Alvo", "funded_amount": "Aportado",
+        "progress_pct": "Progresso (%)", "due_date": "Prazo", "status": "Status", "created_at": "Criada em",
+    })
+    display_df["Status"] = display_df["Status"].map(STATUS_LABELS)
     csv_filename, csv_data, csv_mimetype = export.export_df_csv(display_df)
     st.download_button(
         label="Exportar Metas (CSV)",
@@ -223,16 +244,13 @@ if not goals_df.empty:
 
                 elif allocation_strategy == "Prazo primeiro":
                     goals_in_progress["due_date_dt"] = pd.to_datetime(goals_in_progress["due_date"], errors='coerce')
-                    goals_in_progress = goals_in_progress.sort_values(by="due_date_dt", na_position='last')
-                    
-                    allocated_so_far = 0.0
-                    for index, row in goals_in_progress.iterrows():
-                        amount_to_allocate = min(row["remaining_gap"], (available_balance - allocated_so_far) / (len(goals_in_progress) - goals_in_progress.index.get_loc(index)))
-                        goals_in_progress.loc[index, "allocation"] = amount_to_allocate
-                        allocated_so_far += amount_to_allocate
+                    goals_in_progress = goals_in_progress.sort_values(by="due_date_dt", na_position='last', kind="stable")
+                    # prazo mais próximo primeiro: cada meta recebe o que sobra depois das que vencem antes
+                    gap_before = goals_in_progress["remaining_gap"].cumsum() - goals_in_progress["remaining_gap"]
+                    goals_in_progress["allocation"] = (available_balance - gap_before).clip(lower=0.0)
 
                 # Ajustar alocação para não exceder o gap restante
-                goals_in_progress["allocation"] = goals_in_progress.apply(lambda row: min(row["allocation"], row["remaining_gap"]), axis=1)
+                goals_in_progress["allocation"] = np.minimum(goals_in_progress["allocation"], goals_in_progress["remaining_gap"])
                 
                 # Distribuir o restante se a soma das alocações for menor que o saldo disponível
                 total_allocated = goals_in_progress["allocation"].sum()
@@ -242,31 +260,39 @@ if not goals_df.empty:
                     total_gap_after_initial = goals_in_progress["remaining_gap"].sum() - goals_in_progress["allocation"].sum()
                     if total_gap_after_initial > 0:
                         goals_in_progress["allocation"] += (goals_in_progress["remaining_gap"] - goals_in_progress["allocation"]) / total_gap_after_initial * remaining_to_distribute
-                        goals_in_progress["allocation"] = goals_in_progress.apply(lambda row: min(row["allocation"], row["remaining_gap"]), axis=1)
-
-                suggested_allocation = goals_in_progress[goals_in_progress["allocation"] > 0][["name", "allocation"]]
-                suggested_allocation = suggested_allocation.rename(columns={"name": "Meta", "allocation": "Valor Sugerido"})
-                suggested_allocation["Valor Sugerido"] = suggested_allocation["Valor Sugerido"].map("R$ {:.2f}".format)
+                        goals_in_progress["allocation"] = np.minimum(goals_in_progress["allocation"], goals_in_progress["remaining_gap"])
 
-                if not suggested_allocation.empty:
-                    st.subheader("Sugestão de Distribuição:")
-                    st.dataframe(suggested_allocation, use_container_width=True)
-                    
-                    if st.button("Aplicar Sugestão de Alocação"):
-                        try:
-                            for index, row in goals_in_progress.iterrows():
-                                if row["allocation"] > 0:
-                                    db_utils.fund_goal(row["id"], user_id, row["allocation"])
-                            st.success("Sugestão de alocação aplicada com sucesso!")
-                            st.rerun()
-                        except Exception as e:
-                            st.error(f"Erro ao aplicar sugestão de alocação: {e}")
-                else:
-                    st.info("Nenhuma meta em andamento para alocar o saldo disponível.")
+                # guardado na sessão: o botão de aplicar dispara um novo rerun
+                sugestao = goals_in_progress[goals_in_progress["allocation"] > 0]
+                st.session_state["goals_allocation_plan"] = dict(zip(sugestao["id"], sugestao["allocation"]))
             else:
+                st.session_state.pop("goals_allocation_plan", None)
                 st.info("Nenhuma meta em andamento para alocar o saldo disponível.")
         else:
             st.warning("Por favor, insira um saldo disponível maior que zero.")
+
+    plano = st.session_state.get("goals_allocation_plan")
+    if plano is not None:
+        if plano:
+            nomes = goals_df.set_index("id")["name"]
+            suggested_allocation = pd.DataFrame({
+                "Meta": [nomes.get(goal_id, goal_id) for goal_id in plano],
+                "Valor Sugerido": [f"R$ {valor:.2f}" for valor in plano.values()],
+            })
+            st.subheader("Sugestão de Distribuição:")
+            st.dataframe(suggested_allocation, use_container_width=True)
+
+            if st.button("Aplicar Sugestão de Alocação"):
+                try:
+                    # todas as metas em uma transação (um commit) via apply_allocation
+                    db_utils.apply_allocation(user_id, plano)
+                    del st.session_state["goals_allocation_plan"]
+                    action_toast("success", "Sugestão de alocação aplicada com sucesso!")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Erro ao aplicar sugestão de alocação: {e}")
+        else:
+            st.info("Nenhuma meta em andamento para alocar o saldo disponível.")
 else:
     st.info("Nenhuma meta cadastrada para sugerir alocação.")
 
@@ -0,0 +1,396 @@
+# scripts/tools/bench.py
+import argparse, os, random, re, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # .../scripts
+sys.path.insert(0, os.path.dirname(ROOT))                           # projeto
+
+MEMOS = ["PIX ENVIADO", "SUPERMERCADO", "SALARIO", "FARMACIA", "POSTO COMBUSTIVEL",
+         "TRANSFERENCIA RECEBIDA", "ALUGUEL", "INTERNET", "RESTAURANTE", "TARIFA PACOTE"]
+
+
+def _brl(v):
+    return f"{v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def synthetic_statement(layout, n_tx, per_page=40, seed=0):
+    """Gera um extrato sintético (lista de páginas, cada uma lista de linhas) para um layout."""
+    rnd = random.Random(seed)
+    saldo = 0.0
+    pages, page = [], ["EXTRATO DE CONTA CORRENTE", "Período: 01/01/2025 a 31/12/2025"]
+    for i in range(n_tx):
+        d = f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025"
+        v = rnd.uniform(1, 5000)
+        credit = rnd.random() < 0.3
+        memo = rnd.choice(MEMOS)
+        if layout == "debito_credito":
+            sinal = "" if credit else "-"
+            page.append(f"{'Crédito' if credit else 'Débito'} {d} {sinal}R$ {_brl(v)} DOC{i:06d} {memo}")
+        elif layout == "data_valor_sinal":
+            saldo = saldo + v if credit else saldo - v
+            # metade das linhas com a coluna de saldo corrente no fim
+            fim = f" {_brl(abs(saldo))} {'C' if saldo >= 0 else 'D'}" if rnd.random() < 0.5 else ""
+            page.append(f"{d} {memo} {_brl(v)} {'C' if credit else 'D'}{fim}")
+        else:
+            raise ValueError(f"Layout sem gerador sintético: {layout}")
+        if rnd.random() < 0.2:
+            page.append(f"DETALHE {rnd.randint(1000, 9999)} AG 0001")  # memorando quebrado
+        if len(page) >= per_page:
+            pages.append(page)
+            page = []
+    if page:
+        pages.append(page)
+    return pages
+
+
+def _best_of(fn, repeat):
+    """Uma execução de aquecimento fora da medição; devolve (melhor tempo de `repeat`, resultado)."""
+    out = fn()
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def bench_layouts(n_tx, repeat, profile=False):
+    from scripts.utils import pdf_bank_parser as pbp
+
+    ok_all = True
+    for name in pbp.LAYOUTS:
+        pages = synthetic_statement(name, n_tx)
+        primeira = "\n".join(pages[0])
+
+        # a detecção roda uma vez, sobre a 1ª página; medida à parte do parsing
+        t_detect, detected = _best_of(lambda: pbp.detect_layout(primeira).name, repeat)
+        t_registry, got = _best_of(lambda: list(pbp._iter_pages_transactions(iter(pages))), repeat)
+
+        # referência: sem registro — cada linha/bloco testa todas as regexes (re.match com o padrão em texto)
+        def naive_path():
+            blocos, atual = [], ""
+            for pg in pages:
+                for ln in pg:
+                    if any(re.match(lay.block_start.pattern, ln, lay.block_start.flags)
+                           for lay in pbp.LAYOUTS.values()):
+                        if atual:
+                            blocos.append(atual)
+                        atual = ln
+                    else:
+                        atual += " " + ln
+            if atual:
+                blocos.append(atual)
+            naive = 0
+            for b in blocos:
+                for lay in pbp.LAYOUTS.values():
+                    m = re.match(lay.line.pattern, b, lay.line.flags)
+                    if m:
+                        lay.to_item(m)
+                        naive += 1
+                        break
+            return naive
+        t_naive, _ = _best_of(naive_path, repeat)
+
+        # nenhum valor (p.ex. o saldo corrente) pode vazar para o histórico
+        vazou = sum(1 for t in got if re.search(r"\d,\d{2}", t["description"]))
+        ok = detected == name and len(got) == n_tx and not vazou
+        ok_all = ok_all and ok
+        print(f"[{'OK' if ok else 'ERRO'}] layout={name} detectado={detected} "
+              f"transações={len(got)}/{n_tx} valores no histórico={vazou} detecção={t_detect*1000:.2f}ms "
+              f"registro={t_registry*1000:.1f}ms todas-as-regex={t_naive*1000:.1f}ms "
+              f"({t_naive/max(t_registry, 1e-9):.1f}x, melhor de {max(repeat, 1)})")
+        if profile:
+            import cProfile, pstats
+            prof = cProfile.Profile()
+            prof.runcall(lambda: list(pbp._iter_pages_transactions(iter(pages))))
+            pstats.Stats(prof).sort_stats("cumulative").print_stats(8)
+    return ok_all
+
+
+def synthetic_ofx(path, n_tx, seed=0):
+    """Grava um OFX 1.x (SGML, CHARSET 1252) sintético com n_tx transações."""
+    rnd = random.Random(seed)
+    with open(path, "wb") as f:
+        f.write(b"OFXHEADER:100\r\nDATA:OFXSGML\r\nVERSION:102\r\nSECURITY:NONE\r\n"
+                b"ENCODING:USASCII\r\nCHARSET:1252\r\nCOMPRESSION:NONE\r\n"
+                b"OLDFILEUID:NONE\r\nNEWFILEUID:NONE\r\n\r\n")
+        f.write(b"<OFX><SIGNONMSGSRSV1><SONRS><STATUS><CODE>0<SEVERITY>INFO</STATUS>"
+                b"<DTSERVER>20250101<LANGUAGE>POR</SONRS></SIGNONMSGSRSV1>"
+                b"<BANKMSGSRSV1><STMTTRNRS><TRNUID>1<STATUS><CODE>0<SEVERITY>INFO</STATUS>"
+                b"<STMTRS><CURDEF>BRL<BANKACCTFROM><BANKID>0001<ACCTID>12345<ACCTTYPE>CHECKING"
+                b"</BANKACCTFROM><BANKTRANLIST><DTSTART>20250101<DTEND>20251231\r\n")
+        for i in range(n_tx):
+            v = rnd.uniform(-3000, 3000)
+            memo = rnd.choice(MEMOS) + " Ação"
+            f.write((f"<STMTTRN>\r\n<TRNTYPE>{'CREDIT' if v > 0 else 'DEBIT'}\r\n"
+                     f"<DTPOSTED>2025{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}120000[-3:BRT]\r\n"
+                     f"<TRNAMT>{v:.2f}\r\n<FITID>{i}\r\n<NAME>LOJA {i % 97}\r\n"
+                     f"<MEMO>{memo}\r\n</STMTTRN>\r\n").encode("cp1252"))
+        f.write(b"</BANKTRANLIST><LEDGERBAL><BALAMT>0.00<DTASOF>20251231</LEDGERBAL>"
+                b"</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\r\n")
+
+
+def _measure(fn):
+    """(segundos, pico de memória em MiB, resultado) — tempo medido sem tracemalloc."""
+    import gc, tracemalloc
+    gc.collect()
+    t0 = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t0
+    del out
+    gc.collect()
+    tracemalloc.start()
+    out = fn()
+    peak = tracemalloc.get_traced_memory()[1] / (1 << 20)
+    tracemalloc.stop()
+    return secs, peak, out
+
+
+def bench_ofx(n_tx):
+    import tempfile
+    from scripts.utils import ofx_import
+
+    fd, path = tempfile.mkstemp(suffix=".ofx")
+    os.close(fd)
+    try:
+        synthetic_ofx(path, n_tx)
+        size = os.path.getsize(path) / (1 << 20)
+        print(f"[..] OFX sintético: {n_tx} transações, {size:.1f} MiB")
+
+        secs, peak, fast = _measure(lambda: ofx_import.importar_ofx(path))
+        ok = len(fast) == n_tx
+        print(f"[{'OK' if ok else 'ERRO'}] rápido   : {secs:.2f}s pico={peak:.1f}MiB transações={len(fast)}")
+
+        if not ofx_import._HAVE_OFXPARSE:
+            print("[--] ofxparse não instalado; comparação pulada.")
+            return ok
+        secs_o, peak_o, slow = _measure(lambda: ofx_import._importar_ofx_ofxparse(path))
+        same = fast == slow
+        print(f"[{'OK' if same else 'ERRO'}] ofxparse : {secs_o:.2f}s pico={peak_o:.1f}MiB transações={len(slow)} "
+              f"(rápido {secs_o/max(secs, 1e-9):.1f}x, memória {peak_o/max(peak, 1e-9):.1f}x, resultados iguais={same})")
+        return ok and same
+    finally:
+        os.remove(path)
+
+
+def synthetic_transactions_db(path, n_tx, user_id=1, seed=0):
+    """Cria um finance.db sintético (schema de init_db) com n_tx transações de um usuário."""
+    from scripts.utils import db_utils
+
+    db_utils.DB_PATH = path
+    db_utils.init_db()
+    rnd = random.Random(seed)
+    cats = ["Alimentação", "Transporte", "Moradia", "Saúde", "Lazer", "Salário", "Compras", "Utilidades"]
+    rows = []
+    for i in range(n_tx):
+        credit = rnd.random() < 0.3
+        rows.append((user_id, f"{rnd.randint(2015, 2025)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                     f"{rnd.choice(MEMOS)} {i}", rnd.uniform(1, 3000) * (1 if credit else -1),
+                     rnd.choice(cats), "income" if credit else "expense"))
+    con = db_utils.get_db().conn
+    con.executemany("INSERT INTO transactions(user_id, date, description, amount, category, type) "
+                    "VALUES (?,?,?,?,?,?)", rows)
+    con.commit()
+
+
+def bench_duckdb(n_tx):
+    import tempfile
+    import numpy as np
+    import pandas as pd
+
+    tmp = tempfile.mkdtemp()
+    from scripts.utils import analytics_snapshot
+    analytics_snapshot.SNAPSHOT_DIR = __import__("pathlib").Path(tmp) / "analytics"
+    synthetic_transactions_db(__import__("pathlib").Path(tmp) / "finance.db", n_tx)
+    from scripts.utils import analytics_duckdb as q, db_utils
+    print(f"[..] {n_tx} transações sintéticas em {tmp}")
+
+    filters = ("2018-01-01", "2024-12-31", None, None)
+
+    def pandas_path():
+        # caminho antigo: carrega tudo e agrega em pandas
+        df = pd.read_sql_query("SELECT date, category, type, amount FROM transactions WHERE user_id = ?",
+                               db_utils.get_db().conn, params=[1])
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        df = df[(df["date"] >= filters[0]) & (df["date"] <= filters[1])]
+        df["v"] = df["amount"].abs()
+        df["month"] = df["date"].dt.to_period("M").dt.to_timestamp()
+        cat = df[df["type"] == "expense"].groupby("category")["v"].sum().sort_values(ascending=False)
+        mon = df.pivot_table(index="month", columns="type", values="v", aggfunc="sum", fill_value=0.0)
+        roll = mon["expense"].rolling(3, min_periods=1).mean()
+        return cat, mon, roll
+
+    def duck_path():
+        return (q._category_breakdown(1, filters[:3] + ("expense",)),
+                q._monthly_comparison(1, filters),
+                q._rolling_average(1, filters, 3))
+
+    if not q.available():
+        print("[--] duckdb não instalado; comparação pulada.")
+        return None
+    t0 = time.perf_counter()
+    q._connect()
+    q._source(1)  # monta o snapshot (ou anexa o SQLite) fora da medição das consultas
+    t_prep = time.perf_counter() - t0
+    fonte = "sqlite scanner" if q._sqlite_ok else "snapshot Parquet"
+    print(f"[..] fonte DuckDB: {fonte} (preparo {t_prep:.2f}s)")
+
+    t0 = time.perf_counter()
+    cat, mon, roll = pandas_path()
+    t_pd = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    dcat, dmon, droll = duck_path()
+    t_dk = time.perf_counter() - t0
+
+    same = (np.allclose(cat.values, dcat["total"].values)
+            and np.allclose(mon["expense"].values, dmon["expense"].values)
+            and np.allclose(roll.values, droll["expense_rolling"].values))
+    print(f"[{'OK' if same else 'ERRO'}] pandas={t_pd:.2f}s duckdb={t_dk:.2f}s "
+          f"({t_pd/max(t_dk, 1e-9):.1f}x) resultados iguais={same}")
+    return bool(same)
+
+
+def bench_forecast(n_users, months, horizon=6):
+    import logging
+    import tempfile
+    import warnings
+    from pathlib import Path
+    import numpy as np
+    import pandas as pd
+    from scripts.utils import forecasting
+
+    rnd = np.random.default_rng(0)
+    lengths = rnd.integers(6, months + 1, n_users)
+    Y = np.full((n_users, months), np.nan)
+    sazonal = 800 * np.sin(2 * np.pi * np.arange(months) / 12)
+    for i, n in enumerate(lengths):
+        Y[i, months - n:] = (rnd.normal(1500, 400) + rnd.normal(0, 30) * np.arange(n)
+                             + sazonal[months - n:] + rnd.normal(0, 500, n))
+    print(f"[..] {n_users} usuários, {months} meses (séries de {lengths.min()} a {lengths.max()} meses)")
+
+    t0 = time.perf_counter()
+    mean, lower, upper = forecasting.predict(forecasting.fit(Y), horizon)
+    t_batch = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for i, n in enumerate(lengths):
+        forecasting.predict(forecasting.fit(Y[i, months - n:]), horizon)
+    t_one = time.perf_counter() - t0
+
+    ok = np.isfinite(mean).all() and (lower <= mean).all() and (mean <= upper).all()
+    print(f"[{'OK' if ok else 'ERRO'}] numpy lote    : {t_batch * 1000 / n_users:.3f} ms/usuário ({t_batch:.2f}s)")
+    print(f"[OK] numpy por usuário: {t_one * 1000 / n_users:.3f} ms/usuário ({t_one:.2f}s)")
+
+    try:
+        from scripts.utils import db_utils, projections
+    except ImportError:
+        print("[--] statsmodels não instalado; comparação pulada.")
+        return ok
+    # cache de modelos em um banco temporário (não toca o data/finance.db)
+    db_utils.DB_PATH = Path(tempfile.mkdtemp()) / "finance.db"
+    db_utils.init_db()
+    logging.getLogger(projections.__name__).setLevel(logging.ERROR)
+    monthlies = [pd.DataFrame({"balance": Y[i, months - n:]}, index=pd.period_range("2020-01", periods=n, freq="M"))
+                 for i, n in enumerate(lengths)]
+
+    def run():
+        # quantas séries (com >= 4 meses) saíram do Holt-Winters e não do fallback linear
+        hw = 0
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for monthly in monthlies:
+                fc = projections.forecast_balance(monthly, horizon=horizon)
+                if len(monthly) >= 4:
+                    model = projections._load_model(projections._model_key(monthly["balance"].to_numpy(),
+                                                                         projections.MODEL_CONFIG))
+                    hw += model is not None and np.isclose(
+                        fc["balance_forecast"].iloc[0], model["level"] + model["trend"])
+        return hw
+
+    t0 = time.perf_counter()
+    hw = run()
+    t_sm = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    run()
+    t_warm = time.perf_counter() - t0
+    esperado = int((lengths >= 4).sum())
+    ok_sm = hw == esperado
+    print(f"[{'OK' if ok_sm else 'ERRO'}] statsmodels   : {t_sm * 1000 / n_users:.3f} ms/usuário ({t_sm:.2f}s) "
+          f"(lote {t_sm / max(t_batch, 1e-9):.0f}x, por usuário {t_sm / max(t_one, 1e-9):.0f}x) "
+          f"Holt-Winters={hw}/{esperado}")
+    print(f"[OK] statsmodels com cache de modelos: {t_warm * 1000 / n_users:.3f} ms/usuário ({t_warm:.2f}s)")
+    return ok and ok_sm
+
+
+def bench_allocate(cases, max_goals, seed=0):
+    """Propriedades do water-filling em instâncias aleatórias + tempo para muitas metas."""
+    import copy
+    from datetime import date
+    import numpy as np
+    from scripts.utils.allocation import Goal, allocate, water_fill
+
+    rnd = np.random.default_rng(seed)
+    falhas = 0
+    for case in range(cases):
+        n = int(rnd.integers(1, max_goals + 1))
+        caps = rnd.choice([0.0, 1.0, 1000.0], n) * rnd.random(n)
+        scores = np.where(rnd.random(n) < 0.1, 0.0, rnd.random(n))
+        balance = float(rnd.choice([0.0, rnd.random() * caps.sum(), rnd.random() * 2 * caps.sum() + 1]))
+        x = water_fill(balance, caps, scores)
+        elig = (caps > 0) & (scores > 0)
+        esperado = min(balance, caps[elig].sum())
+        livre = elig & (x < caps - 1e-9)
+        lam = x[livre] / scores[livre]
+        ok = (abs(x.sum() - esperado) <= 1e-6 * max(1.0, esperado)
+              and (x >= 0).all() and (x <= caps + 1e-9).all() and (x[~elig] == 0).all()
+              # metas não saturadas recebem a mesma proporção do score; saturadas teriam ao menos isso
+              and (len(lam) == 0 or (np.ptp(lam) <= 1e-6 * max(1.0, lam.max())
+                                     and (caps[elig & ~livre] / scores[elig & ~livre] <= lam.max() + 1e-6).all())))
+        goals = [Goal(i, f"g{i}", float(c), None, 0.5, 0.5, 0.0, 0.5) for i, c in enumerate(caps)]
+        antes = copy.deepcopy(goals)
+        plano = allocate(balance, list(zip(goals, scores)))
+        ok = ok and goals == antes and abs(sum(plano.values()) - esperado) <= 1e-6 * max(1.0, esperado)
+        if not ok:
+            falhas += 1
+            print(f"[ERRO] caso {case}: n={n} saldo={balance:.2f} alocado={x.sum():.2f} esperado={esperado:.2f}")
+    print(f"[{'OK' if not falhas else 'ERRO'}] {cases} casos aleatórios: total = min(saldo, soma dos remaining), "
+          f"tetos respeitados, entradas intactas ({falhas} falhas)")
+
+    n = 100000
+    caps, scores = rnd.random(n) * 1000, rnd.random(n)
+    t0 = time.perf_counter()
+    water_fill(caps.sum() / 2, caps, scores)
+    print(f"[OK] {n} metas em {(time.perf_counter() - t0) * 1000:.1f} ms")
+    return not falhas
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("layouts", help="registro de layouts de PDF vs todas as regex por linha")
+    p.add_argument("--n", type=int, default=20000)
+    p.add_argument("--repeat", type=int, default=5, help="execuções medidas (após 1 de aquecimento); vale a melhor")
+    p.add_argument("--profile", action="store_true", help="cProfile do caminho com registro")
+    p = sub.add_parser("ofx", help="parser OFX rápido vs ofxparse (tempo e pico de memória)")
+    p.add_argument("--n", type=int, default=100000)
+    p = sub.add_parser("duckdb", help="consultas de relatório: DuckDB vs pandas carregando tudo")
+    p.add_argument("--n", type=int, default=1000000)
+    p = sub.add_parser("forecast", help="projeção vetorizada (NumPy) vs Holt-Winters do statsmodels por usuário")
+    p.add_argument("--users", type=int, default=500)
+    p.add_argument("--months", type=int, default=60)
+    p = sub.add_parser("allocate", help="propriedades e tempo do alocador water-filling")
+    p.add_argument("--cases", type=int, default=2000)
+    p.add_argument("--goals", type=int, default=50)
+    args = ap.parse_args()
+    # subcomandos com checagens devolvem False quando alguma linha saiu como [ERRO]
+    ok = None
+    if args.cmd == "layouts":
+        ok = bench_layouts(args.n, args.repeat, args.profile)
+    elif args.cmd == "ofx":
+        ok = bench_ofx(args.n)
+    elif args.cmd == "duckdb":
+        ok = bench_duckdb(args.n)
+    elif args.cmd == "forecast":
+        ok = bench_forecast(args.users, args.months)
+    elif args.cmd == "allocate":
+        ok = bench_allocate(args.cases, args.goals)
+    sys.exit(1 if ok is False else 0)
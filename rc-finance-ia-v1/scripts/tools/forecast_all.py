@@ -0,0 +1,123 @@
+# scripts/tools/forecast_all.py
+"""Pré-calcula a projeção de saldo de todos os usuários e grava na tabela `forecasts`."""
+import argparse, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # .../scripts
+sys.path.insert(0, os.path.dirname(ROOT))                           # projeto
+
+import numpy as np
+
+from scripts.utils import forecasting
+from scripts.utils.db_utils import SIGNED_AMOUNT_SQL, get_db, init_db
+
+# Usuários por tarefa do pool: cada tarefa ajusta a sua matriz de uma vez
+CHUNK_USERS = 256
+
+
+def load_series():
+    """
+    Saldo líquido mensal (meses fechados) de todos os usuários, em uma consulta.
+
+    Meses viram ordinais inteiros (ano * 12 + mês - 1) para montar as matrizes
+    em NumPy sem um objeto pandas por usuário.
+    """
+    con = get_db().conn
+    current_month = date.today().strftime("%Y-%m")
+    rec = np.array(con.execute(
+        "SELECT user_id, CAST(substr(date, 1, 4) AS INTEGER) * 12 + CAST(substr(date, 6, 2) AS INTEGER) - 1, "
+        f"SUM({SIGNED_AMOUNT_SQL}) FROM transactions WHERE date < ? GROUP BY 1, 2 ORDER BY 1, 2",
+        (f"{current_month}-01",),
+    ).fetchall(), dtype=float).reshape(-1, 3)
+    users, first_idx = np.unique(rec[:, 0].astype(np.int64), return_index=True)
+    months = rec[:, 1].astype(np.int64)
+    last_idx = np.append(first_idx[1:], len(rec))[:len(users)] - 1
+    data = {
+        "users": users,
+        "first": months[first_idx],
+        "last": months[last_idx],
+        # saldo no fim do último mês fechado = soma de todo o histórico líquido
+        "start": np.add.reduceat(rec[:, 2], first_idx) if len(rec) else np.zeros(0),
+        "row_of": np.repeat(np.arange(len(users)), np.diff(np.append(first_idx, len(rec)))[:len(users)]),
+        "month": months,
+        "net": rec[:, 2],
+    }
+    keep = data["last"] - data["first"] >= 1  # pelo menos dois meses
+    versions = dict(con.execute("SELECT user_id, version FROM data_versions").fetchall())
+    return data, keep, versions
+
+
+def _fit_chunk(task):
+    """Ajusta um bloco de usuários (séries alinhadas à direita, NaN à esquerda)."""
+    rows, matrix, starts, horizon, level = task
+    params = forecasting.fit(matrix)
+    return rows, forecasting.cumulative_paths(params, starts, horizon, level)
+
+
+def _tasks(data, keep, horizon, level):
+    rows = np.flatnonzero(keep)
+    lengths = data["last"] - data["first"] + 1
+    for i in range(0, len(rows), CHUNK_USERS):
+        chunk = rows[i:i + CHUNK_USERS]
+        width = int(lengths[chunk].max())
+        # meses sem movimento dentro do histórico valem 0; antes do primeiro mês, NaN
+        cols = np.arange(width)
+        matrix = np.where(cols >= width - lengths[chunk][:, None], 0.0, np.nan)
+        pos = np.full(len(data["users"]), -1)
+        pos[chunk] = np.arange(len(chunk))
+        sel = pos[data["row_of"]] >= 0
+        r = pos[data["row_of"][sel]]
+        matrix[r, width - 1 - (data["last"][data["row_of"][sel]] - data["month"][sel])] = data["net"][sel]
+        yield chunk, matrix, data["start"][chunk], horizon, level
+
+
+def _month(ordinal: int) -> str:
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+def forecast_all(horizon=6, level=0.95, workers=None):
+    t0 = time.perf_counter()
+    init_db()
+    data, keep, versions = load_series()
+    t_load = time.perf_counter() - t0
+
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk, (net, path, lower, upper) in pool.map(_fit_chunk, _tasks(data, keep, horizon, level)):
+            for row, idx in enumerate(chunk):
+                u = int(data["users"][idx])
+                last = int(data["last"][idx])
+                for h in range(horizon):
+                    rows.append((u, _month(last + 1 + h), float(net[row, h]), float(path[row, h]),
+                                 float(lower[row, h]), float(upper[row, h]), versions.get(u, 0), generated_at))
+
+    con = get_db().conn
+    try:
+        con.execute("DELETE FROM forecasts")
+        con.executemany(
+            "INSERT INTO forecasts(user_id, month, net_forecast, balance_forecast, balance_lower, "
+            "balance_upper, data_version, generated_at) VALUES (?,?,?,?,?,?,?,?)",
+            rows,
+        )
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    total = time.perf_counter() - t0
+    n = int(keep.sum())
+    print(f"[OK] {n} usuários projetados ({horizon} meses) em {total:.2f}s "
+          f"(leitura {t_load:.2f}s, {n / max(total, 1e-9):.0f} usuários/s)")
+    return n
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--horizon", type=int, default=6)
+    ap.add_argument("--level", type=float, default=0.95)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    forecast_all(args.horizon, args.level, args.workers)
+    sys.exit(0)
@@ -11,6 +11,12 @@ def backup():
 def smoke():
     return subprocess.call(f"{sys.executable} scripts/tools/smoke.py", shell=True)
 
+def forecast_all():
+    return subprocess.call(f"{sys.executable} scripts/tools/forecast_all.py", shell=True)
+
+def test():
+    return subprocess.call(f"{sys.executable} -m pytest -q tests", shell=True)
+
 def reset_db():
     db = os.path.join(ROOT, "..", "data", "finance.db")
     try:
@@ -23,7 +29,7 @@ def reset_db():
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("cmd", choices=["run", "backup", "smoke", "reset-db"])
+    ap.add_argument("cmd", choices=["run", "backup", "smoke", "test", "forecast-all", "reset-db"])
     args = ap.parse_args()
-    rc = {"run": run_app, "backup": backup, "smoke": smoke, "reset-db": reset_db}[args.cmd]()
+    rc = {"run": run_app, "backup": backup, "smoke": smoke, "test": test, "forecast-all": forecast_all, "reset-db": reset_db}[args.cmd]()
     sys.exit(rc)
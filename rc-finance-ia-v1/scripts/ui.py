@@ -33,15 +33,19 @@ import tempfile
 import hashlib
 
 # Importações dos módulos utilitários
-from scripts.utils.db_utils import salvar_transacao, get_db, init_db, insert_transaction, bulk_insert_transactions
+from scripts.utils.db_utils import salvar_transacao, get_db, get_data_version, init_db, insert_transaction, bulk_insert_transactions, get_account_balances, list_goals, apply_allocation
+from scripts.utils.planner import plan_for_user
+from scripts.utils.analytics_snapshot import load_transactions
 from scripts.utils.export import export_df_csv, export_df_excel
-from scripts.utils.projections_simple import monthly_aggregate, forecast_balance
-from scripts.utils.allocation import Goal, compute_scores, allocate, update_weights
+from scripts.utils.projections_simple import monthly_aggregate
+from scripts.utils.forecasting import stored_forecast
+from scripts.utils.allocation import Goal, compute_scores, allocate, get_user_weights
 from scripts.utils.importers import parse_csv, parse_ofx
+from scripts.utils.jobs import get_job, load_result, recover_jobs, submit_job
 from scripts.utils.ui_components import (
     show_skeleton_metric, show_skeleton_table,
     show_banner, action_toast, with_progress, create_metric_card,
-    show_skeleton_chart,
+    show_skeleton_chart, show_job_status,
 )
 # Paths com pathlib
 ROOT = Path(__file__).resolve().parent.parent.parent # RC-Finance-IA/
@@ -53,8 +57,9 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-# Inicializa o banco de dados
+# Inicializa o banco de dados e recupera jobs órfãos de um servidor anterior (uma vez por processo)
 init_db()
+recover_jobs()
 
 # --- Configuração do Streamlit ---
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
@@ -112,13 +117,29 @@ def _normalize_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-@st.cache_data(ttl=30)
 def get_user_transactions(user_id):
-    """Carrega transações do usuário com cache"""
-    db = get_db()
-    if "transactions" in db.table_names():
-        return pd.DataFrame(list(db["transactions"].rows_where("user_id = ?", (user_id,))))
-    return pd.DataFrame()
+    """Carrega transações do usuário do snapshot colunar (cache invalidado a cada escrita)"""
+    return load_transactions(user_id)
+
+def _dashboard_forecast(user_id):
+    """
+    Projeção do dashboard: a pré-calculada pelo forecast-all quando ainda vale
+    para os dados atuais; senão um job "forecast" em segundo plano, reenviado
+    só quando a versão dos dados muda. None enquanto o job não termina.
+    """
+    forecast_df = stored_forecast(user_id)
+    if forecast_df is not None:
+        return forecast_df
+    version = get_data_version(user_id)
+    job_id, job_version = st.session_state.get("forecast_job", (None, None))
+    if job_id is None or job_version != version:
+        job_id = submit_job(user_id, "forecast", horizon=6)
+        st.session_state["forecast_job"] = (job_id, version)
+    job = get_job(job_id, user_id)
+    if not show_job_status(job, key="refresh_forecast_job"):
+        return None
+    return load_result(job)
+
 
 def render_dashboard():
     st.markdown('<h1 class="h1">RC-Finance-IA — Dashboard</h1>', unsafe_allow_html=True)
@@ -172,8 +193,8 @@ def render_dashboard():
     # Agregação mensal
     monthly_df = monthly_aggregate(df)
 
-    # Projeção de saldo
-    forecast_df = forecast_balance(monthly_df)
+    # Projeção de saldo (fora do caminho da requisição: forecast-all ou job em segundo plano)
+    forecast_df = _dashboard_forecast(user_id)
 
     # Métricas gerais
     income = df.loc[df["type"] == "income", "amount"].sum()
@@ -183,7 +204,9 @@ def render_dashboard():
 
     f = lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
-    saldo_val = float(saldo_total)
+    # Saldo mantido incrementalmente por conta (account_balances)
+    contas = get_account_balances(user_id)
+    saldo_val = float(contas["balance"].sum()) if not contas.empty else float(saldo_total)
     st.markdown(
         f"""
         <div style="display:flex;gap:16px;flex-wrap:wrap">
@@ -204,6 +227,12 @@ def render_dashboard():
         unsafe_allow_html=True,
     )
 
+    contas = contas[contas["tx_count"] > 0]
+    if len(contas) > 1:
+        for col, (_, conta) in zip(st.columns(len(contas)), contas.iterrows()):
+            with col:
+                create_metric_card(conta["name"], f(conta["balance"]))
+
     col1, col2, col3 = st.columns(3)
     with col1:
         create_metric_card("Receitas", f(income))
@@ -231,10 +260,14 @@ def render_dashboard():
         monthly_df["income"].plot(ax=ax, label="Receita", color="green")
         monthly_df["expense"].plot(ax=ax, label="Despesa", color="red")
         monthly_df["balance"].plot(ax=ax, label="Saldo", color="blue")
-        if not forecast_df.empty:
+        if forecast_df is not None and not forecast_df.empty:
             forecast_df["balance_forecast"].plot(
                 ax=ax, label="Projeção de Saldo", linestyle=":", color="blue"
             )
+            ax.fill_between(
+                forecast_df.index, forecast_df["balance_lower"], forecast_df["balance_upper"],
+                color="blue", alpha=0.1, label="Intervalo de 95%"
+            )
         ax.set_title("Receita, Despesa e Saldo Mensal")
         ax.set_ylabel("Valor (R$)")
         ax.legend()
@@ -324,9 +357,31 @@ def render_dashboard():
             else:
                 show_banner("info", "Nenhuma despesa ou despesas negativas no período selecionado para o gráfico de pizza.")
 
-        # Gráfico de barras (planejado x realizado de metas) - Placeholder, pois não há dados de metas no DF atual
+        # Gráfico de barras (planejado x realizado de metas): aportado hoje + cronograma do planner até o prazo
         st.markdown('<h3 class="subtitle">Planejado vs Realizado (Metas)</h3>', unsafe_allow_html=True)
-        show_banner("info", "Funcionalidade de metas ainda não implementada. Este gráfico será preenchido quando dados de metas estiverem disponíveis.")
+        plano = plan_for_user(user_id)
+        if plano is None:
+            show_banner("info", "Cadastre metas e tenha ao menos dois meses de histórico para ver o plano de aportes.")
+        else:
+            schedule, resumo = plano
+            metas = list_goals(user_id).set_index("id").loc[resumo["id"]]
+            realizado = metas["funded_amount"].fillna(0.0).to_numpy()
+            fig, ax = plt.subplots(figsize=(10, 5))
+            x = range(len(resumo))
+            ax.bar([i - 0.2 for i in x], realizado + resumo["planned"].to_numpy(), width=0.4,
+                   label="Planejado até o prazo", color="#7C3AED")
+            ax.bar([i + 0.2 for i in x], realizado, width=0.4, label="Realizado", color="green")
+            ax.scatter(list(x), metas["target_amount"].to_numpy(), marker="_", s=400, color="black", label="Valor alvo")
+            ax.set_xticks(list(x))
+            ax.set_xticklabels(resumo["name"], rotation=30, ha="right")
+            ax.set_ylabel("Valor (R$)")
+            ax.legend()
+            st.pyplot(fig)
+            plt.close(fig)
+            with st.expander("Cronograma de aportes mês a mês"):
+                cronograma = schedule.rename(columns=dict(zip(resumo["id"], resumo["name"])))
+                cronograma.index = cronograma.index.strftime("%Y-%m")
+                st.dataframe(cronograma.round(2), use_container_width=True)
     else:
         show_banner("info", "Nenhuma despesa no período selecionado")
 
@@ -345,22 +400,22 @@ def render_goals():
 
     sample_goals = []
     for g_data in goals_data:
+        target = g_data["target_amount"] or 0.0
+        funded = g_data.get("funded_amount") or 0.0
         sample_goals.append(Goal(
             id=g_data["id"],
             name=g_data["name"],
+            remaining=max(target - funded, 0.0),
             due_date=date.fromisoformat(g_data["due_date"]) if g_data["due_date"] else None,
-            target_amount=g_data["target_amount"],
-            funded_amount=g_data.get("funded_amount", 0.0),
-            # Adicionar outros campos se existirem no DB e forem necessários para Goal
             impact=0.9, # Placeholder
             priority_user=0.8, # Placeholder
-            funded_pct=g_data.get("funded_amount", 0.0) / g_data["target_amount"] if g_data["target_amount"] else 0.0,
+            funded_pct=min(max(funded / target, 0.0), 1.0) if target else 0.0,
             stability_hint=0.7 # Placeholder
         ))
 
     st.subheader("Metas Atuais")
     if sample_goals:
-        goals_df = pd.DataFrame([g.__dict__ for g in sample_goals])
+        goals_df = pd.DataFrame([g.as_dict() for g in sample_goals])
         st.dataframe(goals_df)
     else:
         st.info("Nenhuma meta definida para o seu usuário.")
@@ -373,48 +428,48 @@ def render_goals():
         step=100.0,
     )
 
-    # Pesos para o cálculo do score (podem ser configuráveis no futuro)
-    weights = {
-        "urgency": 0.3,
-        "impact": 0.2,
-        "priority_user": 0.2,
-        "stability": 0.1,
-        "funded_pct": 0.2,
-    }
+    # Pesos do score aprendidos com o histórico de aportes (reajustados a cada aporte; aqui só leitura)
+    weights = get_user_weights(user_id)
 
     if st.button("Simular Alocação", key="simulate_allocation_btn"):
         if sample_goals:
             scored_goals = compute_scores(sample_goals, date.today(), weights)
-            allocation_result = allocate(balance_free, scored_goals)
-
-            if allocation_result:
-                st.write("**Plano de Alocação Sugerido:**")
-                allocated_df = pd.DataFrame(
-                    [
-                        {"Meta ID": goal_id, "Valor Alocado": amount}
-                        for goal_id, amount in allocation_result.items()
-                    ]
-                )
-                st.dataframe(allocated_df)
-
-                total_allocated_sim = sum(allocation_result.values())
-                st.info(f"Total alocado na simulação: R$ {total_allocated_sim:,.2f}")
-
-                if st.button(
-                    "Aplicar Alocação (Salvar no Banco)",
-                    type="primary",
-                    key="apply_allocation_btn",
-                ):
-                    # Aqui você implementaria a lógica para salvar a alocação no banco de dados
-                    # Por exemplo, atualizando o campo \'funded_amount\' das metas
-                    st.success(
-                        "Alocação aplicada e salva com sucesso! (Funcionalidade de salvamento no DB a ser implementada)"
-                    )
-            else:
-                st.info("Nenhuma alocação sugerida para o saldo livre disponível ou metas.")
+            # guardado na sessão: o botão de aplicar dispara um novo rerun
+            st.session_state["allocation_plan"] = allocate(balance_free, scored_goals)
         else:
+            st.session_state.pop("allocation_plan", None)
             st.info("Nenhuma meta para simular alocação.")
 
+    allocation_result = st.session_state.get("allocation_plan")
+    if allocation_result is not None:
+        if allocation_result:
+            st.write("**Plano de Alocação Sugerido:**")
+            allocated_df = pd.DataFrame(
+                [
+                    {"Meta ID": goal_id, "Valor Alocado": amount}
+                    for goal_id, amount in allocation_result.items()
+                ]
+            )
+            st.dataframe(allocated_df)
+
+            total_allocated_sim = sum(allocation_result.values())
+            st.info(f"Total alocado na simulação: R$ {total_allocated_sim:,.2f}")
+
+            if st.button(
+                "Aplicar Alocação (Salvar no Banco)",
+                type="primary",
+                key="apply_allocation_btn",
+            ):
+                try:
+                    apply_allocation(user_id, allocation_result)
+                    del st.session_state["allocation_plan"]
+                    action_toast("success", "Alocação aplicada e salva com sucesso!")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Erro ao aplicar alocação: {e}")
+        else:
+            st.info("Nenhuma alocação sugerida para o saldo livre disponível ou metas.")
+
 
 def render_transactions():
     st.header("Exportar CSV Transações")
@@ -447,7 +502,8 @@ def render_transactions():
         start_time = time.perf_counter()
         try:
             nome = (arquivo.name or "").strip().lower()
-            file_content = arquivo.getvalue().decode("utf-8")
+            # bytes crus: parse_csv/parse_ofx decodificam uma vez (BOM, cabeçalho ou amostra)
+            file_content = arquivo.getvalue()
             transactions_to_insert = []
 
             # ---------------- CSV ----------------
@@ -1,20 +1,31 @@
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from dataclasses import dataclass, field
-from datetime import date, timedelta
-from typing import List, Dict, Tuple
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Tuple
 import logging
 import numpy as np
 import pandas as pd
 
+from scripts.utils import db_utils
+from scripts.utils.db_utils import get_db
+
 # Configurar logging básico
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @dataclass
 class Goal:
+    # __slots__ explícito (sem __dict__): milhares de metas em lista ocupam bem menos memória
+    __slots__ = ("id", "name", "remaining", "due_date", "impact", "priority_user", "funded_pct", "stability_hint")
+
     id: int
     name: str
     remaining: float
-    due_date: date
+    due_date: Optional[date]
     impact: float  # 0.0 a 1.0
     priority_user: float  # 0.0 a 1.0
     funded_pct: float  # 0.0 a 1.0
@@ -30,166 +41,297 @@ class Goal:
         if not (0.0 <= self.stability_hint <= 1.0):
             raise ValueError("Stability_hint must be between 0.0 and 1.0")
 
-def compute_scores(goals: List[Goal], today: date, w: Dict[str, float]) -> List[Tuple[Goal, float]]:
+    def as_dict(self) -> Dict[str, object]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+@dataclass
+class GoalArrays:
+    """
+    Metas em colunas NumPy (struct-of-arrays) para pontuar muitas metas de uma vez.
+
+    `due_days` são dias até o prazo (inf = sem prazo); os demais campos têm o
+    mesmo significado de `Goal`.
     """
-    Calcula o score para cada meta com base em pesos fornecidos.
-    score = w1*urgency + w2*impact + w3*priority_user + w4*stability - w5*funded_pct
-    """
-    logger.info("Calculando scores para as metas.")
-
-    # Pesos padrão se não forem fornecidos ou estiverem incompletos
-    default_weights = {
-        "urgency": 0.3,
-        "impact": 0.2,
-        "priority_user": 0.2,
-        "stability": 0.1,
-        "funded_pct": 0.2
-    }
-    weights = {**default_weights, **w}
-
-    scored_goals: List[Tuple[Goal, float]] = []
-    for goal in goals:
-        # Urgência: quanto mais perto da data de vencimento, maior a urgência
-        # Normaliza para 0 a 1.0. Metas vencidas têm urgência máxima (1.0).
-        days_to_due = (goal.due_date - today).days
-        if days_to_due <= 0:
-            urgency = 1.0
-        else:
-            # Exemplo: urgência decai linearmente em 365 dias. Ajuste conforme necessário.
-            urgency = max(0.0, 1.0 - (days_to_due / 365.0))
-        
-        # Score
-        score = (
-            weights["urgency"] * urgency +
-            weights["impact"] * goal.impact +
-            weights["priority_user"] * goal.priority_user +
-            weights["stability"] * (1.0 - goal.stability_hint) - # Inverso da estabilidade: menos estável = maior score
-            weights["funded_pct"] * goal.funded_pct
+    ids: np.ndarray
+    remaining: np.ndarray
+    due_days: np.ndarray
+    impact: np.ndarray
+    priority_user: np.ndarray
+    funded_pct: np.ndarray
+    stability_hint: np.ndarray
+
+    def __post_init__(self):
+        for name in ("impact", "priority_user", "funded_pct", "stability_hint"):
+            values = np.asarray(getattr(self, name), dtype=float)
+            if ((values < 0.0) | (values > 1.0)).any():
+                raise ValueError(f"{name} must be between 0.0 and 1.0")
+            setattr(self, name, values)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_goals(cls, goals: List[Goal], today: date) -> "GoalArrays":
+        due_days = [(g.due_date - today).days if g.due_date else np.inf for g in goals]
+        return cls(
+            ids=np.array([g.id for g in goals], dtype=np.int64),
+            remaining=np.array([g.remaining for g in goals], dtype=float),
+            due_days=np.array(due_days, dtype=float),
+            impact=np.array([g.impact for g in goals], dtype=float),
+            priority_user=np.array([g.priority_user for g in goals], dtype=float),
+            funded_pct=np.array([g.funded_pct for g in goals], dtype=float),
+            stability_hint=np.array([g.stability_hint for g in goals], dtype=float),
+        )
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, today: date, impact: float = 0.5,
+                   priority_user: float = 0.5, stability_hint: float = 0.5) -> "GoalArrays":
+        """A partir de linhas da tabela goals (id, target_amount, funded_amount, due_date)."""
+        target = df["target_amount"].to_numpy(dtype=float)
+        funded = df["funded_amount"].fillna(0.0).to_numpy(dtype=float)
+        due = pd.to_datetime(df["due_date"], errors="coerce")
+        due_days = (due - pd.Timestamp(today)).dt.days.to_numpy(dtype=float)
+        n = len(df)
+
+        def col(name, default):
+            return df[name].to_numpy(dtype=float) if name in df.columns else np.full(n, default)
+
+        return cls(
+            ids=df["id"].to_numpy(dtype=np.int64),
+            remaining=np.maximum(target - funded, 0.0),
+            due_days=np.where(np.isnan(due_days), np.inf, due_days),
+            impact=col("impact", impact),
+            priority_user=col("priority_user", priority_user),
+            funded_pct=np.clip(np.divide(funded, target, out=np.zeros(n), where=target > 0), 0.0, 1.0),
+            stability_hint=col("stability_hint", stability_hint),
         )
-        
-        # Garante que o score não seja negativo (opcional, dependendo da lógica de negócio)
-        score = max(0.0, score)
-        
-        scored_goals.append((goal, score))
-    
-    # Ordena as metas por score em ordem decrescente
-    scored_goals.sort(key=lambda x: x[1], reverse=True)
-    
-    logger.info("Scores calculados e metas ordenadas.")
-    return scored_goals
+
+
+# Pesos padrão se não forem fornecidos ou estiverem incompletos
+DEFAULT_WEIGHTS = {
+    "urgency": 0.3,
+    "impact": 0.2,
+    "priority_user": 0.2,
+    "stability": 0.1,
+    "funded_pct": 0.2
+}
+
+
+# Ordem das features do score; funded_pct entra com sinal negativo
+FEATURES = ("urgency", "impact", "priority_user", "stability", "funded_pct")
+
+
+def goal_features(goals: GoalArrays) -> np.ndarray:
+    """Matriz (metas x FEATURES) já com o sinal de cada termo do score."""
+    # Urgência: 1.0 para metas vencidas, decai linearmente em 365 dias; sem prazo = 0
+    urgency = np.clip(1.0 - goals.due_days / 365.0, 0.0, 1.0)
+    return np.column_stack([
+        urgency,
+        goals.impact,
+        goals.priority_user,
+        1.0 - goals.stability_hint,  # menos estável = maior score
+        -goals.funded_pct,
+    ])
+
+
+def _weight_vector(w: Dict[str, float]) -> np.ndarray:
+    weights = {**DEFAULT_WEIGHTS, **w}
+    return np.array([weights[k] for k in FEATURES], dtype=float)
+
+
+def score_arrays(goals: GoalArrays, w: Dict[str, float]) -> np.ndarray:
+    """
+    Score de todas as metas em uma expressão vetorizada.
+    score = w1*urgency + w2*impact + w3*priority_user + w4*(1 - stability) - w5*funded_pct
+    """
+    return np.maximum(goal_features(goals) @ _weight_vector(w), 0.0)
+
+
+def compute_scores(goals: List[Goal], today: date, w: Dict[str, float]) -> List[Tuple[Goal, float]]:
+    """
+    Calcula o score para cada meta com base em pesos fornecidos (ver `score_arrays`).
+    Retorna (meta, score) em ordem decrescente de score.
+    """
+    if not goals:
+        return []
+    scores = score_arrays(GoalArrays.from_goals(goals, today), w)
+    order = np.argsort(-scores, kind="stable")
+    logger.debug(f"Scores calculados para {len(goals)} metas.")
+    return [(goals[i], float(scores[i])) for i in order]
+
+def water_fill(balance: float, caps: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """
+    Divisão proporcional ao score com teto, exata, em O(n log n).
+
+    Solução: x_i = min(cap_i, λ * score_i), com λ tal que sum(x) = min(balance, sum(caps)).
+    Ordenando por cap/score, as metas que batem no teto formam um prefixo: a meta k
+    satura se cap_k/score_k <= (saldo restante após as anteriores) / (score das demais).
+    """
+    caps = np.maximum(np.asarray(caps, dtype=float), 0.0)
+    scores = np.asarray(scores, dtype=float)
+    x = np.zeros(len(caps))
+    eligible = np.flatnonzero((caps > 0) & (scores > 0))
+    if balance <= 0 or len(eligible) == 0:
+        return x
+    order = eligible[np.argsort(caps[eligible] / scores[eligible], kind="stable")]
+    c, sc = caps[order], scores[order]
+    left = balance - np.concatenate(([0.0], np.cumsum(c)[:-1]))  # saldo antes da meta k
+    score_left = np.cumsum(sc[::-1])[::-1]  # score da meta k e das seguintes
+    saturated = c / sc <= left / score_left
+    # o prefixo saturado termina na primeira meta que não satura
+    k = len(order) if saturated.all() else int(np.argmin(saturated))
+    x[order[:k]] = c[:k]
+    if k < len(order):
+        x[order[k:]] = left[k] * sc[k:] / score_left[k]
+    return x
+
 
 def allocate(balance_free: float, scored: List[Tuple[Goal, float]]) -> Dict[int, float]:
     """
     Distribui o saldo livre entre as metas proporcionalmente ao score, respeitando o remaining.
-    Redistribui sobras se uma meta for totalmente financiada.
-    """
-    logger.info(f"Iniciando alocação de {balance_free:.2f} entre {len(scored)} metas.")
-    
-    allocation_plan: Dict[int, float] = {}
-    total_allocated = 0.0
-    
-    # Filtra metas com remaining > 0 e score > 0
-    allocatable_goals = [(g, s) for g, s in scored if g.remaining > 0 and s > 0]
 
-    if not allocatable_goals:
-        logger.info("Nenhuma meta elegível para alocação (remaining <= 0 ou score <= 0).")
+    Solução exata em uma passada (ver `water_fill`): o total alocado é
+    min(balance_free, soma dos remaining elegíveis). Não altera as metas recebidas.
+    """
+    if not scored:
         return {}
-
-    # Loop para distribuir e redistribuir
-    while balance_free > 0.01 and allocatable_goals: # Usar um pequeno epsilon para float comparison
-        current_total_score = sum(s for g, s in allocatable_goals)
-        if current_total_score == 0:
-            logger.warning("Soma total dos scores elegíveis é zero, impossível alocar mais.")
-            break
-
-        remaining_balance_to_distribute = balance_free
-        newly_allocated_this_round = 0.0
-        
-        next_allocatable_goals = []
-        for goal, score in allocatable_goals:
-            if score == 0: # Evita divisão por zero
-                continue
-
-            # Proporção do score em relação ao total de scores elegíveis
-            proportion = score / current_total_score
-            
-            # Valor proposto para esta meta
-            proposed_amount = remaining_balance_to_distribute * proportion
-            
-            # Limita o valor ao remaining da meta
-            actual_amount = min(proposed_amount, goal.remaining)
-            
-            # Adiciona ao plano de alocação
-            allocation_plan[goal.id] = allocation_plan.get(goal.id, 0.0) + actual_amount
-            total_allocated += actual_amount
-            newly_allocated_this_round += actual_amount
-            
-            # Atualiza o remaining da meta para a próxima iteração (se houver)
-            goal.remaining -= actual_amount
-            
-            # Se a meta ainda não foi totalmente financiada, mantém para a próxima rodada
-            if goal.remaining > 0.01: # Epsilon para float comparison
-                next_allocatable_goals.append((goal, score))
-            else:
-                logger.info(f"Meta {goal.name} (ID: {goal.id}) totalmente financiada.")
-        
-        # Se nada foi alocado nesta rodada, significa que não há mais metas elegíveis ou saldo
-        if newly_allocated_this_round < 0.01: # Epsilon para float comparison
-            logger.info("Nenhuma alocação significativa nesta rodada. Encerrando.")
-            break
-
-        balance_free -= newly_allocated_this_round
-        allocatable_goals = next_allocatable_goals
-
-    logger.info(f"Alocação concluída. Total alocado: {total_allocated:.2f}.")
+    caps = np.array([g.remaining for g, _ in scored], dtype=float)
+    scores = np.array([s for _, s in scored], dtype=float)
+    x = water_fill(balance_free, caps, scores)
+    allocation_plan: Dict[int, float] = {}
+    for (goal, _), amount in zip(scored, x):
+        if amount > 0:
+            allocation_plan[goal.id] = allocation_plan.get(goal.id, 0.0) + float(amount)
+    logger.debug(f"Alocação concluída. Total alocado: {x.sum():.2f}.")
     return allocation_plan
 
-def update_weights(history_df: pd.DataFrame, w: Dict[str, float], lr: float = 0.05) -> Dict[str, float]:
+def fit_weights(features: np.ndarray, actual: np.ndarray, groups: np.ndarray, w0: np.ndarray,
+                lr: float = 0.5, iters: int = 300) -> np.ndarray:
     """
-    Ajusta os pesos para reduzir o erro entre o planejado e o realizado.
-    history_df deve conter colunas como 'goal_id', 'month', 'planned_amount', 'actual_amount'.
+    Ajusta os pesos por gradiente descendente projetado, todo vetorizado.
+
+    Cada grupo (ex.: um mês de aportes) compara a fração prevista pelo score,
+    s_i / soma(s), com a fração realmente aportada em cada meta; a perda é o
+    erro quadrático médio dessas frações. Os pesos ficam >= 0 e somam 1 (o
+    score só importa em proporção).
     """
-    logger.info("Iniciando ajuste de pesos.")
-    updated_weights = w.copy()
+    F = np.asarray(features, dtype=float)
+    _, g = np.unique(groups, return_inverse=True)
+    n_groups = g.max() + 1
+    actual = np.asarray(actual, dtype=float)
+    share = actual / np.bincount(g, actual, n_groups)[g]
+    F_group = np.zeros((n_groups, F.shape[1]))
+    np.add.at(F_group, g, F)
+    w = np.clip(np.asarray(w0, dtype=float), 0.0, None)
+    w /= w.sum() or 1.0
+    n = len(F)
+    for _ in range(iters):
+        s = np.maximum(F @ w, 1e-9)
+        S = np.bincount(g, s, n_groups)
+        r = s / S[g] - share
+        # d(s_i/S_g)/dw = f_i/S_g - s_i * F_g / S_g^2
+        grad = (r / S[g]) @ F - np.bincount(g, r * s, n_groups) / S ** 2 @ F_group
+        w = np.clip(w - lr * 2 * grad / n, 0.0, None)
+        w /= w.sum() or 1.0
+    return w
 
-    if history_df.empty or len(history_df.columns.intersection(["goal_id", "month", "planned_amount", "actual_amount"])) < 4:
+
+def update_weights(history_df: pd.DataFrame, w: Dict[str, float], lr: float = 0.5) -> Dict[str, float]:
+    """
+    Ajusta os pesos para reduzir o erro entre o score e o que foi de fato aportado.
+    history_df precisa das colunas FEATURES (com sinal, ver `goal_features`),
+    'month' e 'actual_amount' (ex.: linhas de allocation_history).
+    """
+    required = {*FEATURES, "month", "actual_amount"}
+    if history_df.empty or not required.issubset(history_df.columns):
         logger.warning("Dados históricos insuficientes para ajustar pesos. Retornando pesos originais.")
-        return updated_weights
-
-    # Exemplo simplificado: ajustar pesos com base no erro médio
-    # Isso é um placeholder. Um ajuste real exigiria um modelo de otimização mais complexo.
-    # Por exemplo, se o 'funded_pct' estiver sempre muito alto e as metas não forem atingidas,
-    # talvez o peso de 'funded_pct' deva ser reduzido ou o de 'urgency' aumentado.
-
-    # Para demonstração, vamos simular um ajuste baseado em um erro fictício
-    # Suponha que queremos que o funded_pct seja mais influente se as metas não estiverem sendo atingidas
-    # E que a urgência seja mais influente se metas com due_date próximo estiverem falhando
-
-    # Calcular um "erro" geral (exemplo)
-    history_df["error"] = history_df["planned_amount"] - history_df["actual_amount"]
-    mean_error = history_df["error"].mean()
-
-    # Ajuste de exemplo: se o erro médio for positivo (planejado > realizado), significa que estamos superestimando
-    # a capacidade de alocação ou subestimando a dificuldade. Podemos tentar aumentar o peso de funded_pct
-    # ou diminuir o de urgência/impacto.
-    
-    # Este é um algoritmo de ajuste de pesos muito simplificado e heurístico.
-    # Em um cenário real, você usaria algoritmos de otimização (e.g., gradiente descendente)
-    # para minimizar uma função de custo que mede o erro de previsão/alocação.
-    
-    # Apenas para garantir que os pesos não explodam ou fiquem negativos
-    for key in updated_weights:
-        if key == "funded_pct": # Exemplo: se o erro é positivo, aumentamos o peso de funded_pct
-            updated_weights[key] = np.clip(updated_weights[key] + lr * mean_error, 0.0, 1.0)
-        else:
-            updated_weights[key] = np.clip(updated_weights[key] - lr * mean_error, 0.0, 1.0)
-
-    # Normaliza os pesos para que a soma seja 1 (se desejado, dependendo da interpretação dos pesos)
-    # total_w = sum(updated_weights.values())
-    # if total_w > 0:
-    #     updated_weights = {k: v / total_w for k, v in updated_weights.items()}
-
-    logger.info(f"Pesos ajustados: {updated_weights}")
-    return updated_weights
+        return {**DEFAULT_WEIGHTS, **w}
+    history_df = history_df[history_df["actual_amount"] > 0]
+    if history_df.empty:
+        return {**DEFAULT_WEIGHTS, **w}
+    fitted = fit_weights(history_df[list(FEATURES)].to_numpy(), history_df["actual_amount"].to_numpy(),
+                         history_df["month"].to_numpy(), _weight_vector(w), lr=lr)
+    return dict(zip(FEATURES, fitted.round(6).tolist()))
+
 
+# Linhas mais recentes de allocation_history usadas no ajuste
+HISTORY_WINDOW = 5000
 
+
+def get_user_weights(user_id: int) -> Dict[str, float]:
+    """Pesos aprendidos do usuário (tabela allocation_weights) ou os padrão."""
+    row = get_db().conn.execute("SELECT weights FROM allocation_weights WHERE user_id = ?", (user_id,)).fetchone()
+    return {**DEFAULT_WEIGHTS, **json.loads(row[0])} if row else dict(DEFAULT_WEIGHTS)
+
+
+def learn_user_weights(user_id: int, con: Optional[sqlite3.Connection] = None) -> Dict[str, float]:
+    """
+    Reajusta e grava os pesos do usuário a partir de allocation_history.
+
+    Incremental: sem linhas novas desde o último ajuste, devolve os pesos
+    gravados; com linhas novas, parte dos pesos gravados (warm start).
+    Roda em segundo plano via `schedule_weight_refit`; as páginas só leem
+    `get_user_weights`.
+    """
+    con = con or get_db().conn
+    stored = con.execute(
+        "SELECT weights, last_history_id FROM allocation_weights WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    last_id = con.execute(
+        "SELECT COALESCE(MAX(id), 0) FROM allocation_history WHERE user_id = ?", (user_id,)
+    ).fetchone()[0]
+    w = {**DEFAULT_WEIGHTS, **json.loads(stored[0])} if stored else dict(DEFAULT_WEIGHTS)
+    if last_id == 0 or (stored and stored[1] == last_id):
+        return w
+
+    history = pd.read_sql_query(
+        f"SELECT month, actual_amount, {', '.join(FEATURES)} FROM allocation_history "
+        "WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+        con, params=[user_id, HISTORY_WINDOW],
+    )
+    w = update_weights(history, w)
+    con.execute(
+        "INSERT INTO allocation_weights(user_id, weights, last_history_id, n_rows, updated_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(user_id) DO UPDATE SET weights = excluded.weights, last_history_id = excluded.last_history_id, "
+        "n_rows = excluded.n_rows, updated_at = excluded.updated_at",
+        (user_id, json.dumps(w), last_id, len(history), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+    )
+    con.commit()
+    return w
+
+
+# Reajuste fora do caminho de escrita: um worker por processo, e aportes seguidos
+# do mesmo usuário enquanto o ajuste está na fila viram um só (o ajuste é
+# incremental e pega todas as linhas novas de uma vez)
+_refit_executor: Optional[ThreadPoolExecutor] = None
+_refit_pending: set = set()
+_refit_lock = threading.Lock()
+
+
+def _run_refit(db_path, user_id: int) -> None:
+    with _refit_lock:
+        _refit_pending.discard((db_path, user_id))
+    try:
+        with closing(sqlite3.connect(str(db_path), timeout=30)) as con:
+            learn_user_weights(user_id, con)
+    except Exception as e:
+        logger.warning(f"Não foi possível reajustar os pesos da alocação do usuário {user_id}: {e}")
+
+
+def schedule_weight_refit(user_id: int) -> None:
+    """
+    Agenda `learn_user_weights` em segundo plano, depois do commit de um aporte.
+
+    Não escreve nada no banco na hora; se o processo cair antes do ajuste, o
+    próximo aporte do usuário recupera as linhas pendentes (last_history_id).
+    """
+    global _refit_executor
+    key = (db_utils.DB_PATH, user_id)
+    with _refit_lock:
+        if key in _refit_pending:
+            return
+        _refit_pending.add(key)
+        if _refit_executor is None:
+            _refit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rc-weights")
+        _refit_executor.submit(_run_refit, *key)
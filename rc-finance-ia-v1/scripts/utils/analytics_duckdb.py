@@ -0,0 +1,231 @@
+# scripts/utils/analytics_duckdb.py
+"""
+Consultas de relatório (por categoria, mês a mês, média móvel) em SQL vetorizado via DuckDB.
+
+Fonte preferida: data/finance.db anexado somente leitura pelo sqlite scanner.
+Se a extensão não puder ser carregada (ex.: máquina sem internet para baixá-la),
+o DuckDB lê o snapshot Parquet de analytics_snapshot. Sem DuckDB, as mesmas
+consultas rodam em pandas. Valores são somados em módulo (ABS), então o
+resultado independe da convenção de sinal usada na importação.
+"""
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+import pandas as pd
+
+from scripts.utils import analytics_snapshot, db_utils
+from scripts.utils.db_utils import cached_query, normalize_date
+
+try:
+    import duckdb
+    _HAVE_DUCKDB = True
+except ImportError:
+    _HAVE_DUCKDB = False
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_sqlite_ok: Optional[bool] = None  # None = ainda não testado neste processo
+
+
+def available() -> bool:
+    return _HAVE_DUCKDB
+
+
+def _connect():
+    """Conexão DuckDB por thread, com o SQLite anexado se o scanner estiver disponível."""
+    global _sqlite_ok
+    con = getattr(_local, "con", None)
+    if con is not None and getattr(_local, "db_path", None) == db_utils.DB_PATH:
+        return con
+    con = duckdb.connect()
+    if _sqlite_ok is not False:
+        try:
+            con.execute("LOAD sqlite")
+        except Exception:
+            try:
+                con.execute("INSTALL sqlite")
+                con.execute("LOAD sqlite")
+            except Exception as e:
+                logger.warning(f"Extensão sqlite do DuckDB indisponível ({e}); usando snapshot Parquet.")
+                _sqlite_ok = False
+        if _sqlite_ok is not False:
+            path = str(db_utils.DB_PATH).replace("'", "''")
+            con.execute(f"ATTACH '{path}' AS fin (TYPE sqlite, READ_ONLY)")
+            _sqlite_ok = True
+    _local.con, _local.db_path = con, db_utils.DB_PATH
+    return con
+
+
+def _source(user_id: int) -> Optional[str]:
+    """Expressão FROM para as transações do usuário (None se não houver dados)."""
+    if _sqlite_ok:
+        return "fin.transactions"
+    if analytics_snapshot.refresh_snapshot(user_id) is None:
+        return None
+    user_dir = analytics_snapshot._user_dir(user_id)
+    if not any(user_dir.glob("*/*.parquet")):
+        return None
+    glob = str(user_dir / "*" / "*.parquet").replace("'", "''")
+    return f"read_parquet('{glob}', hive_partitioning = true)"
+
+
+def _where(user_id, date_start, date_end, categories, type_filter) -> tuple[str, list]:
+    clauses, params = ["user_id = ?"], [user_id]
+    if date_start:
+        clauses.append("TRY_CAST(date AS DATE) >= CAST(? AS DATE)")
+        params.append(normalize_date(date_start))
+    if date_end:
+        clauses.append("TRY_CAST(date AS DATE) <= CAST(? AS DATE)")
+        params.append(normalize_date(date_end))
+    if categories:
+        clauses.append(f"category IN ({', '.join('?' for _ in categories)})")
+        params.extend(categories)
+    if type_filter in ("income", "expense"):
+        clauses.append("type = ?")
+        params.append(type_filter)
+    return " AND ".join(clauses), params
+
+
+def _query(user_id, sql_body: str, filters: tuple, extra_params: list = ()) -> Optional[pd.DataFrame]:
+    """Executa `WITH t AS (...) <sql_body>` no DuckDB; None para cair no caminho pandas."""
+    if not _HAVE_DUCKDB:
+        return None
+    try:
+        con = _connect()
+        src = _source(user_id)
+        if src is None:
+            return None
+        where, params = _where(user_id, *filters)
+        sql = (
+            "WITH t AS (SELECT TRY_CAST(date AS DATE) AS d, category, type, ABS(amount) AS v "
+            f"FROM {src} WHERE {where}) " + sql_body
+        )
+        return con.execute(sql, params + list(extra_params)).df()
+    except Exception as e:
+        logger.warning(f"Consulta DuckDB falhou ({e}); usando pandas.")
+        return None
+
+
+def _frame(user_id, filters) -> pd.DataFrame:
+    df = analytics_snapshot.load_transactions(
+        user_id, *filters, columns=["date", "category", "type", "amount"]
+    )
+    df["v"] = df["amount"].abs()
+    return df
+
+
+# --- consultas ----------------------------------------------------------------
+
+def _category_breakdown(user_id, filters) -> pd.DataFrame:
+    df = _query(user_id, """
+        SELECT category, SUM(v) AS total, COUNT(*) AS count,
+               SUM(v) / SUM(SUM(v)) OVER () AS share
+        FROM t GROUP BY category ORDER BY total DESC
+    """, filters)
+    if df is not None:
+        return df
+    df = _frame(user_id, filters)
+    out = df.groupby("category", as_index=False).agg(total=("v", "sum"), count=("v", "size"))
+    out["share"] = out["total"] / out["total"].sum() if len(out) else 0.0
+    return out.sort_values("total", ascending=False, ignore_index=True)
+
+
+def _monthly_comparison(user_id, filters) -> pd.DataFrame:
+    df = _query(user_id, """
+        SELECT month, income, expense, income - expense AS balance,
+               expense / NULLIF(LAG(expense) OVER (ORDER BY month), 0) - 1 AS expense_change_pct
+        FROM (
+            SELECT date_trunc('month', d) AS month,
+                   COALESCE(SUM(v) FILTER (WHERE type = 'income'), 0) AS income,
+                   COALESCE(SUM(v) FILTER (WHERE type = 'expense'), 0) AS expense
+            FROM t WHERE d IS NOT NULL GROUP BY 1
+        ) ORDER BY month
+    """, filters)
+    if df is not None:
+        df["month"] = pd.to_datetime(df["month"])
+        return df
+    df = _frame(user_id, filters).dropna(subset=["date"])
+    df["month"] = df["date"].dt.to_period("M").dt.to_timestamp()
+    out = df.pivot_table(index="month", columns="type", values="v", aggfunc="sum", fill_value=0.0)
+    out = out.reindex(columns=["income", "expense"], fill_value=0.0).reset_index()
+    out.columns.name = None
+    out["balance"] = out["income"] - out["expense"]
+    prev = out["expense"].shift(1).replace(0, float("nan"))
+    out["expense_change_pct"] = out["expense"] / prev - 1
+    return out
+
+
+def _rolling_average(user_id, filters, window: int) -> pd.DataFrame:
+    df = _query(user_id, """
+        SELECT month, expense,
+               AVG(expense) OVER (ORDER BY month ROWS BETWEEN ? PRECEDING AND CURRENT ROW) AS expense_rolling
+        FROM (
+            SELECT date_trunc('month', d) AS month, SUM(v) AS expense
+            FROM t WHERE d IS NOT NULL AND type = 'expense' GROUP BY 1
+        ) ORDER BY month
+    """, filters, [max(window, 1) - 1])
+    if df is not None:
+        df["month"] = pd.to_datetime(df["month"])
+        return df
+    df = _frame(user_id, filters).dropna(subset=["date"])
+    df = df[df["type"] == "expense"]
+    out = (
+        df.assign(month=df["date"].dt.to_period("M").dt.to_timestamp())
+        .groupby("month", as_index=False)["v"].sum()
+        .rename(columns={"v": "expense"})
+    )
+    out["expense_rolling"] = out["expense"].rolling(max(window, 1), min_periods=1).mean()
+    return out
+
+
+def _cached(user_id, name, filters, fn, *args) -> pd.DataFrame:
+    categories = tuple(filters[2]) if filters[2] else None
+    signature = ("duckdb", name, filters[0], filters[1], categories, filters[3], *args)
+    return cached_query(user_id, signature, lambda: fn(user_id, filters, *args))
+
+
+def category_breakdown(
+    user_id: int,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    categories: Optional[list[str]] = None,
+    type_filter: Optional[str] = "expense",
+) -> pd.DataFrame:
+    """Total, quantidade e participação por categoria (padrão: só despesas)."""
+    filters = (date_start, date_end, categories, type_filter)
+    return _cached(user_id, "category_breakdown", filters, _category_breakdown)
+
+
+def monthly_comparison(
+    user_id: int,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    categories: Optional[list[str]] = None,
+    type_filter: Optional[str] = None,
+) -> pd.DataFrame:
+    """Receita, despesa e saldo por mês, com a variação da despesa sobre o mês anterior."""
+    filters = (date_start, date_end, categories, type_filter)
+    return _cached(user_id, "monthly_comparison", filters, _monthly_comparison)
+
+
+def rolling_average(
+    user_id: int,
+    window: int = 3,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    categories: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """Despesa mensal e sua média móvel de `window` meses."""
+    filters = (date_start, date_end, categories, None)
+    return _cached(user_id, "rolling_average", filters, _rolling_average, window)
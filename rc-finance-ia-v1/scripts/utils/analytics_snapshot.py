@@ -0,0 +1,251 @@
+# scripts/utils/analytics_snapshot.py
+"""
+Snapshot colunar (Parquet) das transações para relatórios e projeções.
+
+Layout: data/analytics/user_id=<id>/month=<AAAA-MM>/part-<primeiro id>.parquet
+
+A atualização é incremental: a tabela `analytics_snapshots` guarda o maior id
+já exportado (high-water mark) e a contagem de linhas. Só as transações novas
+são escritas; se a contagem não bate (linhas removidas), o snapshot foi
+invalidado por `update_transaction` ou foi gravado com outro SCHEMA_VERSION, o
+usuário é reconstruído do zero. A atualização roda dentro de BEGIN IMMEDIATE:
+o lock de escrita do SQLite serializa processos diferentes (Streamlit, pool do
+forecast_all) que atualizem o mesmo usuário.
+Sem pyarrow, a leitura cai para SQL via pandas.
+"""
+from __future__ import annotations
+
+import shutil
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+import pandas as pd
+
+from scripts.utils.db_utils import DATA_DIR, cached_query, get_db, normalize_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    _HAVE_ARROW = True
+except ImportError:
+    _HAVE_ARROW = False
+
+SNAPSHOT_DIR = DATA_DIR / "analytics"
+COLUMNS = ["id", "date", "description", "category", "type", "amount", "account_id"]
+# Incrementar ao mudar COLUMNS: snapshots de versões anteriores são reconstruídos
+SCHEMA_VERSION = 2
+# Acima disso, as partes de um mês são compactadas em um único arquivo
+MAX_PARTS_PER_MONTH = 16
+
+_refresh_lock = threading.Lock()
+
+
+def _user_dir(user_id: int) -> Path:
+    return SNAPSHOT_DIR / f"user_id={int(user_id)}"
+
+
+def _to_table(rows: list[tuple]) -> "pa.Table":
+    ids, dates, descs, cats, types, amounts, accounts = zip(*rows)
+    date_arr = pc.strptime(pa.array(dates, pa.string()), format="%Y-%m-%d", unit="s", error_is_null=True)
+    return pa.table({
+        "id": pa.array(ids, pa.int64()),
+        "date": date_arr.cast(pa.date32()),
+        "description": pa.array(descs, pa.string()),
+        "category": pa.array(cats, pa.string()),
+        "type": pa.array(types, pa.string()),
+        "amount": pa.array(amounts, pa.float64()),
+        "account_id": pa.array(accounts, pa.int64()),
+    })
+
+
+def _compact(month_dir: Path) -> None:
+    parts = sorted(month_dir.glob("part-*.parquet"))
+    if len(parts) <= MAX_PARTS_PER_MONTH:
+        return
+    merged = pa.concat_tables([pq.read_table(p) for p in parts])
+    tmp = month_dir / "compact.tmp"
+    pq.write_table(merged, tmp)
+    for p in parts:
+        p.unlink()
+    tmp.rename(parts[0])
+
+
+def _write_parts(user_id: int, rows: list[tuple]) -> None:
+    table = _to_table(rows)
+    months = pc.strftime(table["date"], format="%Y-%m")
+    grupos = []
+    if months.null_count:
+        valid = pc.is_valid(months)
+        grupos.append(("sem-data", table.filter(pc.invert(valid))))
+        table, months = table.filter(valid), months.filter(valid)
+    # ordena por mês (sort estável mantém a ordem de id) e fatia em vez de filtrar mês a mês
+    order = pc.sort_indices(months)
+    table, months = table.take(order), months.take(order)
+    counts = pc.value_counts(months)
+    offset = 0
+    for month, n in zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist()):
+        grupos.append((month, table.slice(offset, n)))
+        offset += n
+
+    for month, part in grupos:
+        month_dir = _user_dir(user_id) / f"month={month}"
+        month_dir.mkdir(parents=True, exist_ok=True)
+        pq.write_table(part, month_dir / f"part-{part['id'][0].as_py():012d}.parquet")
+        _compact(month_dir)
+
+
+def _snapshot_state(con, user_id: int) -> tuple:
+    """(meta, total, novas, max_id, rebuild) comparando o high-water mark com a tabela de transações."""
+    meta = con.execute(
+        "SELECT high_water_id, row_count, schema_version FROM analytics_snapshots WHERE user_id = ?",
+        (user_id,),
+    ).fetchone()
+    hwm, row_count = meta[:2] if meta else (0, 0)
+    total, novas, max_id = con.execute(
+        "SELECT COUNT(*), COALESCE(SUM(id > ?), 0), COALESCE(MAX(id), 0) FROM transactions WHERE user_id = ?",
+        (hwm, user_id),
+    ).fetchone()
+    rebuild = meta is None or meta[2] != SCHEMA_VERSION or total - novas != row_count
+    return meta, total, novas, max_id, rebuild
+
+
+def refresh_snapshot(user_id: int) -> Optional[dict]:
+    """Atualiza o snapshot do usuário a partir do high-water mark. None sem pyarrow."""
+    if not _HAVE_ARROW:
+        return None
+    with _refresh_lock:
+        con = get_db().conn
+        # leitura simples primeiro: snapshot em dia não pega o lock de escrita
+        meta, _, novas, _, rebuild = _snapshot_state(con, user_id)
+        if not (rebuild or novas):
+            return {"high_water_id": meta[0], "row_count": meta[1]}
+
+        # high-water mark relido e gravado com o lock de escrita: outro processo espera em vez de
+        # reescrever as mesmas partições ao mesmo tempo
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            meta, total, novas, max_id, rebuild = _snapshot_state(con, user_id)
+            hwm, row_count = meta[:2] if meta else (0, 0)
+            if rebuild:
+                shutil.rmtree(_user_dir(user_id), ignore_errors=True)
+                hwm, row_count, novas = 0, 0, total
+
+            if novas:
+                # varredura pela chave primária a partir do high-water mark (já sai em ordem de id)
+                rows = con.execute(
+                    f"SELECT {', '.join(COLUMNS)} FROM transactions NOT INDEXED "
+                    "WHERE id > ? AND user_id = ? ORDER BY id",
+                    (hwm, user_id),
+                ).fetchall()
+                _write_parts(user_id, rows)
+                hwm, row_count = max_id, row_count + len(rows)
+
+            if rebuild or novas:
+                con.execute(
+                    "INSERT INTO analytics_snapshots(user_id, high_water_id, row_count, schema_version, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET "
+                    "high_water_id = excluded.high_water_id, row_count = excluded.row_count, "
+                    "schema_version = excluded.schema_version, updated_at = excluded.updated_at",
+                    (user_id, hwm, row_count, SCHEMA_VERSION, datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                )
+            con.commit()
+        except Exception:
+            con.rollback()
+            # partes já gravadas não batem com o high-water mark: força reconstrução na próxima leitura
+            con.execute("DELETE FROM analytics_snapshots WHERE user_id = ?", (user_id,))
+            con.commit()
+            raise
+        return {"high_water_id": hwm, "row_count": row_count}
+
+
+def _read_arrow(user_id, date_start, date_end, categories, type_filter, columns) -> pd.DataFrame:
+    refresh_snapshot(user_id)
+    cols = columns or COLUMNS
+    path = _user_dir(user_id)
+    if not path.exists():
+        return pd.DataFrame(columns=cols)
+
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    expr = None
+
+    def add(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    # o filtro por mês poda partições inteiras antes de abrir os arquivos
+    if date_start:
+        d = normalize_date(date_start)
+        add(ds.field("month") >= d[:7])
+        add(ds.field("date") >= pa.scalar(datetime.strptime(d, "%Y-%m-%d").date()))
+    if date_end:
+        d = normalize_date(date_end)
+        add(ds.field("month") <= d[:7])
+        add(ds.field("date") <= pa.scalar(datetime.strptime(d, "%Y-%m-%d").date()))
+    if categories:
+        add(ds.field("category").isin(list(categories)))
+    if type_filter in ("income", "expense"):
+        add(ds.field("type") == type_filter)
+
+    table = dataset.to_table(columns=cols, filter=expr)
+    if "date" in cols:
+        table = table.sort_by([("date", "ascending")])
+    # split_blocks + self_destruct: uma coluna por bloco, memória Arrow liberada na conversão
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+
+def _read_sql(user_id, date_start, date_end, categories, type_filter, columns) -> pd.DataFrame:
+    cols = columns or COLUMNS
+    query = f"SELECT {', '.join(cols)} FROM transactions WHERE user_id = ?"
+    params: list = [user_id]
+    if date_start:
+        query += " AND date >= ?"
+        params.append(normalize_date(date_start))
+    if date_end:
+        query += " AND date <= ?"
+        params.append(normalize_date(date_end))
+    if categories:
+        query += f" AND category IN ({', '.join('?' for _ in categories)})"
+        params.extend(categories)
+    if type_filter in ("income", "expense"):
+        query += " AND type = ?"
+        params.append(type_filter)
+    df = pd.read_sql_query(query + " ORDER BY date", get_db().conn, params=params)
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df
+
+
+def load_transactions(
+    user_id: int,
+    date_start: Optional[str] = None,
+    date_end: Optional[str] = None,
+    categories: Optional[list[str]] = None,
+    type_filter: Optional[str] = None,
+    columns: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """
+    Transações do usuário para análise (coluna `date` como datetime64).
+
+    Lê o snapshot Parquet (atualizado incrementalmente antes da leitura) e
+    usa SQL quando pyarrow não está instalado. Cacheado por versão dos dados.
+    """
+    reader = _read_arrow if _HAVE_ARROW else _read_sql
+    signature = (
+        "analytics_snapshot", date_start, date_end,
+        tuple(categories) if categories else None, type_filter,
+        tuple(columns) if columns else None,
+    )
+    return cached_query(
+        user_id, signature,
+        lambda: reader(user_id, date_start, date_end, categories, type_filter, columns),
+    )
@@ -9,8 +9,12 @@ project_root = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(project_root))
 
 from sqlite_utils import Database
+import copy
 import sqlite3
-from typing import Any, Dict, Optional
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
 import pandas as pd
 from datetime import datetime
 
@@ -20,6 +24,21 @@ DATA_DIR = PROJECT_ROOT / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 DB_PATH = DATA_DIR / "finance.db"
 
+# Cache de consultas compartilhado entre sessões do mesmo processo
+CACHE_MAX_ENTRIES = 256
+_query_cache: "OrderedDict[tuple, tuple[int, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Contas criadas para cada usuário; a primeira é a padrão para transações sem conta
+DEFAULT_ACCOUNTS = [("Conta Corrente", "checking"), ("Poupança", "savings"), ("Cartão de Crédito", "credit_card")]
+
+# Valor com sinal pelo tipo (despesa negativa), independente da convenção de sinal da importação
+SIGNED_AMOUNT_SQL = "CASE WHEN type = 'expense' THEN -ABS(amount) ELSE ABS(amount) END"
+
+def signed_amount(amount: float, type: Optional[str]) -> float:
+    """Equivalente Python de SIGNED_AMOUNT_SQL."""
+    return -abs(amount) if type == "expense" else abs(amount)
+
 def get_db():
     return Database(DB_PATH)
 
@@ -62,6 +81,230 @@ def init_db():
         if "created_at" not in db["goals"].columns_dict:
             db["goals"].add_column("created_at", str)
             db["goals"].update_where("created_at IS NULL", {"created_at": datetime.now().strftime("%Y-%m-%d")})
+    # Exclusão lógica: a meta some das listagens, mas aportes e histórico continuam apontando para ela
+    if "deleted_at" not in db["goals"].columns_dict:
+        db.conn.execute("ALTER TABLE goals ADD COLUMN deleted_at TEXT")
+    if "jobs" not in db.table_names():
+        db["jobs"].create(
+            {
+                "id": int,
+                "user_id": int,
+                "kind": str,
+                "status": str,  # queued|running|done|failed
+                "progress": float,
+                "message": str,
+                "result_path": str,
+                "error": str,
+                "pid": int,
+                "created_at": str,
+                "updated_at": str
+            },
+            pk="id",
+            if_not_exists=True,
+            defaults={"status": "queued", "progress": 0.0}
+        )
+    # Versão dos dados por usuário: incrementada em toda escrita, invalida o cache de consultas
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS data_versions (user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+    )
+    # High-water mark do snapshot Parquet de analytics (ver analytics_snapshot.py)
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS analytics_snapshots "
+        "(user_id INTEGER PRIMARY KEY, high_water_id INTEGER NOT NULL, row_count INTEGER NOT NULL, updated_at TEXT)"
+    )
+    if "schema_version" not in db["analytics_snapshots"].columns_dict:
+        db.conn.execute("ALTER TABLE analytics_snapshots ADD COLUMN schema_version INTEGER NOT NULL DEFAULT 1")
+    # Checagem de duplicata da importação filtra por (user_id, date)
+    db.conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(user_id, date)")
+
+    # Contas: dimensão + saldo por conta mantido a cada escrita
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS accounts (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "name TEXT NOT NULL, kind TEXT NOT NULL DEFAULT 'checking', created_at TEXT, UNIQUE(user_id, name))"
+    )
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS account_balances (account_id INTEGER PRIMARY KEY REFERENCES accounts(id), "
+        "user_id INTEGER NOT NULL, balance REAL NOT NULL DEFAULT 0, tx_count INTEGER NOT NULL DEFAULT 0, updated_at TEXT)"
+    )
+    if "account_id" not in db["transactions"].columns_dict:
+        db.conn.execute("ALTER TABLE transactions ADD COLUMN account_id INTEGER REFERENCES accounts(id)")
+    db.conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions(account_id, date)")
+    _backfill_accounts(db.conn)
+
+    # Modelos Holt-Winters ajustados, por hash da série + configuração (ver projections.py)
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS forecast_models (key TEXT PRIMARY KEY, config TEXT NOT NULL, "
+        "n_obs INTEGER NOT NULL, params TEXT NOT NULL, level REAL NOT NULL, trend REAL NOT NULL, updated_at TEXT)"
+    )
+    # Projeções pré-calculadas para todos os usuários (ver tools/forecast_all.py)
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS forecasts (user_id INTEGER NOT NULL, month TEXT NOT NULL, "
+        "net_forecast REAL, balance_forecast REAL, balance_lower REAL, balance_upper REAL, "
+        "data_version INTEGER NOT NULL, generated_at TEXT, PRIMARY KEY (user_id, month))"
+    )
+    # Aportes em metas (planejado x realizado) com as features do score no momento do aporte,
+    # e os pesos aprendidos a partir deles (ver allocation.learn_user_weights)
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS allocation_history (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "goal_id INTEGER NOT NULL, month TEXT NOT NULL, planned_amount REAL, actual_amount REAL NOT NULL, "
+        "urgency REAL, impact REAL, priority_user REAL, stability REAL, funded_pct REAL, "
+        "source TEXT NOT NULL, created_at TEXT)"
+    )
+    db.conn.execute("CREATE INDEX IF NOT EXISTS idx_allocation_history_user ON allocation_history(user_id, id)")
+    # Ledger de aportes em metas: só recebe INSERT (delete_goal é lógico, as linhas ficam);
+    # amount é o valor efetivamente aplicado
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS goal_contributions (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+        "goal_id INTEGER NOT NULL, amount REAL NOT NULL, requested_amount REAL NOT NULL, funded_before REAL NOT NULL, "
+        "source TEXT NOT NULL, batch TEXT, created_at TEXT)"
+    )
+    db.conn.execute("CREATE INDEX IF NOT EXISTS idx_goal_contributions_goal ON goal_contributions(user_id, goal_id, id)")
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS allocation_weights (user_id INTEGER PRIMARY KEY, weights TEXT NOT NULL, "
+        "last_history_id INTEGER NOT NULL, n_rows INTEGER NOT NULL, updated_at TEXT)"
+    )
+    # Saldo acumulado no fim de cada mês fechado (ver ledger.py)
+    db.conn.execute(
+        "CREATE TABLE IF NOT EXISTS balance_checkpoints (user_id INTEGER NOT NULL, month TEXT NOT NULL, "
+        "balance REAL NOT NULL, tx_count INTEGER NOT NULL, PRIMARY KEY (user_id, month))"
+    )
+
+def _backfill_accounts(con: sqlite3.Connection) -> None:
+    """Transações antigas (sem conta) vão para a conta padrão do usuário; saldos recalculados."""
+    users = [r[0] for r in con.execute("SELECT DISTINCT user_id FROM transactions WHERE account_id IS NULL")]
+    for user_id in users:
+        account_id = ensure_default_accounts(con, user_id)
+        con.execute(
+            "UPDATE transactions SET account_id = ? WHERE user_id = ? AND account_id IS NULL",
+            (account_id, user_id)
+        )
+        rebuild_account_balances(con, user_id)
+        bump_data_version(con, user_id)
+    if users:
+        con.commit()
+
+def ensure_default_accounts(con: sqlite3.Connection, user_id: int) -> int:
+    """Cria as contas padrão se o usuário não tiver nenhuma; retorna o id da conta padrão (sem commit)."""
+    row = con.execute("SELECT id FROM accounts WHERE user_id = ? ORDER BY id LIMIT 1", (user_id,)).fetchone()
+    if row:
+        return row[0]
+    created_at = datetime.now().strftime("%Y-%m-%d")
+    con.executemany(
+        "INSERT INTO accounts(user_id, name, kind, created_at) VALUES (?,?,?,?)",
+        [(user_id, name, kind, created_at) for name, kind in DEFAULT_ACCOUNTS]
+    )
+    return con.execute("SELECT id FROM accounts WHERE user_id = ? ORDER BY id LIMIT 1", (user_id,)).fetchone()[0]
+
+def _apply_balance(con: sqlite3.Connection, user_id: int, account_id: int, delta: float, count: int) -> None:
+    """Soma `delta` ao saldo e `count` à contagem da conta (sem commit)."""
+    con.execute(
+        "INSERT INTO account_balances(account_id, user_id, balance, tx_count, updated_at) VALUES (?,?,?,?,?) "
+        "ON CONFLICT(account_id) DO UPDATE SET balance = balance + excluded.balance, "
+        "tx_count = tx_count + excluded.tx_count, updated_at = excluded.updated_at",
+        (account_id, user_id, delta, count, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
+
+def rebuild_account_balances(con: sqlite3.Connection, user_id: int) -> None:
+    """Recalcula do zero os saldos das contas do usuário (migração/reparo; sem commit)."""
+    con.execute("DELETE FROM account_balances WHERE user_id = ?", (user_id,))
+    con.execute(
+        f"INSERT INTO account_balances(account_id, user_id, balance, tx_count, updated_at) "
+        f"SELECT a.id, a.user_id, COALESCE(SUM({SIGNED_AMOUNT_SQL}), 0), COUNT(t.id), ? "
+        f"FROM accounts a LEFT JOIN transactions t ON t.account_id = a.id "
+        f"WHERE a.user_id = ? GROUP BY a.id",
+        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_id)
+    )
+
+def list_accounts(user_id: int) -> pd.DataFrame:
+    """Contas do usuário (id, name, kind), criando as padrão na primeira chamada."""
+    def load():
+        con = get_db().conn
+        if not con.execute("SELECT 1 FROM accounts WHERE user_id = ? LIMIT 1", (user_id,)).fetchone():
+            ensure_default_accounts(con, user_id)
+            con.commit()
+        return pd.read_sql_query(
+            "SELECT id, name, kind FROM accounts WHERE user_id = ? ORDER BY id", con, params=[user_id]
+        )
+    return cached_query(user_id, ("accounts",), load)
+
+def create_account(user_id: int, name: str, kind: str = "checking") -> int:
+    con = get_db().conn
+    try:
+        cur = con.execute(
+            "INSERT INTO accounts(user_id, name, kind, created_at) VALUES (?,?,?,?)",
+            (user_id, name, kind, datetime.now().strftime("%Y-%m-%d"))
+        )
+        _apply_balance(con, user_id, cur.lastrowid, 0.0, 0)
+        bump_data_version(con, user_id)
+        con.commit()
+        return cur.lastrowid
+    except Exception as e:
+        con.rollback()
+        raise e
+
+def get_account_balances(user_id: int) -> pd.DataFrame:
+    """Saldo de cada conta lido de account_balances (sem varrer transações)."""
+    def load():
+        return pd.read_sql_query(
+            "SELECT a.id, a.name, a.kind, COALESCE(b.balance, 0) AS balance, COALESCE(b.tx_count, 0) AS tx_count "
+            "FROM accounts a LEFT JOIN account_balances b ON b.account_id = a.id "
+            "WHERE a.user_id = ? ORDER BY a.id",
+            get_db().conn, params=[user_id]
+        )
+    return cached_query(user_id, ("account_balances",), load)
+
+def bump_data_version(con: sqlite3.Connection, user_id: int) -> None:
+    """Incrementa a versão dos dados do usuário na transação corrente (o commit fica com quem chamou)."""
+    con.execute(
+        "INSERT INTO data_versions(user_id, version) VALUES (?, 1) "
+        "ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+        (user_id,)
+    )
+
+def invalidate_balance_checkpoints(con: sqlite3.Connection, user_id: int, from_date: Optional[str]) -> None:
+    """Descarta os checkpoints do ledger a partir do mês de `from_date` (recalculados na próxima leitura)."""
+    if from_date:
+        con.execute(
+            "DELETE FROM balance_checkpoints WHERE user_id = ? AND month >= ?",
+            (user_id, str(from_date)[:7])
+        )
+
+def get_data_version(user_id: int) -> Optional[int]:
+    """Versão atual dos dados do usuário (None se a tabela ainda não existe)."""
+    try:
+        row = get_db().conn.execute(
+            "SELECT version FROM data_versions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else 0
+
+def cached_query(user_id: int, signature: tuple, loader: Callable[[], Any]) -> Any:
+    """
+    Executa `loader` uma vez por (user_id, signature, versão dos dados).
+
+    Qualquer escrita do usuário incrementa a versão, então o resultado nunca fica
+    desatualizado. Devolve uma cópia para que o chamador possa alterá-la à vontade.
+    """
+    version = get_data_version(user_id)
+    if version is None:
+        return loader()
+    key = (user_id, signature)
+    with _cache_lock:
+        hit = _query_cache.get(key)
+        if hit is not None and hit[0] == version:
+            _query_cache.move_to_end(key)
+            value = hit[1]
+        else:
+            hit = None
+    if hit is None:
+        value = loader()
+        with _cache_lock:
+            _query_cache[key] = (version, value)
+            _query_cache.move_to_end(key)
+            while len(_query_cache) > CACHE_MAX_ENTRIES:
+                _query_cache.popitem(last=False)
+    return value.copy() if isinstance(value, pd.DataFrame) else copy.deepcopy(value)
 
 def normalize_date(s) -> str:
     if isinstance(s, datetime):
@@ -78,11 +321,10 @@ def normalize_date(s) -> str:
     except Exception as e:
         raise ValueError(f"Não foi possível normalizar a data: {s} - {e}")
 
-def insert_transaction(user_id: int, date: str, description: str, amount: float, category: str, type: str) -> Dict[str, Any]:
-    db = get_db()
-    con = db.conn
+def _insert_row(con: sqlite3.Connection, user_id: int, date: str, description: str, amount: float, category: str, type: str, account_id: Optional[int] = None) -> Dict[str, Any]:
+    """Deduplica e insere uma transação na conexão dada, sem commit nem atualização de saldo."""
     normalized_date = normalize_date(date)
-    
+
     # Inferir tipo se necessário
     if type is None or type == "":
         type = "income" if amount >= 0 else "expense"
@@ -96,49 +338,80 @@ def insert_transaction(user_id: int, date: str, description: str, amount: float,
     if existing_transaction:
         return {"inserted": False, "reason": "Duplicate transaction"}
 
+    if account_id is None:
+        account_id = ensure_default_accounts(con, user_id)
+    con.execute(
+        """
+        INSERT INTO transactions(user_id, date, description, amount, category, type, account_id)
+        VALUES (?,?,?,?,?,?,?)
+        """
+        ,
+        (user_id, normalized_date, description, amount, category, type, account_id)
+    )
+    return {"inserted": True, "reason": "", "account_id": account_id, "signed": signed_amount(amount, type),
+            "date": normalized_date}
+
+def insert_transaction(user_id: int, date: str, description: str, amount: float, category: str, type: str, account_id: Optional[int] = None) -> Dict[str, Any]:
+    db = get_db()
+    con = db.conn
     try:
-        cur = con.cursor()
-        cur.execute(
-            """
-            INSERT INTO transactions(user_id, date, description, amount, category, type)
-            VALUES (?,?,?,?,?,?)
-            """
-            ,
-            (user_id, normalized_date, description, amount, category, type)
-        )
+        result = _insert_row(con, user_id, date, description, amount, category, type, account_id)
+        if result["inserted"]:
+            _apply_balance(con, user_id, result["account_id"], result["signed"], 1)
+            invalidate_balance_checkpoints(con, user_id, result["date"])
+            bump_data_version(con, user_id)
         con.commit()
-        return {"inserted": True, "reason": ""}
+        return {"inserted": result["inserted"], "reason": result["reason"]}
     except Exception as e:
         con.rollback()
         return {"inserted": False, "reason": str(e)}
 
-def bulk_insert_transactions(user_id: int, rows: list[dict]) -> Dict[str, int]:
+def bulk_insert_transactions(user_id: int, rows: list[dict], account_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Insere várias transações em uma única transação SQLite (um commit no final).
+    Linhas inválidas contam como falha sem interromper o lote. `account_id` é a
+    conta usada quando a linha não traz uma (padrão: conta padrão do usuário).
+    """
     inserted_count = 0
     duplicates_count = 0
     failed_count = 0
-    for row in rows:
-        # Assegura que todos os campos necessários estão presentes, com valores padrão se ausentes
-        date = row.get("date")
-        description = row.get("description", "")
-        amount = row.get("amount", 0.0)
-        category = row.get("category", "Uncategorized")
-        type = row.get("type")
-
-        # Tenta inferir o tipo se não fornecido ou vazio
-        if type is None or type == "":
-            type = "income" if amount >= 0 else "expense"
-
-        try:
-            result = insert_transaction(user_id, date, description, amount, category, type)
+    con = get_db().conn
+    try:
+        default_account = account_id or ensure_default_accounts(con, user_id)
+        deltas: Dict[int, list] = {}
+        earliest: Optional[str] = None
+        for row in rows:
+            # Assegura que todos os campos necessários estão presentes, com valores padrão se ausentes
+            date = row.get("date")
+            description = row.get("description", "")
+            amount = row.get("amount", 0.0)
+            category = row.get("category", "Uncategorized")
+            type = row.get("type")
+
+            try:
+                result = _insert_row(con, user_id, date, description, amount, category, type,
+                                     row.get("account_id") or default_account)
+            except Exception:
+                failed_count += 1
+                continue
             if result["inserted"]:
                 inserted_count += 1
+                acc = deltas.setdefault(result["account_id"], [0.0, 0])
+                acc[0] += result["signed"]
+                acc[1] += 1
+                earliest = min(earliest or result["date"], result["date"])
             else:
-                if result["reason"] == "Duplicate transaction":
-                    duplicates_count += 1
-                else:
-                    failed_count += 1
-        except Exception:
-            failed_count += 1
+                duplicates_count += 1
+        # saldo por conta: um UPDATE por conta em vez de um por linha
+        for acc_id, (delta, count) in deltas.items():
+            _apply_balance(con, user_id, acc_id, delta, count)
+        if inserted_count:
+            invalidate_balance_checkpoints(con, user_id, earliest)
+            bump_data_version(con, user_id)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
     return {"inserted": inserted_count, "duplicates": duplicates_count, "failed": failed_count}
 
 def get_transactions_filtered(
@@ -148,6 +421,16 @@ def get_transactions_filtered(
     categories: Optional[list[str]] = None,
     type_filter: Optional[str] = None  # None|"income"|"expense"
 ) -> pd.DataFrame:
+    signature = (
+        "transactions_filtered", date_start, date_end,
+        tuple(categories) if categories else None, type_filter,
+    )
+    return cached_query(
+        user_id, signature,
+        lambda: _load_transactions_filtered(user_id, date_start, date_end, categories, type_filter),
+    )
+
+def _load_transactions_filtered(user_id, date_start, date_end, categories, type_filter) -> pd.DataFrame:
     db = get_db()
     con = db.conn
     query = "SELECT date, description, category, type, amount FROM transactions WHERE user_id = ?"
@@ -213,6 +496,7 @@ def create_goal(user_id: int, name: str, target_amount: float, due_date: Optiona
             ,
             (user_id, name, target_amount, normalized_due_date, 0.0, created_at)
         )
+        bump_data_version(con, user_id)
         con.commit()
         goal_id = cur.lastrowid
         return {"id": goal_id, "user_id": user_id, "name": name, "target_amount": target_amount, "due_date": normalized_due_date, "funded_amount": 0.0, "created_at": created_at}
@@ -247,19 +531,18 @@ def update_goal(goal_id: int, user_id: int, *, name: Optional[str] = None, targe
 
     try:
         cur = con.cursor()
+        # RETURNING devolve a linha atualizada sem uma nova consulta
         cur.execute(
-            f"UPDATE goals SET {', '.join(updates)} WHERE id = ? AND user_id = ?",
+            f"UPDATE goals SET {', '.join(updates)} WHERE id = ? AND user_id = ? AND deleted_at IS NULL RETURNING *",
             params
         )
-        con.commit()
-        # Re-fetch the updated row to get all columns
-        cur.execute("SELECT * FROM goals WHERE id = ? AND user_id = ?", (goal_id, user_id))
         updated_row = cur.fetchone()
-        if updated_row:
-            columns = [description[0] for description in cur.description]
-            return dict(zip(columns, updated_row))
-        else:
+        if not updated_row:
             raise ValueError("Meta não encontrada ou não pertence ao usuário.")
+        columns = [description[0] for description in cur.description]
+        bump_data_version(con, user_id)
+        con.commit()
+        return dict(zip(columns, updated_row))
     except Exception as e:
         con.rollback()
         raise e
@@ -267,67 +550,198 @@ def update_goal(goal_id: int, user_id: int, *, name: Optional[str] = None, targe
 
 
 
-def fund_goal(goal_id: int, user_id: int, amount: float) -> dict:
+def record_allocation_history(con: sqlite3.Connection, user_id: int, goals: pd.DataFrame,
+                              actual: list, planned: Optional[list] = None, source: str = "fund") -> None:
+    """
+    Grava aportes em allocation_history na transação corrente (o commit fica com quem chamou).
+
+    `goals`: linhas da tabela goals *antes* do aporte (id, target_amount,
+    funded_amount, due_date); as features do score são calculadas delas.
+    """
+    from scripts.utils.allocation import FEATURES, GoalArrays, goal_features
+
+    now = datetime.now()
+    feats = goal_features(GoalArrays.from_frame(goals, now.date()))
+    planned = planned if planned is not None else [None] * len(goals)
+    con.executemany(
+        f"INSERT INTO allocation_history(user_id, goal_id, month, planned_amount, actual_amount, "
+        f"{', '.join(FEATURES)}, source, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (user_id, int(gid), now.strftime("%Y-%m"), p, float(a), *map(float, f), source,
+             now.strftime("%Y-%m-%d %H:%M:%S"))
+            for gid, a, p, f in zip(goals["id"], actual, planned, feats)
+        ],
+    )
+
+# Registra o aporte no ledger calculando no SQL o valor aplicado (o funded_amount nunca fica negativo)
+_CONTRIBUTION_INSERT = (
+    "INSERT INTO goal_contributions(user_id, goal_id, amount, requested_amount, funded_before, source, batch, created_at) "
+    "SELECT user_id, id, MAX(-COALESCE(funded_amount, 0), ?), ?, COALESCE(funded_amount, 0), ?, ?, ? "
+    "FROM goals WHERE id = ? AND user_id = ? AND deleted_at IS NULL"
+)
+_FUND_UPDATE = "UPDATE goals SET funded_amount = MAX(0, COALESCE(funded_amount, 0) + ?) WHERE id = ? AND user_id = ?"
+
+def fund_goal(goal_id: int, user_id: int, amount: float, planned_amount: Optional[float] = None,
+              source: str = "fund") -> dict:
+    """
+    Aporta (ou estorna, se negativo) `amount` na meta, sem ler e regravar o saldo em Python.
+
+    O INSERT no ledger e o UPDATE ... RETURNING rodam na mesma transação; o
+    primeiro já segura o lock de escrita, então sessões concorrentes não se perdem.
+    O reajuste dos pesos da alocação fica agendado para depois do commit.
+    """
+    from scripts.utils.allocation import schedule_weight_refit
+
     db = get_db()
     con = db.conn
 
     try:
         cur = con.cursor()
-        # Get current funded_amount
-        cur.execute("SELECT funded_amount FROM goals WHERE id = ? AND user_id = ?", (goal_id, user_id))
-        result = cur.fetchone()
-
-        if not result:
-            raise ValueError("Meta não encontrada ou não pertence ao usuário.")
-
-        current_funded_amount = result[0]
-        new_funded_amount = max(0.0, current_funded_amount + amount)
-
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         cur.execute(
-            "UPDATE goals SET funded_amount = ? WHERE id = ? AND user_id = ?",
-            (new_funded_amount, goal_id, user_id)
+            _CONTRIBUTION_INSERT + " RETURNING amount, funded_before",
+            (amount, amount, source, None, created_at, goal_id, user_id)
         )
+        contribution = cur.fetchone()
+        if not contribution:
+            raise ValueError("Meta não encontrada ou não pertence ao usuário.")
+        cur.execute(_FUND_UPDATE + " RETURNING *", (amount, goal_id, user_id))
+        columns = [description[0] for description in cur.description]
+        updated = dict(zip(columns, cur.fetchone()))
+        # histórico planejado x realizado, base do ajuste de pesos da alocação (estado antes do aporte)
+        before = pd.DataFrame([{**updated, "funded_amount": contribution[1]}])
+        record_allocation_history(con, user_id, before, [contribution[0]], [planned_amount], source)
+        bump_data_version(con, user_id)
         con.commit()
-        # Re-fetch the updated row to get all columns
-        cur.execute("SELECT * FROM goals WHERE id = ? AND user_id = ?", (goal_id, user_id))
-        updated_row = cur.fetchone()
-        if updated_row:
-            columns = [description[0] for description in cur.description]
-            return dict(zip(columns, updated_row))
-        else:
-            raise ValueError("Meta não encontrada após atualização.")
     except Exception as e:
         con.rollback()
         raise e
+    schedule_weight_refit(user_id)
+    return updated
+
 
 
 
+def apply_allocation(user_id: int, plan: Dict[int, float], source: str = "allocation") -> pd.DataFrame:
+    """
+    Aplica um plano {goal_id: valor} em uma única transação (um commit).
+
+    Grava o ledger de aportes e atualiza o funded_amount de todas as metas com
+    executemany (o valor aplicado é calculado no SQL), grava o histórico
+    planejado x realizado e devolve as metas atualizadas do usuário (mesmas
+    colunas de `list_goals`) em uma consulta. O reajuste dos pesos não entra
+    nessa transação: fica agendado em segundo plano (`schedule_weight_refit`).
+    """
+    from scripts.utils.allocation import schedule_weight_refit
+
+    plan = {int(k): float(v) for k, v in plan.items() if v}
+    con = get_db().conn
+    try:
+        if plan:
+            batch = uuid.uuid4().hex
+            created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cur = con.executemany(
+                _CONTRIBUTION_INSERT,
+                [(v, v, source, batch, created_at, g, user_id) for g, v in plan.items()]
+            )
+            if cur.rowcount != len(plan):
+                raise ValueError("Meta não encontrada ou não pertence ao usuário.")
+            con.executemany(_FUND_UPDATE, [(v, g, user_id) for g, v in plan.items()])
+            before = pd.read_sql_query(
+                "SELECT c.goal_id AS id, g.target_amount, c.funded_before AS funded_amount, g.due_date, "
+                "c.amount, c.requested_amount FROM goal_contributions c JOIN goals g ON g.id = c.goal_id "
+                "WHERE c.batch = ? ORDER BY c.id",
+                con, params=[batch]
+            )
+            record_allocation_history(con, user_id, before, list(before["amount"]),
+                                      list(before["requested_amount"]), source)
+            bump_data_version(con, user_id)
+            con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    if plan:
+        schedule_weight_refit(user_id)
+    return pd.read_sql_query(
+        "SELECT id, name, target_amount, funded_amount, due_date, created_at FROM goals "
+        "WHERE user_id = ? AND deleted_at IS NULL",
+        con, params=[user_id]
+    )
+
+def list_goal_contributions(user_id: int, goal_id: Optional[int] = None) -> pd.DataFrame:
+    """Ledger de aportes do usuário (opcionalmente de uma meta), mais recentes primeiro."""
+    def load():
+        query = ("SELECT id, goal_id, amount, requested_amount, funded_before, source, batch, created_at "
+                 "FROM goal_contributions WHERE user_id = ?")
+        params = [user_id]
+        if goal_id is not None:
+            query += " AND goal_id = ?"
+            params.append(goal_id)
+        return pd.read_sql_query(query + " ORDER BY id DESC", get_db().conn, params=params)
+    return cached_query(user_id, ("goal_contributions", goal_id), load)
 
 def delete_goal(goal_id: int, user_id: int) -> bool:
+    """
+    Exclusão lógica: marca deleted_at e a meta some de `list_goals`/`list_goals_overview`.
+
+    O ledger (goal_contributions) e o histórico planejado x realizado ficam
+    intactos, e os pesos da alocação continuam valendo como estão.
+    """
     db = get_db()
     con = db.conn
 
     try:
         cur = con.cursor()
         cur.execute(
-            "DELETE FROM goals WHERE id = ? AND user_id = ?",
-            (goal_id, user_id)
+            "UPDATE goals SET deleted_at = ? WHERE id = ? AND user_id = ? AND deleted_at IS NULL",
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), goal_id, user_id)
         )
+        deleted = cur.rowcount > 0
+        bump_data_version(con, user_id)
         con.commit()
-        return cur.rowcount > 0
     except Exception as e:
         con.rollback()
         raise e
+    return deleted
 
 
 
 
 def list_goals(user_id: int) -> pd.DataFrame:
-    db = get_db()
-    con = db.conn
-    query = "SELECT id, name, target_amount, funded_amount, due_date, created_at FROM goals WHERE user_id = ?"
-    df = pd.read_sql_query(query, con, params=[user_id])
-    return df
+    def load():
+        db = get_db()
+        con = db.conn
+        query = ("SELECT id, name, target_amount, funded_amount, due_date, created_at FROM goals "
+                 "WHERE user_id = ? AND deleted_at IS NULL")
+        return pd.read_sql_query(query, con, params=[user_id])
+    return cached_query(user_id, ("goals",), load)
+
+
+# Faixas de status das metas (progresso em %)
+GOAL_STATUS_DONE_PCT = 100.0
+GOAL_STATUS_HALF_PCT = 50.0
+
+def list_goals_overview(user_id: int) -> pd.DataFrame:
+    """
+    Metas do usuário prontas para exibição, calculadas no SQL em uma consulta.
+
+    Além das colunas de `list_goals`, traz progress_pct (arredondado a 0,1) e
+    status ('done', 'in_progress', 'started'), já ordenadas por prazo (sem
+    prazo por último) e maior progresso. Cacheado até a próxima escrita do usuário.
+    """
+    def load():
+        query = (
+            "SELECT *, CASE WHEN progress_pct >= ? THEN 'done' WHEN progress_pct >= ? THEN 'in_progress' "
+            "ELSE 'started' END AS status FROM ("
+            "SELECT id, name, target_amount, COALESCE(funded_amount, 0) AS funded_amount, "
+            "NULLIF(due_date, '') AS due_date, created_at, CASE WHEN target_amount > 0 THEN ROUND(100.0 * COALESCE(funded_amount, 0) / target_amount, 1) "
+            "ELSE 0.0 END AS progress_pct FROM goals WHERE user_id = ? AND deleted_at IS NULL) "
+            "ORDER BY due_date IS NULL, due_date, progress_pct DESC, id"
+        )
+        return pd.read_sql_query(
+            query, get_db().conn, params=[GOAL_STATUS_DONE_PCT, GOAL_STATUS_HALF_PCT, user_id]
+        )
+    return cached_query(user_id, ("goals", "overview"), load)
 
 
 
@@ -354,10 +768,28 @@ def update_transaction(con: sqlite3.Connection, id: int, user_id: int, fields: D
 
     try:
         cur = con.cursor()
+        before = con.execute(
+            "SELECT account_id, amount, type, date FROM transactions WHERE id = ? AND user_id = ?", (id, user_id)
+        ).fetchone()
         cur.execute(
             f"UPDATE transactions SET {', '.join(updates)} WHERE id = ? AND user_id = ?",
             params
         )
+        if cur.rowcount:
+            # saldo: retira o valor antigo da conta antiga e soma o novo na conta nova
+            after = con.execute(
+                "SELECT account_id, amount, type, date FROM transactions WHERE id = ?", (id,)
+            ).fetchone()
+            if before[0] is not None:
+                _apply_balance(con, user_id, before[0], -signed_amount(before[1], before[2]), -1)
+            if after[0] is not None:
+                _apply_balance(con, user_id, after[0], signed_amount(after[1], after[2]), 1)
+            # checkpoints do ledger: a partir do mês mais antigo entre a data antiga e a nova
+            datas = [str(d) for d in (before[3], after[3]) if d]
+            invalidate_balance_checkpoints(con, user_id, min(datas) if datas else None)
+            bump_data_version(con, user_id)
+            # linha já exportada mudou: o snapshot Parquet do usuário é reconstruído na próxima leitura
+            con.execute("DELETE FROM analytics_snapshots WHERE user_id = ?", (user_id,))
         return cur.rowcount
     except Exception as e:
         con.rollback()
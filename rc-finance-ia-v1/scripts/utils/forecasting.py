@@ -0,0 +1,183 @@
+# scripts/utils/forecasting.py
+"""
+Motor de projeção vetorizado (NumPy): tendência linear + sazonalidade mensal +
+média móvel dos resíduos, com intervalo de confiança.
+
+`fit` recebe uma matriz (séries x meses) e ajusta todas as séries de uma vez;
+séries mais curtas vêm preenchidas com NaN à esquerda. `predict` gera todos os
+horizontes de uma vez. `forecast_user` cacheia os parâmetros ajustados por
+usuário até a próxima escrita (ver `cached_query`).
+"""
+from __future__ import annotations
+
+import sqlite3
+import sys
+from datetime import date
+from pathlib import Path
+from statistics import NormalDist
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.db_utils import SIGNED_AMOUNT_SQL, cached_query, get_data_version, get_db
+from scripts.utils.ledger import balance_at
+
+SEASON_LENGTH = 12
+MA_WINDOW = 3
+# Sazonalidade só é estimada com pelo menos dois ciclos completos
+MIN_SEASONAL_CYCLES = 2
+
+
+def fit(y, season_length: int = SEASON_LENGTH, ma_window: int = MA_WINDOW) -> dict:
+    """
+    Ajusta tendência, sazonalidade e nível (média móvel dos resíduos) para cada linha de `y`.
+
+    `y` tem forma (séries, meses) ou (meses,); NaN marca meses sem observação
+    (preenchimento à esquerda de séries mais curtas).
+    """
+    Y = np.atleast_2d(np.asarray(y, dtype=float))
+    R, T = Y.shape
+    mask = ~np.isnan(Y)
+    Yz = np.where(mask, Y, 0.0)
+    n = mask.sum(axis=1)
+    n_safe = np.maximum(n, 1)
+    t = np.arange(T, dtype=float)
+
+    # tendência: mínimos quadrados em forma fechada, só sobre os pontos observados
+    tbar = (mask * t).sum(axis=1) / n_safe
+    ybar = Yz.sum(axis=1) / n_safe
+    dt = np.where(mask, t - tbar[:, None], 0.0)
+    sxx = (dt ** 2).sum(axis=1)
+    slope = np.divide((dt * (Yz - ybar[:, None])).sum(axis=1), sxx, out=np.zeros(R), where=sxx > 0)
+    intercept = ybar - slope * tbar
+    resid = np.where(mask, Y - (intercept[:, None] + slope[:, None] * t), 0.0)
+
+    # sazonalidade: média do resíduo por posição no ciclo, centrada em zero
+    m = max(int(season_length), 1)
+    cycles = -(-T // m)
+    pad = cycles * m - T
+    r3 = np.pad(resid, ((0, 0), (0, pad))).reshape(R, cycles, m)
+    c3 = np.pad(mask, ((0, 0), (0, pad))).reshape(R, cycles, m)
+    counts = c3.sum(axis=1)
+    seasonal = np.divide(r3.sum(axis=1), counts, out=np.zeros((R, m)), where=counts > 0)
+    seasonal -= seasonal.mean(axis=1, keepdims=True)
+    seasonal[n < MIN_SEASONAL_CYCLES * m] = 0.0
+    resid = np.where(mask, resid - seasonal[:, np.arange(T) % m], 0.0)
+
+    # nível: média móvel dos últimos resíduos (séries alinhadas à direita)
+    w = max(int(ma_window), 1)
+    tail_n = mask[:, -w:].sum(axis=1)
+    level = np.divide(resid[:, -w:].sum(axis=1), tail_n, out=np.zeros(R), where=tail_n > 0)
+
+    dof = np.maximum(n - 2, 1)
+    sigma = np.sqrt((resid ** 2).sum(axis=1) / dof)
+    return {
+        "intercept": intercept, "slope": slope, "seasonal": seasonal, "level": level,
+        "sigma": sigma, "n": n, "tbar": tbar, "sxx": sxx, "T": T,
+    }
+
+
+def predict(params: dict, horizon: int, level: float = 0.95) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Média, limite inferior e superior para os horizontes 1..horizon: arrays (séries, horizon)."""
+    h = np.arange(1, int(horizon) + 1)
+    tf = params["T"] - 1 + h
+    seasonal = params["seasonal"]
+    mean = (
+        params["intercept"][:, None] + params["slope"][:, None] * tf
+        + seasonal[:, tf % seasonal.shape[1]] + params["level"][:, None]
+    )
+    # erro de previsão da regressão: cresce com a distância ao centro da série
+    sxx = params["sxx"][:, None]
+    lever = np.divide((tf - params["tbar"][:, None]) ** 2, sxx, out=np.zeros(mean.shape), where=sxx > 0)
+    se = params["sigma"][:, None] * np.sqrt(1 + 1 / np.maximum(params["n"], 1)[:, None] + lever)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    return mean, mean - z * se, mean + z * se
+
+
+def cumulative_paths(params: dict, start_balances, horizon: int,
+                     level: float = 0.95) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Saldo líquido mensal projetado e saldo acumulado com intervalo, para todas as séries: (séries, horizon)."""
+    mean, lower, _ = predict(params, horizon, level)
+    # variâncias mensais somam no acumulado (erros supostos independentes)
+    half = np.sqrt(np.cumsum((mean - lower) ** 2, axis=1))
+    path = np.asarray(start_balances, dtype=float).reshape(-1, 1) + np.cumsum(mean, axis=1)
+    return mean, path, path - half, path + half
+
+
+def forecast_cumulative(net, start_balance: float, horizon: int, level: float = 0.95,
+                        params: Optional[dict] = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Saldo acumulado projetado a partir do saldo líquido mensal `net` (uma série)."""
+    _, path, lower, upper = cumulative_paths(params or fit(net), [start_balance], horizon, level)
+    return path[0], lower[0], upper[0]
+
+
+def _monthly_net(user_id: int) -> pd.Series:
+    """Saldo líquido por mês fechado (receita - despesa em módulo), meses sem movimento = 0."""
+    current_month = date.today().strftime("%Y-%m")
+    rows = get_db().conn.execute(
+        f"SELECT substr(date, 1, 7) AS month, SUM({SIGNED_AMOUNT_SQL}) "
+        "FROM transactions WHERE user_id = ? AND date < ? GROUP BY 1 ORDER BY 1",
+        (user_id, f"{current_month}-01"),
+    ).fetchall()
+    if not rows:
+        return pd.Series(dtype=float)
+    s = pd.Series({pd.Period(m, freq="M"): v for m, v in rows}, dtype=float)
+    return s.reindex(pd.period_range(s.index.min(), s.index.max(), freq="M"), fill_value=0.0)
+
+
+def _fit_user(user_id: int) -> Optional[dict]:
+    net = _monthly_net(user_id)
+    if len(net) < 2:
+        return None
+    return {"params": fit(net.to_numpy()), "last_month": net.index[-1]}
+
+
+def forecast_user(user_id: int, horizon: int = 6, level: float = 0.95) -> pd.DataFrame:
+    """
+    Projeção do saldo acumulado do usuário para os próximos `horizon` meses.
+
+    Colunas: net_forecast, balance_forecast, balance_lower, balance_upper; índice
+    mensal (Period). Parte do saldo do ledger no fim do último mês fechado. Os
+    parâmetros ajustados ficam em cache até a próxima escrita do usuário.
+    """
+    fitted = cached_query(user_id, ("forecasting", "params", SEASON_LENGTH, MA_WINDOW), lambda: _fit_user(user_id))
+    if fitted is None:
+        return pd.DataFrame(columns=["net_forecast", "balance_forecast", "balance_lower", "balance_upper"])
+    last = fitted["last_month"]
+    start = balance_at(user_id, last.end_time.strftime("%Y-%m-%d"))
+    net, path, lower, upper = cumulative_paths(fitted["params"], [start], horizon, level)
+    return pd.DataFrame(
+        {"net_forecast": net[0], "balance_forecast": path[0], "balance_lower": lower[0], "balance_upper": upper[0]},
+        index=pd.period_range(last + 1, periods=horizon, freq="M"),
+    )
+
+
+def stored_forecast(user_id: int) -> Optional[pd.DataFrame]:
+    """
+    Projeção pré-calculada por tools/forecast_all.py (tabela `forecasts`).
+
+    None se não houver ou se o usuário escreveu depois do cálculo (versão dos
+    dados diferente); nesse caso o chamador usa `forecast_user`. Sem cache: o
+    lote roda em outro processo e não altera a versão dos dados.
+    """
+    try:
+        rows = get_db().conn.execute(
+            "SELECT month, net_forecast, balance_forecast, balance_lower, balance_upper, data_version "
+            "FROM forecasts WHERE user_id = ? ORDER BY month",
+            (user_id,),
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    if not rows or rows[0][5] != get_data_version(user_id):
+        return None
+    return pd.DataFrame(
+        [r[1:5] for r in rows],
+        columns=["net_forecast", "balance_forecast", "balance_lower", "balance_upper"],
+        index=pd.PeriodIndex([r[0] for r in rows], freq="M"),
+    )
@@ -0,0 +1,123 @@
+# scripts/utils/import_queue.py
+"""
+Importação de vários arquivos de uma vez (CSV, OFX e PDF).
+
+Cada arquivo é lido em um processo do pool; os resultados são mesclados e
+deduplicados entre arquivos antes de uma única inserção em lote.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+from scripts.utils.db_utils import normalize_date
+from scripts.utils.importers import parse_csv, parse_ofx
+from scripts.utils.pdf_bank_parser import parse_pdf_statement
+
+
+def parse_upload(name: str, data: bytes) -> list[dict]:
+    """Converte um arquivo (nome + bytes) em transações, escolhendo o parser pela extensão."""
+    nome = name.lower()
+    if nome.endswith(".csv"):
+        return parse_csv(data)
+    if nome.endswith(".ofx"):
+        return parse_ofx(data)
+    if nome.endswith(".pdf"):
+        # pdfplumber/OCR trabalham sobre caminho de arquivo
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return parse_pdf_statement(tmp_path)
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    raise ValueError("Formato de arquivo não suportado.")
+
+
+def _parse_worker(args: tuple[str, bytes]) -> Dict[str, Any]:
+    """Worker (processo): nunca levanta; erros viram status do arquivo."""
+    name, data = args
+    t0 = time.perf_counter()
+    try:
+        rows = parse_upload(name, data)
+        return {"file": name, "ok": True, "rows": rows, "error": "", "seconds": time.perf_counter() - t0}
+    except Exception as e:
+        return {"file": name, "ok": False, "rows": [], "error": str(e), "seconds": time.perf_counter() - t0}
+
+
+def dedup_key(row: dict) -> tuple:
+    """Mesma chave da deduplicação do banco: (date, description, amount, category)."""
+    try:
+        date = normalize_date(row.get("date"))
+    except ValueError:
+        date = str(row.get("date"))
+    return (
+        date,
+        row.get("description", ""),
+        row.get("amount", 0.0),
+        row.get("category", "Uncategorized"),
+    )
+
+
+def parse_files_parallel(
+    files: list[tuple[str, bytes]], max_workers: Optional[int] = None
+) -> tuple[list[dict], list[Dict[str, Any]]]:
+    """
+    Lê vários arquivos em paralelo e mescla o resultado.
+
+    Args:
+        files: lista de (nome do arquivo, bytes)
+        max_workers: processos do pool (padrão: núcleos disponíveis, limitado ao nº de arquivos)
+
+    Returns:
+        (transações únicas na ordem dos arquivos, status por arquivo)
+    """
+    if not files:
+        return [], []
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(files)))
+    if workers == 1:
+        results = [_parse_worker(f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_parse_worker, files))
+
+    seen: set[tuple] = set()
+    merged: list[dict] = []
+    status: list[Dict[str, Any]] = []
+    for r in results:
+        unicas = 0
+        for row in r["rows"]:
+            key = dedup_key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(row)
+            unicas += 1
+        if not r["ok"]:
+            situacao = "Erro"
+        elif not r["rows"]:
+            situacao = "Sem transações"
+        else:
+            situacao = "OK"
+        status.append({
+            "Arquivo": r["file"],
+            "Status": situacao,
+            "Transações": len(r["rows"]),
+            "Duplicadas": len(r["rows"]) - unicas,
+            "Tempo (s)": round(r["seconds"], 2),
+            "Erro": r["error"],
+        })
+    return merged, status
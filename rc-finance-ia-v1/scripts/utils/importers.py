@@ -1,5 +1,6 @@
 
 import sys
+import logging
 from pathlib import Path
 import pandas as pd
 import csv
@@ -12,8 +13,15 @@ project_root = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(project_root))
 
 from scripts.utils.db_utils import normalize_date
+from scripts.utils.text_decoding import decode_bytes
+
+logger = logging.getLogger(__name__)
+
+def parse_csv(file_content: str | bytes) -> list[dict]:
+    if isinstance(file_content, bytes):
+        # Exportações de banco costumam vir em latin-1/cp1252 (Excel no Windows)
+        file_content = decode_bytes(file_content)
 
-def parse_csv(file_content: str) -> list[dict]:
     transactions = []
     # Detectar automaticamente o delimitador
     try:
@@ -56,13 +64,42 @@ def parse_csv(file_content: str) -> list[dict]:
         })
     return transactions
 
-def parse_ofx(file_content: str) -> list[dict]:
+def parse_ofx(file_content: str | bytes) -> list[dict]:
+    """OFX -> transações (valor com sinal). Parser rápido primeiro, ofxparse como fallback."""
+    from scripts.utils.ofx_import import iter_ofx_stmttrn
+
+    transactions = []
+    try:
+        if isinstance(file_content, str):
+            stmttrns = iter_ofx_stmttrn(file_content.encode("utf-8"), encoding="utf-8")
+        else:
+            stmttrns = iter_ofx_stmttrn(file_content)
+        for t in stmttrns:
+            amount = t["amount"]
+            transactions.append({
+                "date": t["date"],
+                "description": t["memo"] or None,
+                "amount": amount,
+                "category": t["name"] or t["payee"] or "Uncategorized", # OFX pode ter payee como categoria
+                "type": "income" if amount >= 0 else "expense"
+            })
+        if transactions:
+            return transactions
+    except Exception as e:
+        logger.warning(f"Parser OFX rápido falhou, usando ofxparse: {e}")
+
+    return _parse_ofx_ofxparse(file_content)
+
+def _parse_ofx_ofxparse(file_content: str | bytes) -> list[dict]:
     try:
         from ofxparse import OfxParser
     except ImportError:
         # ofxparse não está disponível
         return []
 
+    if isinstance(file_content, bytes):
+        file_content = decode_bytes(file_content, default="cp1252")
+
     transactions = []
     try:
         ofx = OfxParser.parse(StringIO(file_content))
@@ -0,0 +1,288 @@
+# scripts/utils/jobs.py
+"""
+Execução de tarefas longas em segundo plano (importação, exportação, projeção, transcrição).
+
+O estado fica na tabela `jobs` do SQLite e o resultado em arquivo pickle em
+data/jobs/, então a tarefa continua rodando no servidor mesmo que a página
+seja recarregada. As páginas chamam `submit_job` e depois consultam `get_job`.
+O resultado de um job é apagado quando outro do mesmo tipo é enviado pelo
+usuário ou depois de RESULT_TTL_DAYS dias.
+
+Nada é gravado no import: a aplicação chama `recover_jobs` na inicialização
+(também roda no primeiro `submit_job` do processo). Enquanto um job está
+ativo, o processo que o executa renova `updated_at` a cada HEARTBEAT_SECONDS;
+só jobs sem esse sinal há STALE_AFTER_SECONDS são dados como interrompidos.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+from scripts.utils.db_utils import DATA_DIR, get_db, init_db
+
+JOBS_DIR = DATA_DIR / "jobs"
+JOBS_DIR.mkdir(parents=True, exist_ok=True)
+
+# Tarefas simultâneas por processo do servidor
+MAX_WORKERS = int(os.getenv("RC_JOB_WORKERS", "2"))
+# Resultados em data/jobs/ mais antigos que isso são apagados na inicialização
+RESULT_TTL_DAYS = int(os.getenv("RC_JOB_RESULT_TTL_DAYS", "7"))
+# Heartbeat dos jobs ativos; queued/running sem sinal por STALE_AFTER_SECONDS = órfão
+HEARTBEAT_SECONDS = int(os.getenv("RC_JOB_HEARTBEAT_SECONDS", "30"))
+STALE_AFTER_SECONDS = int(os.getenv("RC_JOB_STALE_AFTER_SECONDS", str(4 * HEARTBEAT_SECONDS)))
+
+logger = logging.getLogger(__name__)
+
+_HANDLERS: Dict[str, Callable[..., Any]] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_active: set[int] = set()  # jobs deste processo ainda em queued/running
+_recover_lock = threading.Lock()
+_recovered = False
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _update(job_id: int, **fields) -> None:
+    fields["updated_at"] = _now()
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    con = get_db().conn
+    con.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+    con.commit()
+
+
+class JobContext:
+    """Passado ao handler para reportar progresso (0..1) e mensagem."""
+
+    def __init__(self, job_id: int, user_id: int):
+        self.job_id = job_id
+        self.user_id = user_id
+
+    def progress(self, fraction: float, message: str = "") -> None:
+        _update(self.job_id, progress=max(0.0, min(1.0, float(fraction))), message=message)
+
+
+def register_job(kind: str):
+    """Decorator: registra `fn(ctx, **params)` como handler do tipo `kind`."""
+    def deco(fn):
+        _HANDLERS[kind] = fn
+        return fn
+    return deco
+
+
+def _heartbeat() -> None:
+    """Thread daemon: renova updated_at dos jobs ativos deste processo."""
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        with _lock:
+            ids = list(_active)
+        if not ids:
+            continue
+        try:
+            con = get_db().conn
+            con.execute(
+                f"UPDATE jobs SET updated_at = ? WHERE id IN ({', '.join('?' for _ in ids)}) "
+                "AND status IN ('queued', 'running')",
+                (_now(), *ids),
+            )
+            con.commit()
+        except Exception as e:
+            logger.warning(f"Heartbeat dos jobs falhou: {e}")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    recover_jobs()
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="rc-job")
+            threading.Thread(target=_heartbeat, name="rc-job-heartbeat", daemon=True).start()
+        return _executor
+
+
+def _recover_orphans() -> None:
+    """
+    Jobs queued/running sem heartbeat há mais de STALE_AFTER_SECONDS viram failed.
+
+    O processo que executa um job renova updated_at enquanto vive, então jobs
+    de outro servidor em atividade não são tocados; só os de um que caiu.
+    """
+    cutoff = (datetime.now() - timedelta(seconds=STALE_AFTER_SECONDS)).strftime("%Y-%m-%d %H:%M:%S")
+    stale = "status IN ('queued', 'running') AND (updated_at IS NULL OR updated_at < ?)"
+    con = get_db().conn
+    if con.execute(f"SELECT 1 FROM jobs WHERE {stale} LIMIT 1", (cutoff,)).fetchone() is None:
+        return
+    con.execute(
+        f"UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE {stale}",
+        ("Interrompido: o processo que executava o job parou.", _now(), cutoff),
+    )
+    con.commit()
+
+
+def _drop_results(rows) -> None:
+    """Apaga os arquivos de resultado dos jobs (id, result_path) e limpa result_path."""
+    for _, path in rows:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    if rows:
+        con = get_db().conn
+        con.executemany("UPDATE jobs SET result_path = NULL WHERE id = ?", [(job_id,) for job_id, _ in rows])
+        con.commit()
+
+
+def _expire_results() -> None:
+    """Remove os resultados de jobs terminados há mais de RESULT_TTL_DAYS dias."""
+    cutoff = (datetime.now() - timedelta(days=RESULT_TTL_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    _drop_results(get_db().conn.execute(
+        "SELECT id, result_path FROM jobs WHERE result_path IS NOT NULL AND updated_at < ?", (cutoff,)
+    ).fetchall())
+
+
+def recover_jobs() -> None:
+    """
+    Inicialização dos jobs, uma vez por processo: garante as tabelas, apaga os
+    resultados expirados e marca como failed os jobs órfãos. Chamada pelo
+    ponto de entrada da aplicação (ui.py) e, se ainda não rodou, por `submit_job`.
+    """
+    global _recovered
+    with _recover_lock:
+        if _recovered:
+            return
+        init_db()
+        _expire_results()
+        _recover_orphans()
+        _recovered = True
+
+
+def _run(job_id: int, user_id: int, kind: str, params: Dict[str, Any]) -> None:
+    try:
+        _update(job_id, status="running", message="Em execução...")
+        result = _HANDLERS[kind](JobContext(job_id, user_id), **params)
+        path = JOBS_DIR / f"{job_id}.pkl"
+        with open(path, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        _update(job_id, status="done", progress=1.0, message="Concluído", result_path=str(path))
+    except Exception as e:
+        _update(job_id, status="failed", error=str(e), message="Falhou")
+    finally:
+        with _lock:
+            _active.discard(job_id)
+
+
+def submit_job(user_id: int, kind: str, **params) -> int:
+    """Enfileira um job e retorna o id. `params` ficam em memória (podem conter bytes/DataFrames)."""
+    if kind not in _HANDLERS:
+        raise ValueError(f"Tipo de job desconhecido: {kind}")
+    executor = _get_executor()
+    # o novo job substitui os anteriores do mesmo tipo: seus resultados não serão mais lidos
+    _drop_results(get_db().conn.execute(
+        "SELECT id, result_path FROM jobs WHERE user_id = ? AND kind = ? AND result_path IS NOT NULL",
+        (user_id, kind),
+    ).fetchall())
+    con = get_db().conn
+    cur = con.execute(
+        "INSERT INTO jobs(user_id, kind, status, progress, message, pid, created_at, updated_at) "
+        "VALUES (?, ?, 'queued', 0.0, 'Na fila', ?, ?, ?)",
+        (user_id, kind, os.getpid(), _now(), _now()),
+    )
+    con.commit()
+    job_id = cur.lastrowid
+    with _lock:
+        _active.add(job_id)
+    executor.submit(_run, job_id, user_id, kind, params)
+    return job_id
+
+
+def get_job(job_id: int, user_id: int) -> Optional[dict]:
+    row = get_db().conn.execute(
+        "SELECT id, user_id, kind, status, progress, message, result_path, error, created_at, updated_at "
+        "FROM jobs WHERE id = ? AND user_id = ?",
+        (job_id, user_id),
+    ).fetchone()
+    if row is None:
+        return None
+    keys = ("id", "user_id", "kind", "status", "progress", "message", "result_path", "error", "created_at", "updated_at")
+    return dict(zip(keys, row))
+
+
+def list_jobs(user_id: int, limit: int = 20) -> list[dict]:
+    rows = get_db().conn.execute(
+        "SELECT id, kind, status, progress, message, error, created_at, updated_at "
+        "FROM jobs WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+        (user_id, limit),
+    ).fetchall()
+    keys = ("id", "kind", "status", "progress", "message", "error", "created_at", "updated_at")
+    return [dict(zip(keys, r)) for r in rows]
+
+
+def latest_job(user_id: int, kind: str, active_only: bool = False) -> Optional[dict]:
+    """Último job do tipo para o usuário (ex.: retomar o acompanhamento após recarregar a página)."""
+    query = "SELECT id FROM jobs WHERE user_id = ? AND kind = ?"
+    if active_only:
+        query += " AND status IN ('queued', 'running')"
+    row = get_db().conn.execute(query + " ORDER BY id DESC LIMIT 1", (user_id, kind)).fetchone()
+    return get_job(row[0], user_id) if row else None
+
+
+def load_result(job: dict) -> Any:
+    """Carrega o resultado de um job concluído (None se não houver)."""
+    if not job or job.get("status") != "done" or not job.get("result_path"):
+        return None
+    with open(job["result_path"], "rb") as f:
+        return pickle.load(f)
+
+
+# --- Handlers ---------------------------------------------------------------
+
+@register_job("import")
+def _job_import(ctx: JobContext, files: list[tuple[str, bytes]], account_id: Optional[int] = None) -> dict:
+    from scripts.utils.db_utils import bulk_insert_transactions
+    from scripts.utils.import_queue import parse_files_parallel
+
+    ctx.progress(0.05, f"Lendo {len(files)} arquivos...")
+    rows, status = parse_files_parallel(files)
+    ctx.progress(0.6, f"Inserindo {len(rows)} transações...")
+    result = bulk_insert_transactions(ctx.user_id, rows, account_id=account_id) if rows else {"inserted": 0, "duplicates": 0, "failed": 0}
+    result["status"] = status
+    return result
+
+
+@register_job("export_excel")
+def _job_export_excel(ctx: JobContext, df) -> tuple[str, bytes, str]:
+    from scripts.utils.export import export_df_excel
+
+    ctx.progress(0.1, "Gerando Excel...")
+    return export_df_excel(df)
+
+
+@register_job("forecast")
+def _job_forecast(ctx: JobContext, horizon: int = 6):
+    from scripts.utils.forecasting import forecast_user
+
+    ctx.progress(0.1, "Ajustando modelo de projeção...")
+    return forecast_user(ctx.user_id, horizon=horizon)
+
+
+@register_job("transcribe")
+def _job_transcribe(ctx: JobContext, audio: bytes, lang: str = "pt") -> str:
+    from scripts.utils.speech_to_text import transcrever_audio
+
+    ctx.progress(0.1, "Transcrevendo áudio...")
+    return transcrever_audio(audio, lang=lang)
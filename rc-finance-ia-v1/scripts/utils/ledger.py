@@ -0,0 +1,118 @@
+# scripts/utils/ledger.py
+"""
+Ledger de saldo com checkpoints mensais.
+
+`balance_checkpoints` guarda, para cada mês fechado com transações, o saldo
+acumulado no fim do mês. O saldo em uma data qualquer é o último checkpoint
+anterior ao mês da data mais a soma do intervalo restante (no máximo alguns
+dias, lida pelo índice (user_id, date)). Escritas em transações apagam os
+checkpoints a partir do mês afetado (`invalidate_balance_checkpoints` em
+db_utils); só esse trecho é recalculado na próxima leitura.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+import pandas as pd
+
+from scripts.utils.db_utils import SIGNED_AMOUNT_SQL, cached_query, get_db, normalize_date
+
+_refresh_lock = threading.Lock()
+
+
+def _next_month_start(month: str) -> str:
+    ano, mes = int(month[:4]), int(month[5:7])
+    return f"{ano + mes // 12:04d}-{mes % 12 + 1:02d}-01"
+
+
+def _pending_start(con, user_id: int, current_month_start: str) -> Optional[str]:
+    """Início do trecho sem checkpoint, ou None se não há transação de mês fechado depois do último."""
+    last = con.execute(
+        "SELECT month FROM balance_checkpoints WHERE user_id = ? ORDER BY month DESC LIMIT 1", (user_id,)
+    ).fetchone()
+    start = _next_month_start(last[0]) if last else "0000-01-01"
+    pending = con.execute(
+        "SELECT 1 FROM transactions WHERE user_id = ? AND date >= ? AND date < ? LIMIT 1",
+        (user_id, start, current_month_start),
+    ).fetchone()
+    return start if pending else None
+
+
+def refresh_checkpoints(user_id: int) -> int:
+    """Completa os checkpoints dos meses fechados a partir do último válido. Retorna quantos gravou."""
+    current_month_start = date.today().strftime("%Y-%m-01")
+    with _refresh_lock:
+        con = get_db().conn
+        # checagem com leitura simples (índice (user_id, date)): em dia, não pega o lock de escrita
+        if _pending_start(con, user_id, current_month_start) is None:
+            return 0
+        # leitura e gravação na mesma transação: uma escrita concorrente não deixa checkpoint obsoleto
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            last = con.execute(
+                "SELECT month, balance FROM balance_checkpoints WHERE user_id = ? ORDER BY month DESC LIMIT 1",
+                (user_id,),
+            ).fetchone()
+            start = _next_month_start(last[0]) if last else "0000-01-01"
+            running = last[1] if last else 0.0
+            rows = con.execute(
+                f"SELECT substr(date, 1, 7) AS month, SUM({SIGNED_AMOUNT_SQL}), COUNT(*) FROM transactions "
+                "WHERE user_id = ? AND date >= ? AND date < ? GROUP BY 1 ORDER BY 1",
+                (user_id, start, current_month_start),
+            ).fetchall()
+            checkpoints = []
+            for month, total, count in rows:
+                running += total
+                checkpoints.append((user_id, month, running, count))
+            con.executemany(
+                "INSERT OR REPLACE INTO balance_checkpoints(user_id, month, balance, tx_count) VALUES (?, ?, ?, ?)",
+                checkpoints,
+            )
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+    return len(checkpoints)
+
+
+def _balance_at(user_id: int, as_of: str) -> float:
+    refresh_checkpoints(user_id)
+    con = get_db().conn
+    cp = con.execute(
+        "SELECT month, balance FROM balance_checkpoints WHERE user_id = ? AND month < ? "
+        "ORDER BY month DESC LIMIT 1",
+        (user_id, as_of[:7]),
+    ).fetchone()
+    start = _next_month_start(cp[0]) if cp else "0000-01-01"
+    resto = con.execute(
+        f"SELECT COALESCE(SUM({SIGNED_AMOUNT_SQL}), 0) FROM transactions "
+        "WHERE user_id = ? AND date >= ? AND date <= ?",
+        (user_id, start, as_of),
+    ).fetchone()[0]
+    return (cp[1] if cp else 0.0) + resto
+
+
+def balance_at(user_id: int, as_of: Optional[str] = None) -> float:
+    """Saldo acumulado do usuário ao fim do dia `as_of` (padrão: hoje), despesas com sinal negativo."""
+    as_of = normalize_date(as_of) if as_of else datetime.now().strftime("%Y-%m-%d")
+    return cached_query(user_id, ("ledger", "balance_at", as_of), lambda: _balance_at(user_id, as_of))
+
+
+def monthly_balances(user_id: int) -> pd.DataFrame:
+    """Saldo acumulado no fim de cada mês fechado (month, balance, tx_count), direto dos checkpoints."""
+    def load():
+        refresh_checkpoints(user_id)
+        return pd.read_sql_query(
+            "SELECT month, balance, tx_count FROM balance_checkpoints WHERE user_id = ? ORDER BY month",
+            get_db().conn, params=[user_id],
+        )
+    return cached_query(user_id, ("ledger", "monthly_balances"), load)
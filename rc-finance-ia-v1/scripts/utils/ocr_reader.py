@@ -1,15 +1,19 @@
 # scripts/utils/ocr_reader.py — OCR utilitário "puro" (sem Streamlit)
 import os
 import subprocess
+import tempfile
+from typing import Dict, List, Tuple
 
 import cv2
 import pytesseract
-from PIL import Image
 
 # === Caminhos (ajuste se necessário) ===
 TESS_EXE = r"C:\\Program Files\\Tesseract-OCR\\tesseract.exe"
 TESSDATA_DIR = os.environ.get("RC_TESSDATA", r"C:\\RC-Finance-IA\\tessdata")
 LANG_SPEC = "por+eng"
+TESS_CONFIG = f'--tessdata-dir "{TESSDATA_DIR}" --oem 1 --psm 6'
+# Confiança média (0-100) abaixo da qual tentamos outras línguas
+MIN_CONFIDENCE = float(os.environ.get("RC_OCR_MIN_CONF", "60"))
 
 # Garante que o Tesseract encontre os idiomas
 pytesseract.pytesseract.tesseract_cmd = TESS_EXE
@@ -33,18 +37,28 @@ def ocr_diag() -> dict:
     }
 
 
-def _preprocess(path: str) -> str:
-    """Upscale + binariza para melhorar OCR em recibos/fotos."""
-    img = cv2.imread(path)
+def _preprocess(src):
+    """Upscale + binariza para melhorar OCR em recibos/fotos.
+
+    Aceita caminho ou imagem já decodificada (ndarray) e devolve a imagem
+    tratada em memória — nada é gravado ao lado do arquivo original.
+    Retorna None se a imagem não puder ser lida.
+    """
+    img = cv2.imread(src) if isinstance(src, str) else src
     if img is None:
-        return path
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return None
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     gray = cv2.bilateralFilter(gray, 9, 75, 75)
     up = cv2.resize(gray, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
-    th = cv2.threshold(up, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-    tmp = path + ".prep.png"
-    cv2.imwrite(tmp, th)
-    return tmp
+    return cv2.threshold(up, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+
+
+def _cleanup_legacy_prep(image_path: str) -> None:
+    """Remove o `.prep.png` deixado por versões antigas ao lado da imagem."""
+    try:
+        os.remove(image_path + ".prep.png")
+    except OSError:
+        pass
 
 
 def _cli(image_path: str, langs: str) -> str:
@@ -69,26 +83,80 @@ def _cli(image_path: str, langs: str) -> str:
     raise RuntimeError(run.stderr.strip() or "CLI Tesseract falhou")
 
 
-def extract_text_any(image_path: str) -> str:
-    """Tenta pytesseract; se falhar, usa CLI; faz fallback de línguas."""
-    prep = _preprocess(image_path)
+def _ocr_with_conf(img, langs: str) -> Tuple[str, float]:
+    """Uma única chamada ao Tesseract: texto (por linha) + confiança média das palavras."""
+    data = pytesseract.image_to_data(
+        img, lang=langs, config=TESS_CONFIG, output_type=pytesseract.Output.DICT
+    )
+    lines: Dict[tuple, List[str]] = {}
+    confs: List[float] = []
+    for i, word in enumerate(data["text"]):
+        word = (word or "").strip()
+        if not word:
+            continue
+        conf = float(data["conf"][i])
+        if conf >= 0:
+            confs.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
 
-    # 1) pytesseract
-    for langs in (LANG_SPEC, "por", "eng"):
-        try:
-            cfg = f'--tessdata-dir "{TESSDATA_DIR}" --oem 1 --psm 6'
-            txt = pytesseract.image_to_string(Image.open(prep), lang=langs, config=cfg)
-            if txt and txt.strip():
-                return txt
-        except Exception:
-            pass
+    text = "\n".join(" ".join(words) for words in lines.values())
+    return text, (sum(confs) / len(confs) if confs else 0.0)
 
-    # 2) CLI fallback
+
+def _ocr_best(img) -> Tuple[str, float]:
+    """
+    OCR com escalonamento: chama o Tesseract uma vez com LANG_SPEC e só tenta
+    as outras línguas se a confiança ficar abaixo de MIN_CONFIDENCE.
+    O CLI é usado apenas se o pytesseract não devolver nada.
+    """
+    best_txt, best_conf = "", -1.0
+
+    # 1) pytesseract (imagem em memória, sem reabrir arquivo)
     for langs in (LANG_SPEC, "por", "eng"):
         try:
-            return _cli(prep, langs)
+            txt, conf = _ocr_with_conf(img, langs)
         except Exception:
             continue
+        if txt.strip() and conf > best_conf:
+            best_txt, best_conf = txt, conf
+        if best_conf >= MIN_CONFIDENCE:
+            break
+
+    if best_txt.strip():
+        return best_txt, best_conf
+
+    # 2) CLI fallback: precisa de arquivo, então grava um temporário e apaga no fim
+    tmp = None
+    try:
+        src = img
+        if not isinstance(img, str):
+            fd, tmp = tempfile.mkstemp(suffix=".png")
+            os.close(fd)
+            cv2.imwrite(tmp, img)
+            src = tmp
+        for langs in (LANG_SPEC, "por", "eng"):
+            try:
+                return _cli(src, langs), 0.0
+            except Exception:
+                continue
+    finally:
+        if tmp:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    return "", 0.0
+
+
+def extract_text_any(image_path: str) -> str:
+    """Pré-processa em memória e faz OCR com fallback de línguas sob baixa confiança."""
+    _cleanup_legacy_prep(image_path)
+    prep = _preprocess(image_path)
+    txt, _conf = _ocr_best(prep if prep is not None else image_path)
+    if txt.strip():
+        return txt
 
     return (
         "Erro OCR: verifique se por.traineddata/eng.traineddata existem em "
@@ -1,9 +1,12 @@
 # scripts/utils/ofx_import.py
 from __future__ import annotations
 
+import html
+import logging
 import os
+import re
 from io import BytesIO, StringIO
-from typing import Dict, List, Union
+from typing import Dict, Iterator, List, Optional, Union
 
 try:
     from ofxparse import OfxParser
@@ -12,59 +15,124 @@ try:
 except Exception:
     _HAVE_OFXPARSE = False
 
+from scripts.utils.text_decoding import detect_encoding, read_text
+
+logger = logging.getLogger(__name__)
+
 
 def _read_text_safely(src: Union[bytes, BytesIO, str]) -> str:
     """
-    Lê bytes/BytesIO/caminho e tenta decodificar em várias codificações comuns no Brasil.
+    Lê bytes/BytesIO/caminho e decodifica uma única vez pela camada comum
+    (BOM -> cabeçalho OFX/XML -> amostra; ver scripts/utils/text_decoding.py).
     """
-    data = None
+    return read_text(src, default="cp1252")
+
+
+# ---------------------------------------------------------------------------
+# Parser rápido: tokeniza só os <STMTTRN> direto dos bytes, em streaming,
+# sem decodificar o arquivo inteiro nem montar a árvore de objetos do ofxparse.
+# ---------------------------------------------------------------------------
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+_TAG_INI = b"<STMTTRN>"
+_TAG_FIM = b"</STMTTRN>"
+
+# Elementos usados; em SGML (OFX 1.x) não há tag de fechamento, em XML há
+_PAT_CAMPO = re.compile(
+    rb"<(TRNAMT|DTPOSTED|MEMO|NAME|PAYEE|FITID|TRNTYPE)>([^<\r\n]*)", re.IGNORECASE
+)
 
+
+def _iter_chunks(src: Union[bytes, BytesIO, str]) -> Iterator[bytes]:
     if isinstance(src, str):
-        # É um caminho de arquivo
-        if os.path.exists(src):
-            with open(src, "rb") as f:
-                data = f.read()
-        else:
+        if not os.path.exists(src):
             raise FileNotFoundError(f"Arquivo não encontrado: {src}")
-    elif isinstance(src, bytes):
-        # É bytes direto
-        data = src
-    elif isinstance(src, BytesIO):
-        # É BytesIO
-        src.seek(0)
-        data = src.read()
+        with open(src, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+    elif isinstance(src, (bytes, bytearray)):
+        yield bytes(src)
     else:
-        # Tenta ler como file-like object (ex: st.file_uploader retorna um objeto com read())
-        try:
-            if hasattr(src, "seek"):
-                src.seek(0)
-            data = src.read()
-        except Exception:
-            raise ValueError(f"Tipo de entrada não suportado: {type(src)}")
-
-    if isinstance(data, str):  # já é texto
-        return data
-
-    # ordem de tentativas de encoding
-    for enc in ("utf-8-sig", "latin-1", "cp1252", "utf-8"):
-        try:
-            return data.decode(enc)
-        except Exception:
-            pass
-
-    # último recurso: chardet (se instalado)
-    try:
-        import chardet
+        if hasattr(src, "seek"):
+            src.seek(0)
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def _ofx_text(v: bytes, encoding: str) -> str:
+    s = v.decode(encoding, errors="replace").strip()
+    return html.unescape(s) if "&" in s else s
+
+
+def _ofx_date(v: bytes) -> str:
+    """DTPOSTED (YYYYMMDD[HHMMSS[.XXX]][[TZ]]) -> YYYY-MM-DD"""
+    d = v.strip()[:8].decode("ascii", errors="ignore")
+    if len(d) == 8 and d.isdigit():
+        return f"{d[:4]}-{d[4:6]}-{d[6:]}"
+    return d
+
+
+def _ofx_stmttrn(bloco: bytes, encoding: str) -> Dict[str, Union[str, float]]:
+    campos = {k.upper(): v for k, v in _PAT_CAMPO.findall(bloco)}
+    amt_raw = campos.get(b"TRNAMT", b"0").strip().replace(b",", b".") or b"0"
+    return {
+        "amount": float(amt_raw),
+        "date": _ofx_date(campos.get(b"DTPOSTED", b"")),
+        "memo": _ofx_text(campos.get(b"MEMO", b""), encoding),
+        "name": _ofx_text(campos.get(b"NAME", b""), encoding),
+        "payee": _ofx_text(campos.get(b"PAYEE", b""), encoding),
+        "fitid": _ofx_text(campos.get(b"FITID", b""), encoding),
+        "trntype": _ofx_text(campos.get(b"TRNTYPE", b""), encoding),
+    }
+
+
+def iter_ofx_stmttrn(
+    src: Union[bytes, BytesIO, str], encoding: Optional[str] = None
+) -> Iterator[Dict[str, Union[str, float]]]:
+    """
+    Lê um OFX (SGML ou XML) em blocos de CHUNK_SIZE e produz os campos crus de
+    cada <STMTTRN>: {amount: float (com sinal), date: 'YYYY-MM-DD', memo, name,
+    payee, fitid, trntype}. Só os valores textuais usados são decodificados.
+    Obs.: o ofxparse expõe <NAME> como `payee`; aqui os dois ficam separados.
 
-        enc = chardet.detect(data).get("encoding") or "latin-1"
-        return data.decode(enc, errors="ignore")
-    except Exception:
-        return data.decode("latin-1", errors="ignore")
+    Args:
+        src: bytes, BytesIO/file-like ou caminho do arquivo (str)
+        encoding: força a codificação (padrão: detectada no primeiro bloco)
+    """
+    enc = encoding
+    buf = b""
+    for chunk in _iter_chunks(src):
+        buf = buf + chunk if buf else chunk
+        if enc is None:
+            # USASCII/sem declaração: bancos brasileiros costumam mandar acentos em cp1252
+            enc = detect_encoding(buf, default="cp1252")
+        pos = 0
+        while True:
+            i = buf.find(_TAG_INI, pos)
+            if i < 0:
+                # a tag de abertura pode ter sido cortada no fim do chunk
+                buf = buf[max(pos, len(buf) - len(_TAG_INI) + 1):]
+                break
+            j = buf.find(_TAG_FIM, i)
+            if j < 0:
+                buf = buf[i:]
+                break
+            yield _ofx_stmttrn(buf[i + len(_TAG_INI):j], enc)
+            pos = j + len(_TAG_FIM)
 
 
 def importar_ofx(src: Union[bytes, BytesIO, str]) -> List[Dict[str, Union[str, float]]]:
     """
     Importa transações de arquivo OFX.
+    Usa o parser rápido (iter_ofx_stmttrn); se ele não encontrar nada,
+    tenta o ofxparse como fallback.
 
     Args:
         src: Pode ser bytes, BytesIO, ou caminho do arquivo (str)
@@ -73,6 +141,31 @@ def importar_ofx(src: Union[bytes, BytesIO, str]) -> List[Dict[str, Union[str, f
         Lista de transações normalizadas:
         {type: 'income'|'expense', description: str, amount: float, category: str, date: 'YYYY-MM-DD'}
     """
+    try:
+        txs = []
+        for t in iter_ofx_stmttrn(src):
+            amt = t["amount"]
+            txs.append(
+                {
+                    "type": "income" if amt > 0 else "expense",
+                    "description": t["memo"] or t["name"] or t["payee"] or "Transação OFX",
+                    "amount": abs(amt),
+                    "category": "",  # OFX não tem categoria padrão
+                    "date": t["date"],
+                }
+            )
+        if txs:
+            return txs
+    except Exception as e:
+        logger.warning(f"Parser OFX rápido falhou, usando ofxparse: {e}")
+
+    if not _HAVE_OFXPARSE:
+        return []
+    return _importar_ofx_ofxparse(src)
+
+
+def _importar_ofx_ofxparse(src: Union[bytes, BytesIO, str]) -> List[Dict[str, Union[str, float]]]:
+    """Caminho antigo via árvore de objetos do ofxparse (fallback)."""
     if not _HAVE_OFXPARSE:
         raise ImportError(
             "Biblioteca ofxparse não está disponível. Instale com: pip install ofxparse"
@@ -1,9 +1,16 @@
 # scripts/utils/pdf_bank_parser.py
 from __future__ import annotations
 
+import importlib.util
+import itertools
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Union
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Union
 
 try:
     import pdfplumber
@@ -22,6 +29,12 @@ PAT_LINHA = re.compile(
     flags=re.IGNORECASE,
 )
 
+# Início de um novo bloco de transação (o memorando pode quebrar em várias linhas)
+PAT_INICIO = re.compile(r"^(Débito|Debito|Crédito|Credito)\b", flags=re.IGNORECASE)
+
+# Resolução usada ao rasterizar páginas escaneadas (o _preprocess ainda faz upscale 2x)
+OCR_DPI = 200
+
 
 def _to_amount(txt: str) -> float:
     """Converte string de valor monetário para float"""
@@ -38,20 +51,245 @@ def _to_amount(txt: str) -> float:
         return 0.0
 
 
+@lru_cache(maxsize=4096)
 def _norm_date(d: str) -> str:
-    """Normaliza data de DD/MM/YYYY para YYYY-MM-DD"""
+    """Normaliza data de DD/MM/YYYY para YYYY-MM-DD (extratos repetem muito as datas)"""
     try:
         return datetime.strptime(d, "%d/%m/%Y").strftime("%Y-%m-%d")
     except Exception:
         return d
 
 
-def parse_pdf_statement(path_pdf: str) -> List[Dict[str, Union[str, float]]]:
+@dataclass(frozen=True)
+class BankLayout:
+    """
+    Layout de extrato: regexes pré-compiladas + conversor para o formato normalizado.
+
+    signature: assinatura barata procurada no texto da 1ª página (detecção)
+    block_start: linha que abre um novo bloco (o memorando pode quebrar linhas)
+    line: regex aplicada uma única vez a cada bloco
+    to_item: converte o match em transação normalizada (ou None para ignorar)
+    """
+
+    name: str
+    signature: Pattern[str]
+    block_start: Pattern[str]
+    line: Pattern[str]
+    to_item: Callable[[re.Match], Optional[Dict[str, Union[str, float]]]]
+
+    def parse(self, bloco: str) -> Optional[Dict[str, Union[str, float]]]:
+        m = self.line.match(bloco)
+        return self.to_item(m) if m else None
+
+
+# Registro de layouts conhecidos (nome -> BankLayout)
+LAYOUTS: Dict[str, BankLayout] = {}
+DEFAULT_LAYOUT = "debito_credito"
+
+
+def register_layout(layout: BankLayout) -> BankLayout:
+    """Registra (ou substitui) um layout de extrato."""
+    LAYOUTS[layout.name] = layout
+    return layout
+
+
+def detect_layout(first_page_text: str) -> BankLayout:
+    """
+    Escolhe o layout cuja assinatura mais aparece no texto da 1ª página.
+    Sem nenhuma ocorrência, usa DEFAULT_LAYOUT.
+    """
+    best, best_hits = LAYOUTS[DEFAULT_LAYOUT], 0
+    for layout in LAYOUTS.values():
+        hits = sum(1 for _ in layout.signature.finditer(first_page_text))
+        if hits > best_hits:
+            best, best_hits = layout, hits
+    return best
+
+
+def _item_debito_credito(m: re.Match) -> Dict[str, Union[str, float]]:
+    tipo = m.group("tipo").lower()
+    memo = m.group("memo").strip()
+    return {
+        "type": "income" if tipo.startswith("cr") else "expense",
+        "description": memo if memo else m.group("ref"),
+        "amount": _to_amount(m.group("valor")),
+        "category": "",  # PDF não tem categoria padrão
+        "date": _norm_date(m.group("data")),
+    }
+
+
+def _item_data_valor_sinal(m: re.Match) -> Dict[str, Union[str, float]]:
+    valor_txt = m.group("valor")
+    dc = m.group("dc") or ""
+    is_debit = dc == "D" or (dc != "C" and valor_txt.lstrip().startswith("-"))
+    memo = m.group("memo").strip()
+    if m.group("extra"):  # continuação do histórico nas linhas seguintes
+        memo = f"{memo} {m.group('extra').strip()}"
+    return {
+        "type": "expense" if is_debit else "income",
+        "description": memo,
+        "amount": _to_amount(valor_txt.replace("-", "")),
+        "category": "",
+        "date": _norm_date(m.group("data")),
+    }
+
+
+# "Débito 01/02/2025 -R$ 1.234,56 REF Memorando..." (layout original do parser)
+register_layout(
+    BankLayout(
+        name="debito_credito",
+        signature=re.compile(
+            r"^(?:Débito|Debito|Crédito|Credito)\s+\d{2}/\d{2}/\d{4}",
+            flags=re.IGNORECASE | re.MULTILINE,
+        ),
+        block_start=PAT_INICIO,
+        line=PAT_LINHA,
+        to_item=_item_debito_credito,
+    )
+)
+
+# "01/02/2025 Memorando... -1.234,56" ou "... 1.234,56 D|C" (data, histórico, valor),
+# com ou sem a coluna de saldo corrente no fim da linha
+register_layout(
+    BankLayout(
+        name="data_valor_sinal",
+        signature=re.compile(
+            r"^\d{2}/\d{2}/\d{4}\s+\S.*\s-?\s*(?:R\$\s*)?[\d\.]+,\d{2}(?:\s*[DC])?\s*$",
+            flags=re.MULTILINE,
+        ),
+        block_start=re.compile(r"^\d{2}/\d{2}/\d{4}\s"),
+        line=re.compile(
+            r"^(?P<data>\d{2}/\d{2}/\d{4})\s+"
+            r"(?P<memo>.+?)\s+"
+            r"(?P<valor>-?\s*(?:R\$\s*)?[\d\.]+,\d{2})"
+            r"(?:\s*(?P<dc>[DC])\b)?"
+            # coluna de saldo corrente (opcional) depois do valor: descartada
+            r"(?:\s+(?P<saldo>-?\s*(?:R\$\s*)?[\d\.]+,\d{2})(?:\s*[DC]\b)?)?"
+            r"(?:\s+(?P<extra>.*))?$"
+        ),
+        to_item=_item_data_valor_sinal,
+    )
+)
+
+
+def _clean_lines(text: str) -> List[str]:
+    """Quebra o texto em linhas com espaços normalizados, descartando vazias."""
+    linhas = []
+    for ln in (text or "").splitlines():
+        ln = " ".join(ln.split())  # normaliza espaços
+        if ln:
+            linhas.append(ln)
+    return linhas
+
+
+def _iter_blocks(linhas: Iterable[str], layout: BankLayout) -> Iterator[str]:
+    """
+    Junta quebras do "memorando": novo bloco quando a linha casa com o
+    início de bloco do layout. Consome as linhas sob demanda; só o bloco
+    aberto fica em memória, então um memorando que atravessa a quebra de
+    página é emendado normalmente.
+    """
+    inicio = layout.block_start.match
+    atual = ""
+    for ln in linhas:
+        if inicio(ln):
+            if atual:
+                yield atual.strip()
+            atual = ln
+        else:
+            atual += " " + ln
+    if atual:
+        yield atual.strip()
+
+
+def _iter_transactions(
+    blocos: Iterable[str], layout: BankLayout
+) -> Iterator[Dict[str, Union[str, float]]]:
+    parse = layout.parse
+    for b in blocos:
+        item = parse(b)
+        if item is not None:
+            yield item
+
+
+def _iter_pages_transactions(
+    paginas: Iterable[List[str]], layout: Optional[str] = None
+) -> Iterator[Dict[str, Union[str, float]]]:
+    """
+    Recebe as linhas página a página; detecta o layout pela 1ª página
+    (a menos que `layout` seja informado) e segue em streaming.
+    """
+    paginas = iter(paginas)
+    primeira = next(paginas, None)
+    if primeira is None:
+        return
+    lay = LAYOUTS[layout] if layout else detect_layout("\n".join(primeira))
+    linhas = itertools.chain(primeira, itertools.chain.from_iterable(paginas))
+    yield from _iter_transactions(_iter_blocks(linhas, lay), lay)
+
+
+def _have_ocr() -> bool:
+    """OCR exige opencv + pytesseract (ver scripts/utils/ocr_reader.py)."""
+    return all(importlib.util.find_spec(m) is not None for m in ("cv2", "pytesseract"))
+
+
+def iter_pdf_statement(
+    path_pdf: str,
+    on_page: Optional[Callable[[int, int], None]] = None,
+    layout: Optional[str] = None,
+) -> Iterator[Dict[str, Union[str, float]]]:
+    """
+    Versão em streaming de parse_pdf_statement: produz as transações conforme
+    cada página é lida, carregando entre páginas apenas o bloco ainda aberto.
+    O layout do banco é detectado pela 1ª página (ver LAYOUTS).
+    Se o PDF não tiver camada de texto (escaneado), segue pelo OCR paralelo.
+
+    Args:
+        path_pdf: Caminho para o arquivo PDF
+        on_page: Callback opcional chamado com (página_atual, total_páginas)
+        layout: Nome de um layout registrado, para pular a detecção
+
+    Yields:
+        Transações normalizadas, no mesmo formato de parse_pdf_statement
+    """
+    if not _HAVE_PDFPLUMBER:
+        raise ImportError(
+            "Biblioteca pdfplumber não está disponível. Instale com: pip install pdfplumber"
+        )
+
+    n_linhas = 0
+
+    with pdfplumber.open(path_pdf) as pdf:
+        total = len(pdf.pages)
+
+        def _paginas() -> Iterator[List[str]]:
+            nonlocal n_linhas
+            for i, p in enumerate(pdf.pages, start=1):
+                linhas = _clean_lines(p.extract_text())
+                n_linhas += len(linhas)
+                yield linhas
+                # libera os objetos já extraídos da página
+                if hasattr(p, "close"):
+                    p.close()
+                if on_page:
+                    on_page(i, total)
+
+        yield from _iter_pages_transactions(_paginas(), layout=layout)
+
+    if n_linhas == 0 and _have_ocr():
+        yield from iter_pdf_scanned(path_pdf, on_page=on_page, layout=layout)
+
+
+def parse_pdf_statement(
+    path_pdf: str, layout: Optional[str] = None
+) -> List[Dict[str, Union[str, float]]]:
     """
     Parser PDF textual simples que retorna lista normalizada.
+    Se o PDF não tiver camada de texto (escaneado), cai para o OCR paralelo.
 
     Args:
         path_pdf: Caminho para o arquivo PDF
+        layout: Nome de um layout registrado (padrão: detectado pela 1ª página)
 
     Returns:
         Lista de transações normalizadas:
@@ -64,56 +302,119 @@ def parse_pdf_statement(path_pdf: str) -> List[Dict[str, Union[str, float]]]:
         return []
 
     try:
-        # 1) extrai todas as linhas de texto
-        linhas = []
-        with pdfplumber.open(path_pdf) as pdf:
-            for p in pdf.pages:
-                t = p.extract_text() or ""
-                for ln in t.splitlines():
-                    ln = " ".join(ln.split())  # normaliza espaços
-                    if ln:
-                        linhas.append(ln)
-
-        # 2) junta quebras do "memorando": novo bloco quando começa com Débito/Crédito
-        blocos = []
-        atual = ""
-        for ln in linhas:
-            if re.match(r"^(Débito|Debito|Crédito|Credito)\b", ln, flags=re.IGNORECASE):
-                if atual:
-                    blocos.append(atual.strip())
-                atual = ln
-            else:
-                atual += " " + ln
-        if atual:
-            blocos.append(atual.strip())
-
-        # 3) aplica regex em cada bloco
-        out = []
-        for b in blocos:
-            m = PAT_LINHA.match(b)
-            if not m:
-                continue
-
-            tipo = m.group("tipo").lower()
-            data = _norm_date(m.group("data"))
-            valor_txt = m.group("valor")
-            ref = m.group("ref")
-            memo = m.group("memo").strip()
-
-            amount = _to_amount(valor_txt)
-            is_credit = tipo.startswith("cr")
-
-            item = {
-                "type": "income" if is_credit else "expense",
-                "description": memo if memo else ref,
-                "amount": amount,
-                "category": "",  # PDF não tem categoria padrão
-                "date": data,
-            }
-            out.append(item)
-
-        return out
+        return list(iter_pdf_statement(path_pdf, layout=layout))
 
     except Exception as e:
         print(f"Erro ao processar PDF: {e}")
         return []
+
+
+def _ocr_page(args) -> Dict[str, object]:
+    """
+    Worker (roda em outro processo): rasteriza uma página e faz OCR.
+    Abre o PDF no próprio processo para não trafegar imagens entre processos.
+    """
+    import numpy as np
+
+    from scripts.utils import ocr_reader
+
+    path_pdf, page_index = args
+    t0 = time.perf_counter()
+    with pdfplumber.open(path_pdf) as pdf:
+        img = pdf.pages[page_index].to_image(resolution=OCR_DPI).original.convert("L")
+    prep = ocr_reader._preprocess(np.asarray(img))
+    txt, conf = ocr_reader._ocr_best(prep)
+    return {
+        "page": page_index + 1,
+        "lines": _clean_lines(txt),
+        "confidence": conf,
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+def iter_ocr_pages(path_pdf: str, max_workers: Optional[int] = None) -> Iterator[Dict[str, object]]:
+    """
+    OCR de todas as páginas de um PDF escaneado em paralelo (um processo por núcleo).
+    As páginas são produzidas em ordem assim que ficam prontas.
+
+    Yields:
+        {page: int, lines: [str], confidence: float, seconds: float}
+    """
+    with pdfplumber.open(path_pdf) as pdf:
+        n_pages = len(pdf.pages)
+    if n_pages == 0:
+        return
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, n_pages))
+    jobs = [(path_pdf, i) for i in range(n_pages)]
+    if workers == 1:
+        for j in jobs:
+            yield _ocr_page(j)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        yield from ex.map(_ocr_page, jobs)
+
+
+def ocr_pdf_pages(path_pdf: str, max_workers: Optional[int] = None) -> List[Dict[str, object]]:
+    """Mesmo que iter_ocr_pages, materializado em lista."""
+    return list(iter_ocr_pages(path_pdf, max_workers=max_workers))
+
+
+def iter_pdf_scanned(
+    path_pdf: str,
+    max_workers: Optional[int] = None,
+    timings: Optional[List[Dict[str, object]]] = None,
+    on_page: Optional[Callable[[int, int], None]] = None,
+    layout: Optional[str] = None,
+) -> Iterator[Dict[str, Union[str, float]]]:
+    """Streaming do parser de PDFs escaneados (ver parse_pdf_scanned)."""
+    with pdfplumber.open(path_pdf) as pdf:
+        total = len(pdf.pages)
+
+    def _paginas() -> Iterator[List[str]]:
+        for pg in iter_ocr_pages(path_pdf, max_workers=max_workers):
+            yield pg["lines"]
+            if timings is not None:
+                timings.append(
+                    {
+                        "page": pg["page"],
+                        "seconds": pg["seconds"],
+                        "confidence": pg["confidence"],
+                        "lines": len(pg["lines"]),
+                    }
+                )
+            if on_page:
+                on_page(pg["page"], total)
+
+    yield from _iter_pages_transactions(_paginas(), layout=layout)
+
+
+def parse_pdf_scanned(
+    path_pdf: str,
+    max_workers: Optional[int] = None,
+    timings: Optional[List[Dict[str, object]]] = None,
+) -> List[Dict[str, Union[str, float]]]:
+    """
+    Parser para extratos escaneados: OCR paralelo por página + mesmo
+    registro de layouts do parser textual (detecção pela 1ª página).
+
+    Args:
+        path_pdf: Caminho para o arquivo PDF
+        max_workers: Número de processos (padrão: todos os núcleos)
+        timings: Se informado, recebe {page, seconds, confidence, lines} de cada página
+
+    Returns:
+        Lista de transações no mesmo formato de parse_pdf_statement
+    """
+    if not _HAVE_PDFPLUMBER:
+        print(
+            "Biblioteca pdfplumber não está disponível. Instale com: pip install pdfplumber"
+        )
+        return []
+
+    try:
+        return list(iter_pdf_scanned(path_pdf, max_workers=max_workers, timings=timings))
+
+    except Exception as e:
+        print(f"Erro ao processar PDF escaneado: {e}")
+        return []
@@ -0,0 +1,109 @@
+# scripts/utils/planner.py
+"""
+Planejador de aportes mês a mês para as metas.
+
+Recebe a sobra mensal projetada (net_forecast de forecasting.py) e as metas com
+prazo, e monta o cronograma por prazo mais próximo primeiro (EDF): a sobra
+acumulada é uma linha do tempo de capacidade; cada meta, em ordem de prazo,
+ocupa o próximo trecho dessa linha, limitado ao que cabe até o seu prazo. A
+contribuição de cada meta em cada mês é a sobreposição desses trechos, uma
+matriz (metas x meses) calculada em NumPy.
+"""
+from __future__ import annotations
+
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils.db_utils import cached_query, list_goals
+from scripts.utils.forecasting import forecast_user
+
+# Horizonte máximo do cronograma
+MAX_PLAN_MONTHS = 120
+
+
+def plan_schedule(free: pd.Series, goals: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Cronograma de aportes.
+
+    `free`: sobra mensal projetada, índice mensal (Period) começando no primeiro
+    mês de aporte. `goals`: id, name, remaining, due_date (sem prazo = fim do
+    horizonte). Um mês só financia metas que vencem em meses posteriores.
+
+    Retorna (schedule, summary): schedule tem uma linha por mês e uma coluna por
+    meta (id); summary tem id, name, remaining, planned, shortfall.
+    """
+    months = free.index
+    T = len(months)
+    capacity = np.concatenate(([0.0], np.cumsum(np.maximum(free.to_numpy(dtype=float), 0.0))))
+
+    due = pd.PeriodIndex(pd.to_datetime(goals["due_date"], errors="coerce"), freq="M")
+    # número de meses de aporte antes do prazo (limitado ao horizonte)
+    n_months = np.where(due.isna(), T, due.asi8 - (months[0].ordinal if T else 0))
+    n_months = np.clip(n_months, 0, T).astype(np.int64)
+
+    order = np.argsort(n_months, kind="stable")
+    remaining = np.maximum(goals["remaining"].to_numpy(dtype=float), 0.0)[order]
+    # fim do trecho de cada meta na linha de capacidade: limitado ao acumulado até o prazo
+    ends = np.empty(len(order))
+    start = 0.0
+    for k, idx in enumerate(order):
+        start = ends[k] = max(start, min(start + remaining[k], capacity[n_months[idx]]))
+    starts = np.concatenate(([0.0], ends[:-1]))
+
+    # sobreposição [capacidade(t), capacidade(t+1)] x [início, fim] de cada meta
+    contrib = (np.minimum(capacity[None, 1:], ends[:, None])
+               - np.maximum(capacity[None, :-1], starts[:, None])).clip(min=0.0)
+
+    goal_ids = goals["id"].to_numpy()[order]
+    schedule = pd.DataFrame(contrib.T, index=months, columns=goal_ids)
+    schedule = schedule[goals["id"].to_numpy()]
+    planned = schedule.sum(axis=0).to_numpy()
+    summary = pd.DataFrame({
+        "id": goals["id"].to_numpy(),
+        "name": goals["name"].to_numpy(),
+        "remaining": goals["remaining"].to_numpy(dtype=float),
+        "planned": planned,
+    })
+    summary["shortfall"] = (summary["remaining"] - summary["planned"]).clip(lower=0.0)
+    return schedule, summary
+
+
+def _plan_user(user_id: int):
+    goals = list_goals(user_id)
+    if goals.empty:
+        return None
+    goals = goals.assign(remaining=(goals["target_amount"] - goals["funded_amount"].fillna(0.0)).clip(lower=0.0))
+    current = pd.Period(date.today(), freq="M")
+    due = pd.PeriodIndex(pd.to_datetime(goals["due_date"], errors="coerce"), freq="M")
+    last_due = due.dropna().max() if due.notna().any() else current + 12
+    horizon = int(min(max((last_due - current).n, 1), MAX_PLAN_MONTHS))
+
+    # a projeção começa depois do último mês fechado com dados, que pode estar no passado
+    forecast = forecast_user(user_id, horizon=horizon + MAX_PLAN_MONTHS)
+    if forecast.empty:
+        return None
+    free = forecast["net_forecast"]
+    free = free[free.index >= current].iloc[:horizon]
+    if len(free) < horizon:
+        return None
+    return plan_schedule(free, goals)
+
+
+def plan_for_user(user_id: int) -> Optional[tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Cronograma de aportes do usuário do mês atual até o último prazo.
+
+    Usa a sobra mensal projetada por forecasting.py. None sem metas ou sem
+    histórico para projetar. Cacheado até a próxima escrita do usuário.
+    """
+    return cached_query(user_id, ("planner", "schedule"), lambda: _plan_user(user_id))
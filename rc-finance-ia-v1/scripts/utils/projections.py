@@ -1,13 +1,33 @@
 
+import hashlib
+import json
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
 import pandas as pd
 import numpy as np
 import logging
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
 
+from scripts.utils.db_utils import get_db
+
 # Configurar logging básico
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Configuração do Holt-Winters; faz parte da chave do cache de modelos
+MODEL_CONFIG = {"trend": "add", "seasonal": None, "initialization_method": "estimated"}
+# Máximo de modelos guardados em forecast_models (os mais antigos são removidos)
+MAX_CACHED_MODELS = 5000
+
 def monthly_aggregate(df: pd.DataFrame, date_col: str = 'date') -> pd.DataFrame:
     """Agrega transações mensalmente para calcular receita, despesa e saldo."""
     logger.info(f"Agregando dados mensalmente usando a coluna de data: {date_col}")
@@ -50,6 +70,88 @@ def monthly_aggregate(df: pd.DataFrame, date_col: str = 'date') -> pd.DataFrame:
     logger.info("Agregação mensal concluída com sucesso.")
     return monthly_df
 
+def _model_key(values: np.ndarray, config: dict) -> str:
+    """Hash da série mensal (centavos) + configuração do modelo."""
+    h = hashlib.sha256(json.dumps(config, sort_keys=True).encode())
+    h.update(np.round(np.asarray(values, dtype=float) * 100).astype(np.int64).tobytes())
+    return h.hexdigest()
+
+
+def _load_model(key: str) -> Optional[dict]:
+    """Modelo guardado para a chave; None se não houver ou se o cache não puder ser lido."""
+    try:
+        row = get_db().conn.execute(
+            "SELECT params, level, trend FROM forecast_models WHERE key = ?", (key,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Cache de modelos indisponível ({e}); ajustando sem cache.")
+        return None
+    if row is None:
+        return None
+    return {"params": json.loads(row[0]), "level": row[1], "trend": row[2]}
+
+
+def _save_model(key: str, n_obs: int, model: dict, superseded: Optional[str] = None) -> None:
+    """Grava o modelo (melhor esforço: falha do banco só é registrada no log)."""
+    con = get_db().conn
+    try:
+        con.execute(
+            "INSERT OR REPLACE INTO forecast_models(key, config, n_obs, params, level, trend, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, json.dumps(MODEL_CONFIG, sort_keys=True), n_obs, json.dumps(model["params"]),
+             model["level"], model["trend"], datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        # o modelo da série sem o último mês só serve de warm start para este
+        if superseded:
+            con.execute("DELETE FROM forecast_models WHERE key = ?", (superseded,))
+        con.execute(
+            "DELETE FROM forecast_models WHERE key NOT IN "
+            "(SELECT key FROM forecast_models ORDER BY updated_at DESC LIMIT ?)",
+            (MAX_CACHED_MODELS,),
+        )
+        con.commit()
+    except sqlite3.Error as e:
+        con.rollback()
+        logger.warning(f"Não foi possível gravar o modelo no cache ({e}).")
+
+
+def fit_holt_winters(series: pd.Series) -> dict:
+    """
+    Parâmetros e estado final (nível, tendência) do Holt-Winters para a série, com cache persistente.
+
+    A chave é o hash da série e de MODEL_CONFIG: série repetida não é reajustada.
+    Se a série anterior (sem o último mês) estiver no cache, o ajuste parte dos
+    parâmetros dela (warm start) em vez da busca inicial completa.
+    """
+    values = series.to_numpy(dtype=float)
+    key = _model_key(values, MODEL_CONFIG)
+    cached = _load_model(key)
+    if cached is not None:
+        logger.info("Modelo Holt-Winters reaproveitado do cache.")
+        return cached
+
+    model = ExponentialSmoothing(series, **MODEL_CONFIG)
+    previous_key = _model_key(values[:-1], MODEL_CONFIG)
+    previous = _load_model(previous_key)
+    if previous is not None:
+        p = previous["params"]
+        start = np.array([p["smoothing_level"], p["smoothing_trend"], p["initial_level"], p["initial_trend"]])
+        fitted = model.fit(start_params=start, use_brute=False)
+        logger.info("Modelo Holt-Winters ajustado com warm start.")
+    else:
+        fitted = model.fit()
+    params = {k: float(fitted.params[k]) for k in ("smoothing_level", "smoothing_trend", "initial_level", "initial_trend")}
+    result = {"params": params, "level": float(fitted.level.iloc[-1]), "trend": float(fitted.trend.iloc[-1])}
+    _save_model(key, len(values), result, superseded=previous_key if previous is not None else None)
+    return result
+
+
+def project_holt_winters(model: dict, last_month: pd.Timestamp, horizon: int) -> pd.Series:
+    """Projeção a partir do estado final do modelo, para qualquer horizonte, sem reajuste."""
+    index = pd.date_range(start=last_month + pd.DateOffset(months=1), periods=horizon, freq='MS')
+    return pd.Series(model["level"] + model["trend"] * np.arange(1, horizon + 1), index=index)
+
+
 def forecast_balance(monthly: pd.DataFrame, horizon: int = 3) -> pd.DataFrame:
     """Projeta o saldo futuro usando Exponential Smoothing ou regressão linear como fallback."""
     logger.info(f"Iniciando projeção de saldo para {horizon} meses.")
@@ -66,8 +168,8 @@ def forecast_balance(monthly: pd.DataFrame, horizon: int = 3) -> pd.DataFrame:
     try:
         if len(monthly_series) >= 4: # Mínimo de 4 pontos para Exponential Smoothing
             logger.info("Tentando projeção com Exponential Smoothing.")
-            model = ExponentialSmoothing(monthly_series, trend='add', seasonal=None, initialization_method="estimated").fit()
-            forecast = model.forecast(horizon)
+            model = fit_holt_winters(monthly_series)
+            forecast = project_holt_winters(model, monthly_dt_index.max(), horizon)
             logger.info("Projeção com Exponential Smoothing concluída com sucesso.")
         else:
             raise ValueError("Dados insuficientes para Exponential Smoothing, usando fallback.")
@@ -3,6 +3,9 @@
 
 import pandas as pd
 from datetime import datetime, timedelta
+from typing import Optional
+
+from scripts.utils.forecasting import forecast_cumulative
 
 def monthly_aggregate(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -30,39 +33,27 @@ def monthly_aggregate(df: pd.DataFrame) -> pd.DataFrame:
     
     return monthly
 
-def forecast_balance(monthly_df: pd.DataFrame) -> pd.DataFrame:
+def forecast_balance(monthly_df: pd.DataFrame, current_balance: Optional[float] = None,
+                     horizon: int = 6, level: float = 0.95) -> pd.DataFrame:
     """
-    Projeção simples de saldo baseada na média dos últimos meses.
+    Projeção de saldo acumulado com tendência, sazonalidade e média móvel (ver forecasting.py).
+
+    `current_balance` é o saldo de partida (ex.: `ledger.balance_at(user_id)`);
+    sem ele, soma o saldo de todos os meses de `monthly_df`. Retorna
+    balance_forecast e o intervalo de confiança (balance_lower, balance_upper).
     """
     if monthly_df.empty or len(monthly_df) < 2:
         return pd.DataFrame()
-    
-    # Calcular média dos últimos 3 meses (ou todos se menos de 3)
-    last_months = min(3, len(monthly_df))
-    avg_income = monthly_df['income'].tail(last_months).mean()
-    avg_expense = monthly_df['expense'].tail(last_months).mean()
-    avg_balance = avg_income - avg_expense
-    
-    # Projetar próximos 6 meses
+
+    # Saldo de partida: ledger quando informado, senão acumulado do histórico
+    if current_balance is None:
+        current_balance = monthly_df['balance'].sum()
+
+    path, lower, upper = forecast_cumulative(monthly_df['balance'].to_numpy(dtype=float), current_balance, horizon, level)
     last_date = monthly_df.index[-1]
-    forecast_dates = []
-    for i in range(1, 7):
-        next_month = last_date + i
-        forecast_dates.append(next_month)
-    
-    # Calcular saldo acumulado
-    current_balance = monthly_df['balance'].cumsum().iloc[-1]
-    forecast_data = []
-    
-    for i, date in enumerate(forecast_dates):
-        projected_balance = current_balance + (avg_balance * (i + 1))
-        forecast_data.append({
-            'month': date,
-            'balance_forecast': projected_balance
-        })
-    
-    forecast_df = pd.DataFrame(forecast_data)
-    forecast_df.set_index('month', inplace=True)
-    
+    forecast_df = pd.DataFrame(
+        {'balance_forecast': path, 'balance_lower': lower, 'balance_upper': upper},
+        index=pd.period_range(last_date + 1, periods=horizon, freq='M'),
+    )
+    forecast_df.index.name = 'month'
     return forecast_df
-
@@ -0,0 +1,175 @@
+# scripts/utils/report_queries.py
+"""
+Consultas da página de Relatórios Dinâmicos.
+
+Os filtros (período, categorias, tipos) viram SQL parametrizado sobre o índice
+(user_id, date); as agregações são feitas no SQLite e só as séries prontas
+chegam ao pandas/plotly. Cada resultado é cacheado por assinatura dos filtros
+e versão dos dados do usuário (ver `cached_query`).
+"""
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+import pandas as pd
+
+from scripts.utils import analytics_duckdb
+from scripts.utils.db_utils import cached_query, get_db, normalize_date
+
+# Acima disso a série temporal é agregada por mês em vez de por dia
+DAILY_MAX_DAYS = 92
+
+# Valores em módulo: o resultado não depende da convenção de sinal da importação
+_VALUE = "ABS(amount)"
+
+
+@dataclass(frozen=True)
+class ReportFilters:
+    user_id: int
+    date_start: Optional[str] = None
+    date_end: Optional[str] = None
+    categories: tuple[str, ...] = ()
+    types: tuple[str, ...] = ()  # "income" / "expense"; vazio = todos
+    accounts: tuple[int, ...] = ()  # ids de accounts; vazio = todas
+
+    def signature(self) -> tuple:
+        return (self.date_start, self.date_end, self.categories, self.types, self.accounts)
+
+    def granularity(self) -> str:
+        if self.date_start and self.date_end:
+            dias = (date.fromisoformat(normalize_date(self.date_end))
+                    - date.fromisoformat(normalize_date(self.date_start))).days
+            if dias <= DAILY_MAX_DAYS:
+                return "day"
+        return "month"
+
+
+def compile_where(f: ReportFilters) -> tuple[str, list]:
+    """Monta a cláusula WHERE parametrizada para os filtros."""
+    clauses, params = ["user_id = ?"], [f.user_id]
+    if f.date_start:
+        clauses.append("date >= ?")
+        params.append(normalize_date(f.date_start))
+    if f.date_end:
+        clauses.append("date <= ?")
+        params.append(normalize_date(f.date_end))
+    if f.categories:
+        clauses.append(f"category IN ({', '.join('?' for _ in f.categories)})")
+        params.extend(f.categories)
+    if f.types:
+        clauses.append(f"type IN ({', '.join('?' for _ in f.types)})")
+        params.extend(f.types)
+    if f.accounts:
+        clauses.append(f"account_id IN ({', '.join('?' for _ in f.accounts)})")
+        params.extend(f.accounts)
+    return " AND ".join(clauses), params
+
+
+def _read(sql: str, params: list) -> pd.DataFrame:
+    return pd.read_sql_query(sql, get_db().conn, params=params)
+
+
+def _cached(f: ReportFilters, name: str, loader, *extra):
+    return cached_query(f.user_id, ("report", name, f.signature(), *extra), loader)
+
+
+def list_categories(user_id: int) -> list[str]:
+    def load():
+        rows = get_db().conn.execute(
+            "SELECT DISTINCT category FROM transactions WHERE user_id = ? AND category IS NOT NULL ORDER BY category",
+            (user_id,),
+        ).fetchall()
+        return [r[0] for r in rows]
+    return cached_query(user_id, ("report", "categories"), load)
+
+
+def accounts_balance(f: ReportFilters) -> float:
+    """Saldo atual das contas do filtro (todas se vazio), lido de account_balances."""
+    def load():
+        query = "SELECT COALESCE(SUM(balance), 0) FROM account_balances WHERE user_id = ?"
+        params = [f.user_id]
+        if f.accounts:
+            query += f" AND account_id IN ({', '.join('?' for _ in f.accounts)})"
+            params.extend(f.accounts)
+        return get_db().conn.execute(query, params).fetchone()[0]
+    return cached_query(f.user_id, ("report", "accounts_balance", f.accounts), load)
+
+
+def summary(f: ReportFilters) -> dict:
+    """Receitas, despesas, saldo e quantidade de transações."""
+    where, params = compile_where(f)
+
+    def load():
+        income, expense, count = get_db().conn.execute(
+            f"SELECT COALESCE(SUM(CASE WHEN type = 'income' THEN {_VALUE} END), 0), "
+            f"COALESCE(SUM(CASE WHEN type = 'expense' THEN {_VALUE} END), 0), COUNT(*) "
+            f"FROM transactions WHERE {where}",
+            params,
+        ).fetchone()
+        return {"income": income, "expense": expense, "balance": income - expense, "count": count}
+    return _cached(f, "summary", load)
+
+
+def by_category(f: ReportFilters) -> pd.DataFrame:
+    """Despesas por categoria (category, total), maior primeiro."""
+    if f.types and "expense" not in f.types:
+        return pd.DataFrame(columns=["category", "total"])
+    # O DuckDB só conhece período/categoria/tipo únicos; com qualquer outro
+    # filtro ativo o SQL de compile_where é a fonte da verdade.
+    if analytics_duckdb.available() and not (f.categories or f.types or f.accounts):
+        df = analytics_duckdb.category_breakdown(f.user_id, f.date_start, f.date_end, None, "expense")
+        return df[["category", "total"]]
+    where, params = compile_where(f)
+    return _cached(f, "by_category", lambda: _read(
+        f"SELECT category, SUM({_VALUE}) AS total FROM transactions "
+        f"WHERE {where} AND type = 'expense' GROUP BY category ORDER BY total DESC",
+        params,
+    ))
+
+
+def timeseries(f: ReportFilters) -> pd.DataFrame:
+    """Receitas e despesas por dia (períodos curtos) ou por mês: period, income, expense."""
+    where, params = compile_where(f)
+    gran = f.granularity()
+    period = "date" if gran == "day" else "substr(date, 1, 7) || '-01'"
+
+    def load():
+        df = _read(
+            f"SELECT {period} AS period, "
+            f"SUM(CASE WHEN type = 'income' THEN {_VALUE} ELSE 0 END) AS income, "
+            f"SUM(CASE WHEN type = 'expense' THEN {_VALUE} ELSE 0 END) AS expense "
+            f"FROM transactions WHERE {where} GROUP BY 1 ORDER BY 1",
+            params,
+        )
+        df["period"] = pd.to_datetime(df["period"], errors="coerce")
+        return df
+    return _cached(f, "timeseries", load, gran)
+
+
+def transactions_page(f: ReportFilters, limit: int = 100, offset: int = 0) -> pd.DataFrame:
+    """Uma página das transações filtradas, mais recentes primeiro."""
+    where, params = compile_where(f)
+    return _cached(f, "page", lambda: _read(
+        f"SELECT date, description, category, type, amount FROM transactions "
+        f"WHERE {where} ORDER BY date DESC, id DESC LIMIT ? OFFSET ?",
+        params + [limit, offset],
+    ), limit, offset)
+
+
+def transactions_all(f: ReportFilters) -> pd.DataFrame:
+    """Todas as transações filtradas (usado só na exportação)."""
+    where, params = compile_where(f)
+    return _read(
+        f"SELECT date, description, category, type, amount FROM transactions "
+        f"WHERE {where} ORDER BY date DESC, id DESC",
+        params,
+    )
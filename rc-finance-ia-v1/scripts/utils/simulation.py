@@ -0,0 +1,138 @@
+# scripts/utils/simulation.py
+"""
+Simulação de Monte Carlo do fluxo de caixa para estimar a chance de cumprir as metas no prazo.
+
+Receita e despesa mensais seguem a projeção de forecasting.py (tendência +
+sazonalidade + nível) mais resíduos históricos reamostrados (bootstrap). O
+mesmo mês histórico é sorteado para receita e despesa, preservando a
+correlação entre as duas. As metas são atendidas por ordem de prazo com a
+mesma poupança acumulada: uma meta só é cumprida se sobrar dinheiro depois
+das que vencem antes dela. Todos os caminhos são calculados de uma vez em NumPy.
+"""
+from __future__ import annotations
+
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import pandas as pd
+
+from scripts.utils import forecasting
+from scripts.utils.db_utils import cached_query, get_db, list_goals
+
+N_PATHS = 10_000
+# Mínimo de meses fechados para reamostrar resíduos com algum sentido
+MIN_HISTORY_MONTHS = 3
+# Prazo máximo simulado (metas mais distantes são truncadas aqui)
+MAX_HORIZON_MONTHS = 120
+
+
+def _ordinal(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def _monthly_flows(user_id: int) -> tuple[np.ndarray, int]:
+    """Matriz (2, meses) com receita e despesa (em módulo) por mês fechado e o ordinal do último mês."""
+    current = date.today().strftime("%Y-%m")
+    rows = get_db().conn.execute(
+        "SELECT CAST(substr(date, 1, 4) AS INTEGER) * 12 + CAST(substr(date, 6, 2) AS INTEGER) - 1, "
+        "SUM(CASE WHEN type = 'income' THEN ABS(amount) ELSE 0 END), "
+        "SUM(CASE WHEN type = 'expense' THEN ABS(amount) ELSE 0 END) "
+        "FROM transactions WHERE user_id = ? AND date < ? GROUP BY 1 ORDER BY 1",
+        (user_id, f"{current}-01"),
+    ).fetchall()
+    if not rows:
+        return np.zeros((2, 0)), 0
+    rec = np.array(rows, dtype=float)
+    months = rec[:, 0].astype(np.int64)
+    flows = np.zeros((2, months[-1] - months[0] + 1))
+    flows[:, months - months[0]] = rec[:, 1:].T
+    return flows, int(months[-1])
+
+
+def simulate_savings(flows: np.ndarray, months_ahead: int, n_paths: int = N_PATHS,
+                     seed: Optional[int] = None, skip: int = 0) -> np.ndarray:
+    """
+    Poupança acumulada (receita - despesa) simulada: array (n_paths, months_ahead).
+
+    `flows` é (2, meses) com receita e despesa históricas; `skip` descarta os
+    primeiros meses projetados (meses entre o último fechado e o atual).
+    """
+    params = forecasting.fit(flows)
+    mean = forecasting.predict(params, skip + months_ahead)[0][:, skip:]
+    # resíduos dentro da amostra, centrados (o nível já entra na média projetada)
+    t = np.arange(flows.shape[1])
+    m = params["seasonal"].shape[1]
+    fitted = params["intercept"][:, None] + params["slope"][:, None] * t + params["seasonal"][:, t % m]
+    resid = flows - fitted
+    resid -= resid.mean(axis=1, keepdims=True)
+
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, flows.shape[1], size=(n_paths, months_ahead))
+    income = np.maximum(mean[0] + resid[0][idx], 0.0)
+    expense = np.maximum(mean[1] + resid[1][idx], 0.0)
+    return np.cumsum(income - expense, axis=1)
+
+
+def _goal_probabilities(user_id: int, n_paths: int, seed: Optional[int], initial_savings: float) -> pd.DataFrame:
+    goals = list_goals(user_id)
+    out = pd.DataFrame({"id": goals["id"], "name": goals["name"], "due_date": goals["due_date"]})
+    out["remaining"] = (goals["target_amount"] - goals["funded_amount"]).clip(lower=0.0)
+    out["probability"] = np.nan
+    if goals.empty:
+        return out
+
+    today = date.today()
+    due = pd.to_datetime(goals["due_date"], errors="coerce")
+    has_due = due.notna().to_numpy()
+    # contribuições mensais até o prazo: do mês atual até o mês anterior ao vencimento
+    months_to_due = np.where(has_due, due.dt.year.fillna(0) * 12 + due.dt.month.fillna(1) - 1 - _ordinal(today), -1)
+    months_to_due = np.minimum(months_to_due.astype(np.int64), MAX_HORIZON_MONTHS)
+
+    out.loc[out["remaining"] <= 0, "probability"] = 1.0
+    pending = has_due & (out["remaining"] > 0).to_numpy()
+    out.loc[pending & (months_to_due < 0), "probability"] = 0.0
+    pending &= months_to_due >= 0
+    if not pending.any():
+        return out
+
+    # fila por prazo: cada meta precisa do próprio saldo + o das metas que vencem antes
+    order = np.flatnonzero(pending)[np.argsort(months_to_due[pending], kind="stable")]
+    required = np.cumsum(out["remaining"].to_numpy()[order])
+    cols = months_to_due[order]
+
+    flows, last = _monthly_flows(user_id)
+    horizon = int(cols.max())
+    if flows.shape[1] < MIN_HISTORY_MONTHS:
+        return out
+    if horizon == 0:
+        savings = np.full((n_paths, 1), float(initial_savings))
+    else:
+        skip = max(_ordinal(today) - last - 1, 0)
+        savings = np.hstack([np.zeros((n_paths, 1)), simulate_savings(flows, horizon, n_paths, seed, skip)])
+        savings += initial_savings
+    out.loc[order, "probability"] = (savings[:, cols] >= required).mean(axis=0)
+    return out
+
+
+def goal_probabilities(user_id: int, n_paths: int = N_PATHS, seed: Optional[int] = None,
+                       initial_savings: float = 0.0) -> pd.DataFrame:
+    """
+    Probabilidade de cada meta do usuário ser cumprida até o prazo.
+
+    Colunas: id, name, due_date, remaining, probability. Sem prazo ou com
+    histórico curto (< MIN_HISTORY_MONTHS meses), probability fica NaN; meta já
+    atingida vale 1.0 e meta vencida sem saldo vale 0.0. `seed` torna o
+    resultado reproduzível. Cacheado até a próxima escrita do usuário.
+    """
+    return cached_query(
+        user_id, ("simulation", "goals", n_paths, seed, float(initial_savings)),
+        lambda: _goal_probabilities(user_id, n_paths, seed, initial_savings),
+    )
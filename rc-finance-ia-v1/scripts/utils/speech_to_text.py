@@ -5,6 +5,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..',
 
 import os
 import subprocess
+import tempfile
 
 try:
     from loguru import logger  # ok se existir
@@ -35,8 +36,9 @@ def transcrever_audio(file_bytes: bytes, lang: str = "pt") -> str:
         return "Transcrição offline indisponível. faster-whisper não está configurado ou FFmpeg não encontrado."
 
     # Salvar bytes para um arquivo temporário para processamento
-    temp_audio_path = "temp_audio.wav"
-    with open(temp_audio_path, "wb") as f:
+    # (nome único: várias transcrições podem rodar ao mesmo tempo como jobs)
+    fd, temp_audio_path = tempfile.mkstemp(suffix=".wav")
+    with os.fdopen(fd, "wb") as f:
         f.write(file_bytes)
 
     try:
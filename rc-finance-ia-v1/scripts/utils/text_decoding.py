@@ -0,0 +1,156 @@
+# scripts/utils/text_decoding.py
+"""
+Camada única de decodificação dos importadores (CSV, OFX e texto de extratos).
+
+Ordem de detecção: BOM -> codificação declarada (cabeçalho OFX ou prólogo XML)
+-> heurística sobre uma amostra limitada dos bytes. O arquivo é decodificado
+uma única vez; leitores em streaming usam `iter_decode` (decoder incremental).
+"""
+from __future__ import annotations
+
+import codecs
+import os
+import re
+from io import BytesIO
+from typing import Iterable, Iterator, Optional, Union
+
+# Tamanho de cada janela da amostra (início, meio e fim do arquivo)
+SAMPLE_SIZE = 32 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),  # antes do UTF-16 LE, que é prefixo dele
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# OFX 1.x: "ENCODING:UTF-8" / "CHARSET:1252"; OFX 2.x/XML: <?xml ... encoding="UTF-8"?>
+_PAT_CHARSET = re.compile(rb"CHARSET:\s*([\w\-]+)", re.IGNORECASE)
+_PAT_ENCODING = re.compile(rb"ENCODING(?::\s*|\s*=\s*[\"'])([\w\-]+)", re.IGNORECASE)
+
+
+def read_source_bytes(src: Union[bytes, BytesIO, str]) -> bytes:
+    """Lê bytes de bytes/BytesIO/file-like (ex.: st.file_uploader) ou caminho de arquivo."""
+    if isinstance(src, str):
+        if not os.path.exists(src):
+            raise FileNotFoundError(f"Arquivo não encontrado: {src}")
+        with open(src, "rb") as f:
+            return f.read()
+    if isinstance(src, (bytes, bytearray)):
+        return bytes(src)
+    try:
+        if hasattr(src, "seek"):
+            src.seek(0)
+        data = src.read()
+    except Exception:
+        raise ValueError(f"Tipo de entrada não suportado: {type(src)}")
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+def _bom_encoding(data: bytes) -> Optional[str]:
+    for bom, enc in _BOMS:
+        if data.startswith(bom):
+            return enc
+    return None
+
+
+def _declared_encoding(head: bytes) -> Optional[str]:
+    """Codificação declarada no cabeçalho OFX/XML (None se não houver ou for USASCII)."""
+    m = _PAT_ENCODING.search(head)
+    if m:
+        enc = m.group(1).upper().replace(b"-", b"")
+        if enc == b"UTF8":
+            return "utf-8"
+        if enc.startswith(b"ISO8859") or enc == b"LATIN1":
+            return "latin-1"
+        if enc in (b"WINDOWS1252", b"CP1252"):
+            return "cp1252"
+    m = _PAT_CHARSET.search(head)
+    if m:
+        cs = m.group(1).upper()
+        if cs in (b"1252", b"WINDOWS-1252", b"CP1252"):
+            return "cp1252"
+        if cs.startswith(b"ISO") or cs.startswith(b"8859"):
+            return "latin-1"
+    return None
+
+
+def _sample(data: bytes) -> list[bytes]:
+    """Janelas do início, meio e fim do arquivo (no máximo 3 * SAMPLE_SIZE bytes)."""
+    if len(data) <= 3 * SAMPLE_SIZE:
+        return [data]
+    mid = len(data) // 2
+    return [data[:SAMPLE_SIZE], data[mid:mid + SAMPLE_SIZE], data[-SAMPLE_SIZE:]]
+
+
+def _is_utf8(window: bytes) -> bool:
+    # a janela pode começar/terminar no meio de um caractere multibyte
+    k = 0
+    while k < 3 and k < len(window) and 0x80 <= window[k] <= 0xBF:
+        k += 1
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(window[k:])
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _guess(windows: list[bytes], default: str) -> str:
+    if all(w.isascii() for w in windows):
+        return default
+    if all(_is_utf8(w) for w in windows):
+        return "utf-8"
+    try:
+        for w in windows:
+            w.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def detect_encoding(data: bytes, default: str = "utf-8") -> str:
+    """
+    Detecta a codificação olhando BOM, cabeçalho declarado e uma amostra limitada.
+
+    Args:
+        data: bytes do arquivo (ou o primeiro bloco, em leitura por streaming)
+        default: usado quando a amostra é ASCII puro (nada a desambiguar)
+    """
+    return (
+        _bom_encoding(data)
+        or _declared_encoding(data[:1024])
+        or _guess(_sample(data), default)
+    )
+
+
+def decode_bytes(data: bytes, encoding: Optional[str] = None, default: str = "utf-8") -> str:
+    """Decodifica em uma única passada; bytes inválidos viram U+FFFD em vez de erro."""
+    enc = encoding or detect_encoding(data, default=default)
+    return data.decode(enc, errors="replace")
+
+
+def read_text(src: Union[bytes, BytesIO, str], default: str = "utf-8") -> str:
+    """Atalho: read_source_bytes + decode_bytes."""
+    return decode_bytes(read_source_bytes(src), default=default)
+
+
+def iter_decode(
+    chunks: Iterable[bytes], encoding: Optional[str] = None, default: str = "utf-8"
+) -> Iterator[str]:
+    """
+    Decodifica um fluxo de blocos de bytes de forma incremental (cada byte uma vez).
+    Sem `encoding`, detecta pelo primeiro bloco.
+    """
+    decoder = None
+    for chunk in chunks:
+        if decoder is None:
+            enc = encoding or detect_encoding(chunk, default=default)
+            decoder = codecs.getincrementaldecoder(enc)(errors="replace")
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    if decoder is not None:
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
@@ -41,6 +41,21 @@ def with_progress(label, work_fn):
 
 
 
+def show_job_status(job, key):
+    """Exibe o andamento de um job em segundo plano. Retorna True quando o job terminou."""
+    if job is None:
+        st.warning("Tarefa não encontrada.")
+        return False
+    if job["status"] == "failed":
+        st.error(f"A tarefa falhou: {job['error']}")
+        return True
+    if job["status"] == "done":
+        return True
+    st.progress(job["progress"] or 0.0, text=job["message"] or "Na fila")
+    st.caption("A tarefa continua rodando no servidor, mesmo se você sair desta página.")
+    st.button("🔄 Atualizar", key=key)
+    return False
+
 def create_metric_card(title, value):
     st.markdown(
         f"""
@@ -0,0 +1,106 @@
+# tests/test_allocation.py
+"""Propriedades do alocador water-filling em casos aleatórios com semente fixa."""
+import copy
+import sys
+from pathlib import Path
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import pytest
+
+from scripts.utils.allocation import Goal, allocate, water_fill
+
+N_CASES = 500
+MAX_GOALS = 30
+
+
+def _cases(seed=0):
+    rnd = np.random.default_rng(seed)
+    for _ in range(N_CASES):
+        n = int(rnd.integers(1, MAX_GOALS + 1))
+        caps = rnd.choice([0.0, 1.0, 1000.0], n) * rnd.random(n)
+        scores = np.where(rnd.random(n) < 0.1, 0.0, rnd.random(n))
+        balance = float(rnd.choice([0.0, rnd.random() * caps.sum(), rnd.random() * 2 * caps.sum() + 1]))
+        yield balance, caps, scores
+
+
+def _tol(v):
+    return 1e-6 * max(1.0, v)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_water_fill_respeita_tetos_e_conserva_saldo(seed):
+    for balance, caps, scores in _cases(seed):
+        x = water_fill(balance, caps, scores)
+        elig = (caps > 0) & (scores > 0)
+        esperado = min(balance, caps[elig].sum())
+        assert (x >= 0).all()
+        assert (x <= caps + 1e-9).all()  # nenhuma meta recebe além do remaining
+        assert (x[~elig] == 0).all()
+        assert abs(x.sum() - esperado) <= _tol(esperado)  # total = min(saldo, soma dos remaining)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_water_fill_proporcional_ao_score(seed):
+    for balance, caps, scores in _cases(seed):
+        x = water_fill(balance, caps, scores)
+        elig = (caps > 0) & (scores > 0)
+        livre = elig & (x < caps - 1e-9)
+        if not livre.any():
+            continue
+        lam = x[livre] / scores[livre]
+        # metas não saturadas recebem a mesma proporção do score; as saturadas receberiam ao menos isso
+        assert np.ptp(lam) <= _tol(lam.max())
+        assert (caps[elig & ~livre] / scores[elig & ~livre] <= lam.max() + 1e-6).all()
+
+
+def test_water_fill_nao_altera_entradas():
+    for balance, caps, scores in _cases():
+        caps_antes, scores_antes = caps.copy(), scores.copy()
+        water_fill(balance, caps, scores)
+        assert np.array_equal(caps, caps_antes)
+        assert np.array_equal(scores, scores_antes)
+
+
+def test_allocate_nao_altera_metas_e_conserva_saldo():
+    for balance, caps, scores in _cases():
+        goals = [Goal(i, f"g{i}", float(c), None, 0.5, 0.5, 0.0, 0.5) for i, c in enumerate(caps)]
+        antes = copy.deepcopy(goals)
+        plano = allocate(balance, list(zip(goals, scores)))
+        esperado = min(balance, caps[(caps > 0) & (scores > 0)].sum())
+        assert goals == antes
+        assert abs(sum(plano.values()) - esperado) <= _tol(esperado)
+        assert all(plano[g.id] <= g.remaining + 1e-9 for g in goals if g.id in plano)
+
+
+def test_allocate_sem_metas():
+    assert allocate(100.0, []) == {}
+
+
+@pytest.mark.parametrize("balance,caps,scores", [
+    (0.0, [100.0, 50.0, 10.0], [0.5, 0.3, 0.2]),  # saldo zero
+    (500.0, [0.0, 0.0, 0.0], [0.5, 0.3, 0.2]),  # todas as metas já atingidas
+    (500.0, [100.0, 50.0, 10.0], [0.0, 0.0, 0.0]),  # soma dos scores zero
+    (500.0, [], []),
+])
+def test_water_fill_casos_limite_nao_alocam(balance, caps, scores):
+    x = water_fill(balance, np.array(caps, dtype=float), np.array(scores, dtype=float))
+    assert x.shape == (len(caps),)
+    assert (x == 0).all()
+
+
+def test_water_fill_saldo_cobre_tudo():
+    caps = np.array([100.0, 50.0, 10.0])
+    assert np.allclose(water_fill(1000.0, caps, np.array([0.1, 0.1, 0.8])), caps)
+
+
+def test_allocate_metas_atingidas_ou_sem_score():
+    atingidas = [(Goal(i, f"g{i}", 0.0, None, 0.5, 0.5, 1.0, 0.5), 0.7) for i in range(3)]
+    sem_score = [(Goal(i, f"g{i}", 100.0, None, 0.5, 0.5, 0.0, 0.5), 0.0) for i in range(3)]
+    assert sum(allocate(500.0, atingidas).values()) == 0
+    assert sum(allocate(500.0, sem_score).values()) == 0
+    assert sum(allocate(0.0, sem_score[:1] + [(sem_score[1][0], 1.0)]).values()) == 0
@@ -0,0 +1,67 @@
+# tests/test_report_queries.py
+"""Relatório por categoria: caminho DuckDB e SQL devolvem os mesmos totais."""
+import sys
+from pathlib import Path
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import pandas as pd
+import pytest
+
+from scripts.utils import analytics_duckdb, analytics_snapshot, db_utils, report_queries
+from scripts.utils.report_queries import ReportFilters
+
+USER_ID = 1
+
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    """Banco temporário com receitas e despesas em duas categorias."""
+    monkeypatch.setattr(db_utils, "DB_PATH", tmp_path / "finance.db")
+    monkeypatch.setattr(analytics_snapshot, "SNAPSHOT_DIR", tmp_path / "analytics")
+    db_utils._query_cache.clear()
+    db_utils.init_db()
+    rows = []
+    for day in range(1, 29):
+        d = f"2024-03-{day:02d}"
+        rows.append({"date": d, "description": f"mercado {day}", "amount": -(50.0 + day),
+                     "category": "Mercado", "type": "expense"})
+        rows.append({"date": d, "description": f"uber {day}", "amount": -(10.0 + day % 5),
+                     "category": "Transporte", "type": "expense"})
+    rows.append({"date": "2024-03-05", "description": "salario", "amount": 9000.0,
+                 "category": "Mercado", "type": "income"})
+    db_utils.bulk_insert_transactions(USER_ID, rows)
+    yield
+    db_utils._query_cache.clear()
+
+
+def _sql_path(f: ReportFilters, monkeypatch) -> pd.DataFrame:
+    with monkeypatch.context() as m:
+        m.setattr(analytics_duckdb, "available", lambda: False)
+        db_utils._query_cache.clear()
+        return report_queries.by_category(f)
+
+
+def _totals(df: pd.DataFrame) -> dict:
+    return {r.category: round(float(r.total), 6) for r in df.itertuples()}
+
+
+@pytest.mark.parametrize("types,categories", [
+    ((), ()),
+    (("expense",), ()),
+    (("income", "expense"), ("Mercado",)),
+])
+def test_by_category_igual_nos_dois_caminhos(user_db, monkeypatch, types, categories):
+    f = ReportFilters(USER_ID, "2024-03-01", "2024-03-31", categories=categories, types=types)
+    sql = _sql_path(f, monkeypatch)
+    db_utils._query_cache.clear()
+    assert _totals(report_queries.by_category(f)) == _totals(sql)
+    assert sum(_totals(sql).values()) == pytest.approx(report_queries.summary(f)["expense"])
+
+
+def test_by_category_sem_despesa_no_filtro(user_db):
+    f = ReportFilters(USER_ID, types=("income",))
+    assert report_queries.by_category(f).empty
@@ -0,0 +1,68 @@
+# tests/test_simulation.py
+"""Simulação de Monte Carlo das metas: reprodutível com semente fixa."""
+import sys
+from datetime import date
+from pathlib import Path
+
+# PATH BOOTSTRAP
+# Adiciona o diretório raiz do projeto ao sys.path para que os módulos possam ser encontrados
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.utils import db_utils, simulation
+
+USER_ID = 1
+
+
+def _month_start(months_back: int) -> date:
+    today = date.today()
+    ordinal = today.year * 12 + today.month - 1 - months_back
+    return date(ordinal // 12, ordinal % 12 + 1, 1)
+
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    """Banco temporário com 18 meses fechados de receitas e despesas e duas metas."""
+    monkeypatch.setattr(db_utils, "DB_PATH", tmp_path / "finance.db")
+    db_utils._query_cache.clear()
+    db_utils.init_db()
+    rnd = np.random.default_rng(0)
+    rows = []
+    for back in range(18, 0, -1):
+        d = _month_start(back)
+        rows.append({"date": d.replace(day=5).isoformat(), "description": f"salario {back}",
+                     "amount": 5000.0, "category": "Salário", "type": "income"})
+        rows.append({"date": d.replace(day=10).isoformat(), "description": f"gastos {back}",
+                     "amount": float(rnd.normal(3500, 400)), "category": "Compras", "type": "expense"})
+    db_utils.bulk_insert_transactions(USER_ID, rows)
+    due = _month_start(-12).isoformat()
+    done = db_utils.create_goal(USER_ID, "Reserva", 1000.0, due)
+    db_utils.fund_goal(done["id"], USER_ID, 1000.0)
+    pending = db_utils.create_goal(USER_ID, "Viagem", 15000.0, due)
+    yield {"done": done["id"], "pending": pending["id"]}
+    db_utils._query_cache.clear()
+
+
+def test_mesma_semente_mesmas_probabilidades(user_db):
+    a = simulation._goal_probabilities(USER_ID, 2000, 42, 0.0)
+    b = simulation._goal_probabilities(USER_ID, 2000, 42, 0.0)
+    pd.testing.assert_frame_equal(a, b)
+    assert a["probability"].notna().all()
+
+
+def test_simulate_savings_reprodutivel():
+    flows = np.vstack([np.full(24, 5000.0), 3500.0 + 400.0 * np.sin(np.arange(24))])
+    a = simulation.simulate_savings(flows, 12, n_paths=500, seed=7)
+    b = simulation.simulate_savings(flows, 12, n_paths=500, seed=7)
+    assert a.shape == (500, 12)
+    assert np.array_equal(a, b)
+
+
+def test_meta_ja_atingida_tem_probabilidade_um(user_db):
+    probs = simulation.goal_probabilities(USER_ID, n_paths=1000, seed=1).set_index("id")["probability"]
+    assert probs[user_db["done"]] == 1.0
+    assert 0.0 <= probs[user_db["pending"]] <= 1.0